@@ -0,0 +1,122 @@
+import copy
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def analysis_cache_key(image_bytes: bytes, description: str = "") -> str:
+    """Content-address an analysis request by its decoded image bytes and description"""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(b"\x00")
+    digest.update(description.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """Two-tier cache of meal analysis results.
+
+    Tier 1 is an in-process LRU bounded by entry count and approximate size,
+    tier 2 is a Mongo collection shared by every worker. Both tiers expire
+    entries after ``ttl_seconds``.
+    """
+
+    def __init__(self, collection, max_entries: int = 512, max_bytes: int = 8 * 1024 * 1024,
+                 ttl_seconds: int = 24 * 60 * 60):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, size, result)
+        self._bytes = 0
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stores = 0
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached analysis, checking the local LRU before Mongo"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, _, result = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return copy.deepcopy(result)
+            self._discard(key)
+
+        try:
+            doc = await self.collection.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+                {"result": 1, "expires_at": 1}
+            )
+        except Exception as e:
+            logger.warning(f"Analysis cache lookup failed: {str(e)}")
+            doc = None
+
+        if doc is None:
+            self.misses += 1
+            return None
+
+        self.mongo_hits += 1
+        remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+        self._remember(key, doc["result"], remaining)
+        return copy.deepcopy(doc["result"])
+
+    async def set(self, key: str, result: Dict[str, Any]):
+        """Store an analysis in both tiers"""
+        self.stores += 1
+        self._remember(key, copy.deepcopy(result), self.ttl_seconds)
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "result": result,
+                    "created_at": datetime.utcnow(),
+                    "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Analysis cache store failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.mongo_hits + self.misses
+        hits = self.memory_hits + self.mongo_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+    def _remember(self, key: str, result: Dict[str, Any], ttl_seconds: float):
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes or ttl_seconds <= 0:
+            return
+        self._discard(key)
+        self._entries[key] = (time.monotonic() + ttl_seconds, size, result)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
@@ -0,0 +1,332 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# (image bytes, description) -> analyze-meal payload
+ProcessJob = Callable[[bytes, str], Awaitable[Dict[str, Any]]]
+
+PENDING_STATUSES = ("queued", "running")
+
+
+class QueueFull(Exception):
+    def __init__(self, depth: int, retry_after: int):
+        super().__init__(f"Analysis queue is full ({depth} jobs waiting)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class AnalysisJobQueue(ABC):
+    """Bounded analysis job queue drained by a fixed pool of async workers.
+
+    ``submit`` returns a job id immediately; at most ``workers`` analyses run
+    at once and submissions beyond ``max_depth`` waiting jobs are refused
+    with a retry hint. Subclasses decide where jobs live.
+    """
+
+    store_name = "base"
+
+    def __init__(self, process: ProcessJob, workers: int = 4, max_depth: int = 100,
+                 result_ttl_seconds: int = 3600):
+        self.process = process
+        self.workers = workers
+        self.max_depth = max_depth
+        self.result_ttl_seconds = result_ttl_seconds
+        self._tasks: List[asyncio.Task] = []
+        self._finished: Dict[str, asyncio.Event] = {}
+        self._avg_seconds: Optional[float] = None
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def submit(self, image_bytes: bytes, description: str = "") -> Dict[str, Any]:
+        depth = await self.depth()
+        if depth >= self.max_depth:
+            self.rejected += 1
+            raise QueueFull(depth, self.retry_after(depth))
+
+        job_id = uuid.uuid4().hex
+        await self._enqueue(job_id, image_bytes, description)
+        self.submitted += 1
+        return {"job_id": job_id, "status": "queued", "position": depth + 1}
+
+    def retry_after(self, depth: int) -> int:
+        """Seconds until the queue has likely drained below its limit"""
+        per_job = self._avg_seconds or 5.0
+        return max(1, math.ceil(per_job * (depth - self.max_depth + 1) / max(1, self.workers)))
+
+    async def get(self, job_id: str, wait: float = 0) -> Optional[Dict[str, Any]]:
+        """Job status and result; with ``wait``, block up to that many seconds for it to finish"""
+        job = await self._load(job_id)
+        if job is not None and job["status"] in PENDING_STATUSES and wait > 0:
+            await self._wait(job_id, wait)
+            job = await self._load(job_id)
+        return job
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self):
+        while True:
+            try:
+                job_id, image_bytes, description = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Store hiccup (e.g. Mongo failover): keep the worker alive and retry
+                logger.error(f"Error claiming analysis job: {str(e)}")
+                await asyncio.sleep(1)
+                continue
+
+            self.running += 1
+            started = time.monotonic()
+            try:
+                result = await self.process(image_bytes, description)
+                await self._finish(job_id, {"status": "done", "result": result})
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in analysis job {job_id}: {str(e)}")
+                self.failed += 1
+                try:
+                    await self._finish(job_id, {"status": "failed", "error": str(e)})
+                except Exception as finish_error:
+                    logger.error(f"Error recording failed job {job_id}: {str(finish_error)}")
+            finally:
+                self.running -= 1
+                elapsed = time.monotonic() - started
+                self._avg_seconds = elapsed if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * elapsed
+                event = self._finished.pop(job_id, None)
+                if event is not None:
+                    event.set()
+
+    async def _wait(self, job_id: str, timeout: float):
+        event = self._finished.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _expires_at(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.result_ttl_seconds)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "store": self.store_name,
+            "workers": self.workers,
+            "running": self.running,
+            "depth": await self.depth(),
+            "max_depth": self.max_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_seconds": round(self._avg_seconds, 3) if self._avg_seconds is not None else None
+        }
+
+    @abstractmethod
+    async def depth(self) -> int:
+        ...
+
+    @abstractmethod
+    async def _enqueue(self, job_id: str, image_bytes: bytes, description: str):
+        ...
+
+    @abstractmethod
+    async def _claim(self) -> Tuple[str, bytes, str]:
+        ...
+
+    @abstractmethod
+    async def _finish(self, job_id: str, update: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    async def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+
+class MemoryJobQueue(AnalysisJobQueue):
+    """Jobs in this process only; queued jobs are lost on restart"""
+
+    store_name = "memory"
+
+    def __init__(self, process: ProcessJob, **kwargs):
+        super().__init__(process, **kwargs)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def _enqueue(self, job_id: str, image_bytes: bytes, description: str):
+        self._purge()
+        self._jobs[job_id] = {"job_id": job_id, "status": "queued", "created_at": datetime.utcnow()}
+        self._queue.put_nowait((job_id, image_bytes, description))
+
+    async def _claim(self) -> Tuple[str, bytes, str]:
+        job_id, image_bytes, description = await self._queue.get()
+        self._jobs[job_id].update(status="running", started_at=datetime.utcnow())
+        return job_id, image_bytes, description
+
+    async def _finish(self, job_id: str, update: Dict[str, Any]):
+        self._jobs[job_id].update(update, finished_at=datetime.utcnow(), expires_at=self._expires_at())
+
+    async def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return {key: value for key, value in job.items() if key != "expires_at"}
+
+    def _purge(self):
+        """Forget finished jobs whose results have outlived the TTL"""
+        now = datetime.utcnow()
+        expired = [job_id for job_id, job in self._jobs.items() if job.get("expires_at") and job["expires_at"] < now]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class MongoJobQueue(AnalysisJobQueue):
+    """Durable jobs in a Mongo collection, shared by every API worker process.
+
+    Images are parked in the blob store until their job finishes. Workers
+    claim the oldest queued job atomically; jobs left running by a crashed
+    process are requeued once they are ``stale_seconds`` old.
+    """
+
+    store_name = "mongo"
+
+    def __init__(self, process: ProcessJob, collection, blob_store, poll_seconds: float = 1.0,
+                 stale_seconds: int = 300, **kwargs):
+        super().__init__(process, **kwargs)
+        self.collection = collection
+        self.blob_store = blob_store
+        self.poll_seconds = poll_seconds
+        self.stale_seconds = stale_seconds
+        self._wakeup = asyncio.Event()
+
+    async def depth(self) -> int:
+        return await self.collection.count_documents({"status": "queued"})
+
+    def start(self):
+        if not self._tasks:
+            super().start()
+            self._tasks.append(asyncio.create_task(self._requeue_stale()))
+
+    async def requeue_stale(self) -> int:
+        """Hand jobs orphaned by dead workers back to the queue; returns how many were requeued"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        result = await self.collection.update_many(
+            {"status": "running", "started_at": {"$lt": cutoff}},
+            {"$set": {"status": "queued"}, "$unset": {"started_at": ""}}
+        )
+        if result.modified_count:
+            logger.warning(f"Requeued {result.modified_count} stale analysis jobs")
+            self._wakeup.set()
+        return result.modified_count
+
+    async def _requeue_stale(self):
+        while True:
+            try:
+                await self.requeue_stale()
+            except Exception as e:
+                logger.error(f"Error requeueing stale analysis jobs: {str(e)}")
+            await asyncio.sleep(self.stale_seconds)
+
+    async def _enqueue(self, job_id: str, image_bytes: bytes, description: str):
+        image_id = await self.blob_store.put(image_bytes)
+        await self.collection.insert_one({
+            "_id": job_id,
+            "status": "queued",
+            "description": description,
+            "image_id": image_id,
+            "created_at": datetime.utcnow()
+        })
+        self._wakeup.set()
+
+    async def _claim(self) -> Tuple[str, bytes, str]:
+        while True:
+            job = await self.collection.find_one_and_update(
+                {"status": "queued"},
+                {"$set": {"status": "running", "started_at": datetime.utcnow()}},
+                sort=[("created_at", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if job is not None:
+                try:
+                    image_bytes = await self.blob_store.read(job["image_id"])
+                except Exception as e:
+                    logger.error(f"Error reading image for analysis job {job['_id']}: {str(e)}")
+                    await self._finish(job["_id"], {"status": "failed", "error": "Image no longer available"})
+                    continue
+                return job["_id"], image_bytes, job.get("description", "")
+
+            # Other processes enqueue too, so don't rely on the local wakeup alone
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _finish(self, job_id: str, update: Dict[str, Any]):
+        job = await self.collection.find_one_and_update(
+            {"_id": job_id},
+            {
+                "$set": {**update, "finished_at": datetime.utcnow(), "expires_at": self._expires_at()},
+                "$unset": {"image_id": ""}
+            },
+            projection={"image_id": 1}
+        )
+        if job is not None and job.get("image_id"):
+            await self.blob_store.release(job["image_id"])
+
+    async def _load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.collection.find_one({"_id": job_id}, {"image_id": 0, "description": 0, "expires_at": 0})
+        if job is None:
+            return None
+        job["job_id"] = job.pop("_id")
+        return job
+
+    async def _wait(self, job_id: str, timeout: float):
+        """Finished here or by a worker in another process, whichever is seen first"""
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                await super()._wait(job_id, min(remaining, self.poll_seconds))
+                job = await self.collection.find_one({"_id": job_id}, {"status": 1})
+                if job is None or job["status"] not in PENDING_STATUSES:
+                    return
+        finally:
+            # The job may finish in another process, which never sets our event
+            self._finished.pop(job_id, None)
+
+
+def create_job_queue(backend: str, process: ProcessJob, collection=None, blob_store=None,
+                     poll_seconds: float = 1.0, stale_seconds: int = 300, **kwargs) -> AnalysisJobQueue:
+    """``poll_seconds`` and ``stale_seconds`` only apply to the mongo store"""
+    if backend == "memory":
+        return MemoryJobQueue(process, **kwargs)
+    if backend == "mongo":
+        return MongoJobQueue(process, collection, blob_store, poll_seconds=poll_seconds,
+                             stale_seconds=stale_seconds, **kwargs)
+    raise ValueError(f"Unknown analysis job store: {backend}")
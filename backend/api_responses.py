@@ -0,0 +1,40 @@
+from typing import Any, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def json_default(value: Any) -> Any:
+    """Types orjson doesn't know natively (it already handles datetime, UUID and NumPy)"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=json_default, option=ORJSON_OPTIONS)
+
+
+class ApiJSONResponse(ORJSONResponse):
+    """orjson-rendered JSON that also accepts raw Mongo values (ObjectId).
+
+    As the router's default response class it replaces the stdlib json
+    render. Endpoints that return it directly also skip FastAPI's
+    jsonable_encoder pass, which dominates for large meal listings.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def fast_response(content: Any, response: Optional[Any] = None, status_code: int = 200) -> ApiJSONResponse:
+    """Return ``content`` as JSON without jsonable_encoder, keeping validator headers already set on ``response``"""
+    headers = None
+    if response is not None:
+        headers = {key: response.headers[key] for key in ("etag", "cache-control") if key in response.headers}
+    return ApiJSONResponse(content, status_code=status_code, headers=headers)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark /api/foods/search's in-memory index on a synthetic IFCT-sized catalog.
+
+Builds --foods dishes from regional prefixes, base dishes and preparation
+styles (with transliterated aliases), then times cold (uncached) and warm
+queries covering exact words, prefixes, typos, multi-word queries and
+region/category filters.
+
+    python backend/benchmarks/bench_food_search.py [--foods 50000]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from food_search import FoodSearchIndex
+
+BASES = [
+    ("toor dal", "dal", ["arhar dal", "tuvar dal"]), ("moong dal", "dal", ["mung dal"]),
+    ("chana dal", "dal", ["bengal gram"]), ("masoor dal", "dal", ["red lentil"]),
+    ("rajma", "dal", ["kidney beans"]), ("chole", "dal", ["chhole", "chickpea curry"]),
+    ("paneer", "dairy", ["cottage cheese"]), ("dahi", "dairy", ["curd", "yogurt"]),
+    ("chicken curry", "meat", ["murgh curry", "kozhi curry"]), ("mutton curry", "meat", ["gosht"]),
+    ("fish curry", "seafood", ["meen curry", "macher jhol"]), ("prawn masala", "seafood", ["jhinga"]),
+    ("roti", "grain", ["chapati", "phulka"]), ("paratha", "grain", ["parotta"]),
+    ("basmati rice", "grain", ["chawal"]), ("biryani", "grain", ["biriyani"]),
+    ("pulao", "grain", ["pulav"]), ("idli", "breakfast", ["idly"]), ("dosa", "breakfast", ["dosai"]),
+    ("upma", "breakfast", ["uppittu"]), ("poha", "breakfast", ["aval", "avalakki"]),
+    ("samosa", "snack", ["singara"]), ("pakora", "snack", ["pakoda", "bhajji"]),
+    ("dhokla", "snack", []), ("vada", "snack", ["vadai", "wada"]), ("aloo gobi", "vegetable", []),
+    ("bhindi", "vegetable", ["okra", "vendakkai"]), ("baingan bharta", "vegetable", ["brinjal"]),
+    ("palak", "vegetable", ["spinach", "saag"]), ("kheer", "dessert", ["payasam", "payesh"]),
+    ("gulab jamun", "dessert", []), ("halwa", "dessert", ["sheera"]),
+]
+REGIONS = {
+    "north": ["punjabi", "dilli", "lucknowi", "kashmiri", "amritsari"],
+    "south": ["chettinad", "kerala", "udupi", "andhra", "mysore", "hyderabadi"],
+    "east": ["bengali", "odia", "assamese", "bihari"],
+    "west": ["gujarati", "maharashtrian", "goan", "rajasthani", "malvani"],
+}
+STYLES = ["", "tadka", "fry", "masala", "makhani", "kadai", "home style", "restaurant style",
+          "dry", "gravy", "spicy", "mild", "tandoori", "jeera", "lasooni", "methi"]
+
+
+def build_catalog(count, seed=7):
+    rng = random.Random(seed)
+    foods, seen = [], set()
+    while len(foods) < count:
+        base, category, aliases = rng.choice(BASES)
+        region = rng.choice(list(REGIONS))
+        prefix = rng.choice(REGIONS[region])
+        style = rng.choice(STYLES)
+        variant = rng.randint(1, 40)
+        name = " ".join(part for part in (prefix, base, style) if part).title() + f" #{variant}"
+        if name in seen:
+            continue
+        seen.add(name)
+        foods.append({
+            "name": name,
+            "category": category,
+            "region": region,
+            "aliases": [f"{prefix} {alias}" for alias in aliases],
+            "nutritional_info": {
+                "calories_per_100g": rng.uniform(40, 450), "protein_per_100g": rng.uniform(0, 30),
+                "carbs_per_100g": rng.uniform(0, 70), "fat_per_100g": rng.uniform(0, 30),
+                "fiber_per_100g": rng.uniform(0, 12)
+            }
+        })
+    return foods
+
+
+QUERIES = [
+    ("exact", {"query": "toor"}), ("alias", {"query": "arhar"}), ("prefix", {"query": "pane"}),
+    ("typo", {"query": "biriani"}), ("typo", {"query": "chetinad"}),
+    ("multi-word", {"query": "kerala fish curry"}), ("multi-word", {"query": "punjabi chole masala"}),
+    ("filtered", {"query": "curry", "region": "south"}), ("filtered", {"query": "dal", "category": "dal"}),
+    ("page 3", {"query": "masala", "offset": 20, "limit": 10}),
+]
+
+
+def main(args):
+    foods = build_catalog(args.foods)
+    start = time.perf_counter()
+    index = FoodSearchIndex(foods)
+    build_s = time.perf_counter() - start
+
+    print("=" * 80)
+    print(f"Food search benchmark: {len(foods):,} foods, {len(index.vocabulary):,} tokens, "
+          f"index built in {build_s * 1000:.0f} ms")
+    print("=" * 80)
+    print(f"{'kind':<12} {'query':<36} {'hits':>6} {'cold':>10} {'warm':>10}")
+
+    cold_all, warm_all = [], []
+    for kind, params in QUERIES:
+        index._cache.clear()
+        start = time.perf_counter()
+        _, total = index.search(**params)
+        cold = time.perf_counter() - start
+
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            index.search(**params)
+            samples.append(time.perf_counter() - start)
+        warm = statistics.median(samples)
+
+        cold_all.append(cold)
+        warm_all.append(warm)
+        label = " ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{kind:<12} {label:<36} {total:>6} {cold * 1000:>8.3f}ms {warm * 1000:>8.3f}ms")
+
+    print(f"\nmedian cold: {statistics.median(cold_all) * 1000:.3f} ms   "
+          f"median warm: {statistics.median(warm_all) * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--foods", type=int, default=50000)
+    parser.add_argument("--runs", type=int, default=200)
+    main(parser.parse_args())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark the image normalization stage that runs before the Gemini call.
+
+Reports bytes sent to the LLM and end-to-end latency with and without
+normalization. Without --live, the LLM leg is modelled as the upload time at
+--uplink-mbps; with --live, real analyze_food_with_gemini calls are timed
+(requires EMERGENT_LLM_KEY).
+
+    python backend/benchmarks/bench_image_pipeline.py [--live] [--runs 5]
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+from PIL import Image
+
+from image_pipeline import ImagePipeline
+
+
+def create_phone_photo(width=3024, height=4032, quality=70):
+    """Synthetic full-resolution 'phone photo' (smooth gradients plus sensor-like noise)"""
+    rng = np.random.default_rng(42)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([
+        128 + 80 * np.sin(x / 250.0),
+        110 + 60 * np.cos(y / 310.0),
+        90 + 40 * np.sin((x + y) / 400.0)
+    ], axis=-1)
+    noisy = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(noisy).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+async def time_live_call(image_bytes):
+    from server import analyze_food_with_gemini
+    start = time.perf_counter()
+    await analyze_food_with_gemini(base64.b64encode(image_bytes).decode("ascii"), "benchmark")
+    return time.perf_counter() - start
+
+
+async def run(args):
+    pipeline = ImagePipeline(max_edge=args.max_edge, quality=args.quality)
+    original = create_phone_photo()
+    original_b64 = len(base64.b64encode(original))
+
+    # Warm the pool so process start-up isn't billed to the first sample
+    await pipeline.prepare(original)
+
+    prepare_times = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        normalized, _, _ = await pipeline.prepare(original)
+        prepare_times.append(time.perf_counter() - start)
+    normalized_b64 = len(base64.b64encode(normalized))
+    prepare_s = statistics.median(prepare_times)
+
+    print("=" * 80)
+    print(f"Image pipeline benchmark (max_edge={args.max_edge}, quality={args.quality})")
+    print("=" * 80)
+    print(f"Bytes to LLM (base64)  before: {original_b64:>10,}   after: {normalized_b64:>10,}"
+          f"   ({100 * (1 - normalized_b64 / original_b64):.1f}% smaller)")
+    print(f"Normalization (median of {args.runs}): {prepare_s * 1000:.1f} ms in worker pool")
+
+    if args.live:
+        before = statistics.median([await time_live_call(original) for _ in range(args.runs)])
+        after = statistics.median([await time_live_call(normalized) for _ in range(args.runs)])
+        after += prepare_s
+        print(f"End-to-end (live Gemini)  before: {before * 1000:.0f} ms   after: {after * 1000:.0f} ms")
+    else:
+        bytes_per_s = args.uplink_mbps * 1_000_000 / 8
+        before = original_b64 / bytes_per_s
+        after = prepare_s + normalized_b64 / bytes_per_s
+        print(f"End-to-end upload model @ {args.uplink_mbps} Mbit/s  before: {before * 1000:.0f} ms"
+              f"   after: {after * 1000:.0f} ms (excludes model inference time)")
+
+    pipeline.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-edge", type=int, default=int(os.environ.get("IMAGE_MAX_EDGE", "1024")))
+    parser.add_argument("--quality", type=int, default=int(os.environ.get("IMAGE_JPEG_QUALITY", "80")))
+    parser.add_argument("--uplink-mbps", type=float, default=20.0)
+    parser.add_argument("--live", action="store_true", help="time real Gemini calls")
+    asyncio.run(run(parser.parse_args()))
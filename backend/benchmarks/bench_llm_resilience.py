@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark the LLM call path (deadline, hedging, circuit breaker) against the fake LLM.
+
+Runs --calls analyses through LlmCaller with a tail of slow responses
+(--slow-rate of calls take --slow-seconds), with and without hedging, and
+reports latency percentiles plus extra LLM attempts. Then replays an
+outage (--error-rate failures) and reports how quickly requests fall back
+once the breaker opens.
+
+    python backend/benchmarks/bench_llm_resilience.py [--calls 400] [--slow-rate 0.05]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fake_llm import FakeLlmChat
+from llm_client import CircuitBreaker, LlmCaller, LlmClientPool
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+async def run(caller, calls, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await caller.send("analyze")
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies, failures
+
+
+def report(label, latencies, failures, caller):
+    print(f"{label:<22} p50 {statistics.median(latencies) * 1000:7.0f} ms  "
+          f"p95 {percentile(latencies, 95) * 1000:7.0f} ms  p99 {percentile(latencies, 99) * 1000:7.0f} ms  "
+          f"failed {failures:4d}  hedged {caller.hedged:4d}  timeouts {caller.timeouts:4d}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-seconds", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.9)
+    args = parser.parse_args()
+
+    def factory(error_rate=0.0):
+        return lambda: FakeLlmChat(latency_seconds=args.latency, jitter_seconds=args.latency / 2,
+                                   slow_rate=args.slow_rate, slow_seconds=args.slow_seconds,
+                                   error_rate=error_rate)
+
+    print(f"{args.calls} calls, {args.concurrency} concurrent, {args.slow_rate:.0%} take {args.slow_seconds:g}s")
+    for hedge in (False, True):
+        caller = LlmCaller(LlmClientPool(factory(), size=args.concurrency), timeout_seconds=args.timeout,
+                           hedge=hedge, hedge_min_seconds=0.05)
+        # Warm the latency window so hedging has a p95 to work from
+        await run(caller, 50, args.concurrency)
+        caller.hedged = caller.timeouts = 0
+        latencies, failures = await run(caller, args.calls, args.concurrency)
+        report("hedged" if hedge else "no hedging", latencies, failures, caller)
+
+    print(f"\noutage: {args.error_rate:.0%} of calls fail")
+    for breaker in (False, True):
+        caller = LlmCaller(
+            LlmClientPool(factory(args.error_rate), size=args.concurrency), timeout_seconds=args.timeout,
+            hedge=False, breaker=CircuitBreaker(min_calls=5, failure_threshold=0.5 if breaker else 2.0)
+        )
+        latencies, failures = await run(caller, args.calls, args.concurrency)
+        report("breaker" if breaker else "no breaker", latencies, failures, caller)
+        print(f"{'':<22} LLM attempts {caller.calls}, short-circuited {caller.breaker.rejected}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark nutrition totals: Python loop vs. Mongo aggregation pipeline.
+
+Seeds a scratch database with 10, 1k and 100k meals for one user and times
+- python_full: streaming whole meal documents (the original summary code)
+- python_projected: streaming only the five nutrient fields
+- aggregate: $match + $group, only the totals cross the wire
+
+Meals carry an inline --image-kb payload to mimic documents written before
+images moved to the blob store. Requires a running MongoDB (MONGO_URL).
+
+    python backend/benchmarks/bench_nutrition_summary.py [--sizes 10 1000 100000] [--runs 3]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from meal_aggregates import aggregate_nutrition, sum_nutrition
+
+USER_ID = "bench_user"
+
+
+async def seed(collection, count, image_kb):
+    await collection.drop()
+    await collection.create_index([("user_id", 1), ("timestamp", -1), ("_id", -1)])
+    rng = random.Random(count)
+    image = "A" * (image_kb * 1024)
+    now = datetime.utcnow()
+    batch = []
+    for i in range(count):
+        batch.append({
+            "user_id": USER_ID,
+            "food_name": f"Bench meal {i}",
+            "estimated_quantity": 150.0,
+            "calories": rng.uniform(50, 800),
+            "protein": rng.uniform(0, 40),
+            "carbs": rng.uniform(0, 100),
+            "fat": rng.uniform(0, 40),
+            "fiber": rng.uniform(0, 15),
+            "image_base64": image,
+            "ai_analysis": "Benchmark analysis text " * 20,
+            "timestamp": now - timedelta(minutes=i),
+            "meal_type": rng.choice(["breakfast", "lunch", "dinner", "snack"])
+        })
+        if len(batch) == 1000:
+            await collection.insert_many(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch)
+
+
+async def timed(func, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def run(args):
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "calorie_tracker_bench")]
+    match = {"user_id": USER_ID, "timestamp": {"$gte": datetime.utcnow() - timedelta(days=3650)}}
+
+    print("=" * 80)
+    print(f"Nutrition totals benchmark (median of {args.runs}, image payload {args.image_kb} KB/meal)")
+    print("=" * 80)
+    print(f"{'meals':>8} {'python_full':>14} {'python_projected':>18} {'aggregate':>12} {'speedup':>9}")
+
+    try:
+        for size in args.sizes:
+            collection = db[f"bench_meals_{size}"]
+            await seed(collection, size, args.image_kb)
+
+            full = await timed(lambda: sum_nutrition(collection, match, projection=False), args.runs)
+            projected = await timed(lambda: sum_nutrition(collection, match), args.runs)
+            aggregated = await timed(lambda: aggregate_nutrition(collection, match), args.runs)
+
+            print(f"{size:>8} {full * 1000:>12.1f}ms {projected * 1000:>16.1f}ms "
+                  f"{aggregated * 1000:>10.1f}ms {full / aggregated:>8.1f}x")
+
+            if not args.keep:
+                await collection.drop()
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--image-kb", type=int, default=8)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded collections")
+    asyncio.run(run(parser.parse_args()))
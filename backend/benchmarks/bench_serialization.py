@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark meal-listing serialization: FastAPI's default path vs orjson, field projection and compression.
+
+Builds --meals synthetic meal documents shaped like Mongo returns them
+(ObjectId, datetime, a Gemini-length ai_analysis) and times, per listing
+size:
+
+- default:   jsonable_encoder + stdlib json (FastAPI's JSONResponse)
+- orjson:    jsonable_encoder + orjson (ORJSONResponse as default class)
+- direct:    ApiJSONResponse returned directly (no jsonable_encoder)
+- projected: direct, with the dashboard's field list
+
+and reports payload sizes raw, gzipped and (if installed) brotli'd.
+
+    python backend/benchmarks/bench_serialization.py [--sizes 14 1000]
+"""
+
+import argparse
+import gzip
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from api_responses import ApiJSONResponse
+from compression import brotli
+
+ANALYSIS = (
+    "Here's the nutritional analysis of the Indian food in the image: the plate holds dal tadka, "
+    "steamed basmati rice, two rotis and a portion of aloo gobi. Estimated portion size is about "
+    "350 grams. The dal provides most of the protein, the rice and rotis most of the carbohydrates. "
+) * 6
+
+PROJECTED_FIELDS = ("_id", "food_name", "estimated_quantity", "calories", "protein", "carbs", "fat",
+                    "fiber", "timestamp", "image_urls")
+
+
+def make_meals(count):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    meals = []
+    for i in range(count):
+        meal_id = str(ObjectId())
+        meals.append({
+            "_id": meal_id,
+            "user_id": "default_user",
+            "food_name": rng.choice(["Rice-based Indian dish", "Dal/Lentil curry", "Indian bread"]),
+            "estimated_quantity": 150.0 + rng.random() * 200,
+            "calories": round(200 + rng.random() * 400, 1),
+            "protein": round(rng.random() * 30, 1),
+            "carbs": round(rng.random() * 80, 1),
+            "fat": round(rng.random() * 20, 1),
+            "fiber": round(rng.random() * 10, 1),
+            "image_id": f"{i:064x}",
+            "ai_analysis": ANALYSIS,
+            "timestamp": now - timedelta(minutes=37 * i),
+            "meal_type": "general",
+            "image_url": f"/api/meals/{meal_id}/image",
+            "image_urls": {size: f"/api/meals/{meal_id}/image?size={size}" for size in ("thumb", "medium")}
+        })
+    return meals
+
+
+def timed(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[14, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        meals = make_meals(size)
+        projected = [{key: meal[key] for key in PROJECTED_FIELDS} for meal in meals]
+        variants = {
+            "default": lambda: JSONResponse(jsonable_encoder({"meals": meals, "total": size})).body,
+            "orjson": lambda: ORJSONResponse(jsonable_encoder({"meals": meals, "total": size})).body,
+            "direct": lambda: ApiJSONResponse({"meals": meals, "total": size}).body,
+            "projected": lambda: ApiJSONResponse({"meals": projected, "total": size}).body,
+        }
+
+        print(f"\n{size} meals")
+        baseline = None
+        for name, func in variants.items():
+            seconds, body = timed(func, args.repeat)
+            baseline = baseline or seconds
+            gzipped = len(gzip.compress(body, compresslevel=6))
+            brotlied = f"{len(brotli.compress(body, quality=4)):>9,d}" if brotli else "      n/a"
+            print(f"  {name:<10} {seconds * 1000:8.3f} ms  x{baseline / seconds:5.1f}   "
+                  f"raw {len(body):>9,d} B  gzip {gzipped:>8,d} B  br {brotlied} B")
+
+        body = variants["projected"]()
+        seconds, _ = timed(lambda: gzip.compress(body, compresslevel=6), args.repeat)
+        print(f"  gzip of projected body: {seconds * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
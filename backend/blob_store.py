@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+
+def sniff_image_type(data: bytes) -> str:
+    """Best-effort content type from the image's magic bytes"""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"):
+        return "image/heic"
+    return "application/octet-stream"
+
+
+class BlobStore(ABC):
+    """Content-addressed, reference-counted image storage.
+
+    Blobs are keyed by the SHA-256 of their bytes, so identical images are
+    stored once. A small metadata collection tracks length, content type
+    and how many meals reference each blob; the bytes themselves live in a
+    backend (GridFS or the local filesystem).
+    """
+
+    def __init__(self, meta_collection):
+        self.meta = meta_collection
+
+    async def put(self, data: bytes, content_type: Optional[str] = None) -> str:
+        """Store bytes (if new) and add a reference; returns the blob id"""
+        blob_id = hashlib.sha256(data).hexdigest()
+        existing = await self.meta.find_one_and_update({"_id": blob_id}, {"$inc": {"refs": 1}})
+        if existing is not None:
+            return blob_id
+
+        # Write the bytes before publishing metadata so readers never see a dangling blob
+        await self._write(blob_id, data)
+        await self.meta.update_one(
+            {"_id": blob_id},
+            {
+                "$inc": {"refs": 1},
+                "$setOnInsert": {
+                    "length": len(data),
+                    "content_type": content_type or sniff_image_type(data),
+                    "created_at": datetime.utcnow()
+                }
+            },
+            upsert=True
+        )
+        return blob_id
+
+    async def release(self, blob_id: str):
+        """Drop one reference, deleting the blob once nothing points at it"""
+        await self.meta.update_one({"_id": blob_id}, {"$inc": {"refs": -1}})
+        result = await self.meta.delete_one({"_id": blob_id, "refs": {"$lte": 0}})
+        if result.deleted_count:
+            try:
+                await self._delete(blob_id)
+            except Exception as e:
+                logger.warning(f"Error deleting blob {blob_id}: {str(e)}")
+
+    async def stat(self, blob_id: str) -> Optional[Dict]:
+        return await self.meta.find_one({"_id": blob_id})
+
+    async def read(self, blob_id: str) -> bytes:
+        return b"".join([chunk async for chunk in self.stream(blob_id)])
+
+    @abstractmethod
+    def stream(self, blob_id: str) -> AsyncIterator[bytes]:
+        ...
+
+    @abstractmethod
+    async def _write(self, blob_id: str, data: bytes):
+        ...
+
+    @abstractmethod
+    async def _delete(self, blob_id: str):
+        ...
+
+
+class GridFSBlobStore(BlobStore):
+    """Blob bytes in a GridFS bucket, shared by every worker through Mongo"""
+
+    def __init__(self, db, bucket_name: str = "meal_images"):
+        from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+        super().__init__(db[f"{bucket_name}_meta"])
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name, chunk_size_bytes=CHUNK_SIZE)
+
+    async def stream(self, blob_id: str) -> AsyncIterator[bytes]:
+        grid_out = await self.bucket.open_download_stream(blob_id)
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+    async def _write(self, blob_id: str, data: bytes):
+        from gridfs.errors import FileExists
+        from pymongo.errors import DuplicateKeyError
+
+        try:
+            await self.bucket.upload_from_stream_with_id(blob_id, blob_id, data)
+        except (FileExists, DuplicateKeyError):
+            pass  # Another worker stored the same content first
+
+    async def _delete(self, blob_id: str):
+        await self.bucket.delete(blob_id)
+
+
+class FileSystemBlobStore(BlobStore):
+    """Blob bytes as files under ``root``, fanned out by hash prefix"""
+
+    def __init__(self, meta_collection, root: str):
+        super().__init__(meta_collection)
+        self.root = root
+
+    def path_for(self, blob_id: str) -> str:
+        return os.path.join(self.root, blob_id[:2], blob_id[2:4], blob_id)
+
+    async def stream(self, blob_id: str) -> AsyncIterator[bytes]:
+        handle = await asyncio.to_thread(open, self.path_for(blob_id), "rb")
+        try:
+            while True:
+                chunk = await asyncio.to_thread(handle.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            handle.close()
+
+    async def _write(self, blob_id: str, data: bytes):
+        await asyncio.to_thread(self._write_file, self.path_for(blob_id), data)
+
+    async def _delete(self, blob_id: str):
+        path = self.path_for(blob_id)
+        if os.path.exists(path):
+            await asyncio.to_thread(os.remove, path)
+
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write-then-rename keeps partially written files invisible to readers
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_path, path)
+
+
+def create_blob_store(db, backend: str = "gridfs", root: str = "blob_store") -> BlobStore:
+    if backend == "filesystem":
+        return FileSystemBlobStore(db.meal_images_meta, root)
+    return GridFSBlobStore(db)
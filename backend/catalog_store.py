@@ -0,0 +1,237 @@
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from dish_matcher import PHRASE_ARRAYS, compile_phrase_arrays
+from food_search import SEARCH_ARRAYS, compile_search_arrays
+from nutrition_table import NAME_ARRAYS, compile_name_arrays
+from rollups import NUTRIENTS
+
+logger = logging.getLogger(__name__)
+
+PER_100G_FIELDS = tuple(f"{field}_per_100g" for field in NUTRIENTS)
+
+# Text fields per food, in string-table order; aliases are joined with ALIAS_SEPARATOR
+STRING_FIELDS = ("name", "category", "region", "aliases", "description")
+ALIAS_SEPARATOR = "\x1f"
+# Separator for the aliases column of CSV sources
+CSV_ALIAS_SEPARATOR = "|"
+
+VERSION_PREFIX = "catalog-"
+KEEP_VERSIONS = 2
+# Part of every version name: bump when the compiled layout changes so old stores are recompiled
+STORE_FORMAT = b"2"
+
+
+def _number(value: Any, field: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a number, got {value!r}")
+
+
+def read_source(path: str) -> List[Dict[str, Any]]:
+    """Parse a JSON list or CSV file of foods into catalog dicts, validating every row"""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [
+                {
+                    "name": row.get("name", ""),
+                    "category": row.get("category", ""),
+                    "region": row.get("region", ""),
+                    "aliases": [a for a in (row.get("aliases") or "").split(CSV_ALIAS_SEPARATOR) if a.strip()],
+                    "description": row.get("description") or None,
+                    "serving_grams": row.get("serving_grams") or 100,
+                    "nutritional_info": {field: row.get(field) for field in PER_100G_FIELDS}
+                }
+                for row in csv.DictReader(f)
+            ]
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+        if not isinstance(rows, list):
+            raise ValueError(f"{path}: expected a JSON list of foods")
+
+    foods = []
+    for number, row in enumerate(rows, 1):
+        try:
+            nutrition = row["nutritional_info"]
+            foods.append({
+                "name": str(row["name"]).strip(),
+                "category": str(row.get("category") or ""),
+                "region": str(row.get("region") or ""),
+                "aliases": [str(alias).strip() for alias in row.get("aliases") or []],
+                "description": row.get("description") or None,
+                "serving_grams": _number(row.get("serving_grams") or 100, "serving_grams"),
+                "nutritional_info": {field: _number(nutrition.get(field), field) for field in PER_100G_FIELDS}
+            })
+        except KeyError as e:
+            raise ValueError(f"{path}: food #{number} is missing {e}")
+        except (AttributeError, TypeError, ValueError) as e:
+            raise ValueError(f"{path}: invalid food #{number}: {e}")
+        if not foods[-1]["name"]:
+            raise ValueError(f"{path}: food #{number} has no name")
+    return foods
+
+
+def source_version(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(STORE_FORMAT + f.read()).hexdigest()[:16]
+
+
+def compile_catalog(source_path: str, store_dir: str) -> str:
+    """Compile a JSON/CSV catalog into .npy columns plus a string table; returns the version directory.
+
+    The search index's, dish matcher's and nutrition table's lookup arrays
+    are compiled alongside, so workers map them instead of each rebuilding
+    its own copy.
+
+    Versions are named by the source's content hash and written to a temp
+    directory that is renamed into place, so concurrent workers compiling
+    the same file never see a partial version.
+    """
+    version_dir = os.path.join(store_dir, VERSION_PREFIX + source_version(source_path))
+    if os.path.isdir(version_dir):
+        return version_dir
+
+    foods = read_source(source_path)
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".compiling-", dir=store_dir)
+    try:
+        strings = bytearray()
+        offsets = [0]
+        for food in foods:
+            for field in STRING_FIELDS:
+                value = food.get(field) or ""
+                if field == "aliases":
+                    value = ALIAS_SEPARATOR.join(value)
+                strings += value.encode("utf-8")
+                offsets.append(len(strings))
+
+        nutrition = np.array(
+            [[food["nutritional_info"][field] for field in PER_100G_FIELDS] for food in foods],
+            dtype=np.float64
+        ).reshape(len(foods), len(PER_100G_FIELDS))
+        np.save(os.path.join(tmp_dir, "nutrition.npy"), nutrition)
+        np.save(os.path.join(tmp_dir, "serving_grams.npy"),
+                np.array([food["serving_grams"] for food in foods], dtype=np.float64))
+        np.save(os.path.join(tmp_dir, "string_offsets.npy"), np.array(offsets, dtype=np.int64))
+        np.save(os.path.join(tmp_dir, "strings.npy"), np.frombuffer(bytes(strings), dtype=np.uint8))
+        for name, values in {**compile_search_arrays(foods), **compile_phrase_arrays(foods),
+                             **compile_name_arrays(foods)}.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+
+        try:
+            os.rename(tmp_dir, version_dir)
+        except OSError:
+            # Another worker published the same version first
+            if not os.path.isdir(version_dir):
+                raise
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Compiled {len(foods)} foods from {source_path} into {version_dir}")
+    prune_versions(store_dir, keep=version_dir)
+    return version_dir
+
+
+def prune_versions(store_dir: str, keep: str):
+    """Drop all but the newest versions; workers still mapping a removed one keep their mapping"""
+    versions = sorted(
+        (os.path.join(store_dir, name) for name in os.listdir(store_dir) if name.startswith(VERSION_PREFIX)),
+        key=os.path.getmtime, reverse=True
+    )
+    for path in versions[KEEP_VERSIONS:]:
+        if os.path.abspath(path) != os.path.abspath(keep):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class MappedCatalog(Sequence):
+    """Read-only food catalog backed by memory-mapped .npy columns.
+
+    Every worker maps the same files, so the pages are shared through the OS
+    page cache instead of each process holding its own copy of the list.
+    Foods are materialized as dicts (the shape of the old in-code list) only
+    when indexed.
+    """
+
+    def __init__(self, version_dir: str):
+        self.version_dir = version_dir
+        self.version = os.path.basename(version_dir)[len(VERSION_PREFIX):]
+        self.nutrition = np.load(os.path.join(version_dir, "nutrition.npy"), mmap_mode="r")
+        self.serving_grams = np.load(os.path.join(version_dir, "serving_grams.npy"), mmap_mode="r")
+        self._offsets = np.load(os.path.join(version_dir, "string_offsets.npy"), mmap_mode="r")
+        self._strings = np.load(os.path.join(version_dir, "strings.npy"), mmap_mode="r")
+        # Picked up by FoodSearchIndex, DishMatcher and NutritionTable in place of building their own
+        self.search_arrays = self._load_arrays(SEARCH_ARRAYS)
+        self.phrase_arrays = self._load_arrays(PHRASE_ARRAYS)
+        self.name_arrays = self._load_arrays(NAME_ARRAYS)
+
+    def _load_arrays(self, names) -> Dict[str, np.ndarray]:
+        return {name: np.load(os.path.join(self.version_dir, f"{name}.npy"), mmap_mode="r") for name in names}
+
+    def __len__(self) -> int:
+        return self.nutrition.shape[0]
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("catalog index out of range")
+
+        first = row * len(STRING_FIELDS)
+        offsets = self._offsets[first:first + len(STRING_FIELDS) + 1].tolist()
+        record = self._strings[offsets[0]:offsets[-1]].tobytes()
+        return self._food(record, offsets, float(self.serving_grams[row]), self.nutrition[row].tolist())
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        # Bulk-convert the columns once rather than touching the maps per field
+        offsets = self._offsets.tolist()
+        strings = self._strings.tobytes()
+        serving_grams = self.serving_grams.tolist()
+        nutrition = self.nutrition.tolist()
+        width = len(STRING_FIELDS)
+        for row in range(len(self)):
+            record_offsets = offsets[row * width:(row + 1) * width + 1]
+            record = strings[record_offsets[0]:record_offsets[-1]]
+            yield self._food(record, record_offsets, serving_grams[row], nutrition[row])
+
+    @staticmethod
+    def _food(record: bytes, offsets: List[int], serving_grams: float, nutrition: List[float]) -> Dict[str, Any]:
+        """Assemble one food dict from its string-table record and numeric columns"""
+        base = offsets[0]
+        name, category, region, aliases, description = (
+            record[start - base:end - base].decode("utf-8") for start, end in zip(offsets, offsets[1:])
+        )
+        food = {
+            "name": name,
+            "aliases": aliases.split(ALIAS_SEPARATOR) if aliases else [],
+            "category": category,
+            "region": region,
+            "serving_grams": serving_grams,
+            "nutritional_info": dict(zip(PER_100G_FIELDS, nutrition))
+        }
+        if description:
+            food["description"] = description
+        return food
+
+
+def load_catalog(source_path: str, store_dir: str) -> Tuple[MappedCatalog, bool]:
+    """Compile ``source_path`` if this content hasn't been compiled yet and map it; returns (catalog, compiled)"""
+    version_dir = os.path.join(store_dir, VERSION_PREFIX + source_version(source_path))
+    compiled = not os.path.isdir(version_dir)
+    if compiled:
+        version_dir = compile_catalog(source_path, store_dir)
+    return MappedCatalog(version_dir), compiled
@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+
+class UserDataVersions:
+    """Per-user monotonic data version behind the ETags of the read endpoints.
+
+    Every write to a user's meals bumps a counter in Mongo (so versions keep
+    increasing across restarts and are shared by all workers) and in this
+    process's cache. Conditional GETs compare against the cached version
+    without touching Mongo; entries older than ``ttl_seconds`` are re-read
+    so bumps made by other workers are picked up. With a single worker the
+    cache is always exact.
+    """
+
+    def __init__(self, collection, ttl_seconds: float = 1.0, max_entries: int = 10000):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._versions: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self.lookups = 0
+        self.loads = 0
+        self.not_modified: Dict[str, int] = {}
+        self.modified: Dict[str, int] = {}
+        self.unconditional: Dict[str, int] = {}
+
+    def _remember(self, user_id: str, version: int):
+        cached = self._versions.pop(user_id, None)
+        # A read that raced a bump must not move the version backwards
+        if cached is not None and cached[0] > version:
+            version = cached[0]
+        self._versions[user_id] = (version, time.monotonic())
+        while len(self._versions) > self.max_entries:
+            self._versions.popitem(last=False)
+
+    async def get(self, user_id: str) -> int:
+        self.lookups += 1
+        cached = self._versions.get(user_id)
+        if cached is not None and time.monotonic() - cached[1] < self.ttl_seconds:
+            self._versions.move_to_end(user_id)
+            return cached[0]
+
+        self.loads += 1
+        document = await self.collection.find_one({"_id": user_id}, {"version": 1})
+        version = document["version"] if document else 0
+        self._remember(user_id, version)
+        return self._versions[user_id][0]
+
+    async def bump(self, user_id: str) -> int:
+        document = await self.collection.find_one_and_update(
+            {"_id": user_id},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._remember(user_id, document["version"])
+        return document["version"]
+
+    async def bump_many(self, user_ids: Iterable[str]):
+        for user_id in set(user_ids):
+            await self.bump(user_id)
+
+    async def etag(self, user_id: str, view: str, *parts: Any) -> str:
+        """Weak ETag for one user's view; ``parts`` carry anything else the view depends on (e.g. the day)"""
+        version = await self.get(user_id)
+        suffix = "".join(f"-{part}" for part in parts)
+        return f'W/"{view}-{version}{suffix}"'
+
+    def matches(self, view: str, if_none_match: Optional[str], etag: str) -> bool:
+        """Whether the client's copy is current; counts the outcome per view"""
+        if not if_none_match:
+            counter = self.unconditional
+            hit = False
+        else:
+            # Weak comparison: proxies may drop the W/ prefix
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            hit = "*" in tags or etag.removeprefix("W/") in tags
+            counter = self.not_modified if hit else self.modified
+        counter[view] = counter.get(view, 0) + 1
+        return hit
+
+    def stats(self) -> Dict[str, Any]:
+        conditional = sum(self.not_modified.values()) + sum(self.modified.values())
+        return {
+            "cached_users": len(self._versions),
+            "version_lookups": self.lookups,
+            "version_loads": self.loads,
+            "not_modified": self.not_modified,
+            "modified": self.modified,
+            "unconditional": self.unconditional,
+            "hit_rate": round(sum(self.not_modified.values()) / conditional, 4) if conditional else 0.0
+        }
@@ -0,0 +1,222 @@
+import re
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from string_table import StringTable, pack_strings
+
+# (food_name, estimated_quantity, keywords), highest priority first
+DishClass = Tuple[str, float, Sequence[str]]
+
+_PARENTHETICAL_RE = re.compile(r"\([^)]*\)")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Longest phrase (in words) the matcher will look for
+MAX_PHRASE_WORDS = 8
+
+
+def words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def catalog_phrases(food: Dict[str, Any]) -> List[str]:
+    """Phrases that name a catalog food: "Roti/Chapati" -> roti, chapati, plus its aliases"""
+    name = _PARENTHETICAL_RE.sub("", food["name"])
+    phrases = [part.strip().lower() for part in name.split("/")]
+    phrases += [alias.strip().lower() for alias in food.get("aliases", [])]
+    return [phrase for phrase in phrases if phrase]
+
+
+@dataclass
+class DishMatch:
+    dish_class: Optional[DishClass] = None
+    foods: List[Dict[str, Any]] = field(default_factory=list)
+    # Best catalog food for the dish: first mentioned one of dish_class, else first mentioned
+    food: Optional[Dict[str, Any]] = None
+
+
+def phrase_hash(phrase: str) -> int:
+    """Stable 32-bit key of a phrase; collisions are resolved by comparing the phrase text"""
+    return zlib.crc32(phrase.encode("utf-8"))
+
+
+# Arrays compile_phrase_arrays produces; the catalog store saves them as <name>.npy
+PHRASE_ARRAYS = ("phrase_hashes", "phrase_offsets", "phrases", "phrase_food_starts", "phrase_foods",
+                 "phrase_max_words")
+
+
+def compile_phrase_arrays(foods: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Catalog phrase -> food indexes as flat arrays, sorted by phrase hash for np.searchsorted"""
+    phrase_foods: Dict[str, List[int]] = {}
+    for food_index, food in enumerate(foods):
+        # The full name first, so an exact name lookup prefers its own food
+        for phrase in [food["name"], *catalog_phrases(food)]:
+            indexes = phrase_foods.setdefault(" ".join(words(phrase)), [])
+            if not indexes or indexes[-1] != food_index:
+                indexes.append(food_index)
+    phrase_foods.pop("", None)
+
+    phrases = sorted(phrase_foods, key=phrase_hash)
+    sizes = np.fromiter((len(phrase_foods[phrase]) for phrase in phrases), dtype=np.int64, count=len(phrases))
+    offsets, text = pack_strings(phrases)
+    return {
+        "phrase_hashes": np.fromiter((phrase_hash(phrase) for phrase in phrases), dtype=np.uint32,
+                                     count=len(phrases)),
+        "phrase_offsets": offsets,
+        "phrases": text,
+        "phrase_food_starts": np.concatenate(([0], np.cumsum(sizes))).astype(np.int64),
+        "phrase_foods": np.fromiter((i for phrase in phrases for i in phrase_foods[phrase]), dtype=np.int32,
+                                    count=int(sizes.sum())),
+        "phrase_max_words": np.array([max((min(phrase.count(" ") + 1, MAX_PHRASE_WORDS) for phrase in phrases),
+                                          default=1)], dtype=np.int64),
+    }
+
+
+class DishMatcher:
+    """Single-pass dish recognition over free text.
+
+    Dish-class keywords live in a small dict keyed by their normalized
+    words; catalog names and aliases are a phrase table from
+    compile_phrase_arrays (memory-mapped from the catalog store when the
+    catalog is, so workers share it). Scanning walks the text's words once,
+    trying the longest phrase starting at each word first (optionally
+    plural), so the cost depends on the text, not on the catalog size. Each
+    phrase resolves to the dish classes and catalog foods it stands for,
+    including classes whose keyword is part of a longer phrase ("chicken
+    curry" -> meat and curry).
+    """
+
+    def __init__(self, foods: Sequence[Dict[str, Any]], dish_classes: Sequence[DishClass]):
+        self.dish_classes = list(dish_classes)
+        self.foods = foods
+
+        self._keyword_classes: Dict[str, List[int]] = {}
+        for class_index, (_, _, keywords) in enumerate(self.dish_classes):
+            for keyword in keywords:
+                self._keyword_classes.setdefault(" ".join(words(keyword)), []).append(class_index)
+
+        arrays = getattr(foods, "phrase_arrays", None) or compile_phrase_arrays(foods)
+        self._phrase_hashes = arrays["phrase_hashes"]
+        self._phrases = StringTable(arrays["phrase_offsets"], arrays["phrases"])
+        self._phrase_food_starts = arrays["phrase_food_starts"]
+        self._phrase_foods = arrays["phrase_foods"]
+        # Bounded memos: a scan keeps asking about the same few phrases and foods
+        self._classes = lru_cache(maxsize=8192)(self._phrase_classes)
+        self._food_classes = lru_cache(maxsize=4096)(self._classes_of_food)
+        self._max_words = int(arrays["phrase_max_words"][0])
+        for keyword in self._keyword_classes:
+            self._max_words = max(self._max_words, min(keyword.count(" ") + 1, MAX_PHRASE_WORDS))
+
+    def _catalog_foods(self, phrases: Sequence[str]) -> Dict[str, Tuple[int, ...]]:
+        """Food indexes for each of ``phrases`` that names catalog foods, in one vectorized probe"""
+        found: Dict[str, Tuple[int, ...]] = {}
+        count = len(self._phrase_hashes)
+        if not phrases or not count:
+            return found
+        keys = np.fromiter((phrase_hash(phrase) for phrase in phrases), dtype=np.uint32, count=len(phrases))
+        positions = np.searchsorted(self._phrase_hashes, keys)
+        hits = np.flatnonzero(self._phrase_hashes[np.minimum(positions, count - 1)] == keys)
+        for j in hits.tolist():
+            i, key = int(positions[j]), keys[j]
+            while i < count and self._phrase_hashes[i] == key:
+                if self._phrases[i] == phrases[j]:
+                    start, end = self._phrase_food_starts[i:i + 2].tolist()
+                    found[phrases[j]] = tuple(self._phrase_foods[start:end].tolist())
+                    break
+                i += 1
+        return found
+
+    def _phrase_classes(self, phrase: str) -> Tuple[int, ...]:
+        """Dish classes whose keyword is the phrase or a run of its words"""
+        phrase_words = phrase.split(" ")
+        classes = set()
+        for start in range(len(phrase_words)):
+            for end in range(start + 1, len(phrase_words) + 1):
+                classes.update(self._keyword_classes.get(" ".join(phrase_words[start:end]), ()))
+        return tuple(sorted(classes))
+
+    def _resolve(self, phrase: str, catalog: Dict[str, Tuple[int, ...]]
+                 ) -> Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+        foods = catalog.get(phrase)
+        if foods is None and phrase not in self._keyword_classes:
+            return None
+        return self._classes(phrase), foods or ()
+
+    def _classes_of_food(self, food_index: int) -> frozenset:
+        """Dish classes of any phrase naming the food"""
+        food = self.foods[food_index]
+        classes = set()
+        for phrase in [food["name"], *catalog_phrases(food)]:
+            classes.update(self._classes(" ".join(words(phrase))))
+        return frozenset(classes)
+
+    @staticmethod
+    def _spellings(phrase: str) -> List[str]:
+        """The phrase, then its singular forms: "samosas" -> "samosa", "dishes" -> "dish"""
+        spellings = [phrase]
+        if phrase.endswith("s"):
+            spellings.append(phrase[:-1])
+            if phrase.endswith("es"):
+                spellings.append(phrase[:-2])
+        return spellings
+
+    def _lookup(self, phrase_words: List[str], catalog: Dict[str, Tuple[int, ...]]
+                ) -> Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+        for spelling in self._spellings(" ".join(phrase_words)):
+            found = self._resolve(spelling, catalog)
+            if found is not None:
+                return found
+        return None
+
+    def scan(self, text: str) -> DishMatch:
+        """Highest-priority dish class and catalog foods (in order of mention) found in ``text``"""
+        match = DishMatch()
+        text_words = words(text or "")
+
+        # Probe every phrase the scan could try against the catalog at once
+        candidates = {
+            spelling
+            for start in range(len(text_words))
+            for end in range(start + 1, min(start + self._max_words, len(text_words)) + 1)
+            for spelling in self._spellings(" ".join(text_words[start:end]))
+        }
+        catalog = self._catalog_foods(list(candidates))
+
+        best_class = None
+        food_indexes: List[int] = []
+        position = 0
+        while position < len(text_words):
+            for length in range(min(self._max_words, len(text_words) - position), 0, -1):
+                found = self._lookup(text_words[position:position + length], catalog)
+                if found is not None:
+                    break
+            else:
+                position += 1
+                continue
+
+            classes, foods = found
+            if classes and (best_class is None or classes[0] < best_class):
+                best_class = classes[0]
+            food_indexes.extend(food_index for food_index in foods if food_index not in food_indexes)
+            position += length
+
+        match.foods = [self.foods[food_index] for food_index in food_indexes]
+        if best_class is not None:
+            match.dish_class = self.dish_classes[best_class]
+            food_indexes = [
+                i for i in food_indexes if best_class in self._food_classes(i)
+            ] or food_indexes
+        if food_indexes:
+            match.food = self.foods[food_indexes[0]]
+        return match
+
+    def find_food(self, name: str) -> Optional[Dict[str, Any]]:
+        """Catalog food for an exact name/alias, else the first one mentioned in ``name``"""
+        phrase = " ".join(words(name))
+        foods = self._catalog_foods([phrase]).get(phrase)
+        if foods:
+            return self.foods[foods[0]]
+        return self.scan(name).food
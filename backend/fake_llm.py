@@ -0,0 +1,61 @@
+import asyncio
+import random
+from typing import Any, AsyncIterator, Optional
+
+# Canned answer in the shape Gemini gives for a typical thali photo
+FAKE_RESPONSE = (
+    "This is Indian food: a plate of dal tadka with basmati rice and two rotis. "
+    "Estimated portion size about 350 grams. Confidence 8/10."
+)
+
+
+class FakeLlmError(Exception):
+    """Injected failure, standing in for a Gemini 5xx/quota error"""
+
+
+class FakeLlmChat:
+    """Local stand-in for ``LlmChat`` with injectable latency and errors.
+
+    Each call sleeps ``latency_seconds`` (plus up to ``jitter_seconds``);
+    ``slow_rate`` of calls take ``slow_seconds`` instead, to produce a tail,
+    and ``error_rate`` of calls raise ``FakeLlmError``. Select it with
+    ``LLM_BACKEND=fake`` to exercise timeouts, hedging and the circuit
+    breaker without a Gemini key.
+    """
+
+    def __init__(self, latency_seconds: float = 0.5, jitter_seconds: float = 0.2, slow_rate: float = 0.0,
+                 slow_seconds: float = 10.0, error_rate: float = 0.0, response: str = FAKE_RESPONSE,
+                 seed: Optional[int] = None):
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.error_rate = error_rate
+        self.response = response
+        self._random = random.Random(seed)
+
+    def with_model(self, provider: str, model: str) -> "FakeLlmChat":
+        return self
+
+    def _delay(self) -> float:
+        if self._random.random() < self.slow_rate:
+            return self.slow_seconds
+        return self.latency_seconds + self._random.random() * self.jitter_seconds
+
+    async def send_message(self, message: Any) -> str:
+        await asyncio.sleep(self._delay())
+        if self._random.random() < self.error_rate:
+            raise FakeLlmError("Injected LLM failure")
+        return self.response
+
+    async def stream_message(self, message: Any, chunks: int = 8) -> AsyncIterator[str]:
+        """The same response in ``chunks`` pieces spread over the call's latency"""
+        words = self.response.split(" ")
+        size = max(1, -(-len(words) // chunks))
+        pause = self._delay() / -(-len(words) // size)
+        fail_at = self._random.randrange(len(words)) if self._random.random() < self.error_rate else None
+        for start in range(0, len(words), size):
+            await asyncio.sleep(pause)
+            if fail_at is not None and start + size > fail_at:
+                raise FakeLlmError("Injected LLM failure mid-stream")
+            yield " ".join(words[start:start + size]) + (" " if start + size < len(words) else "")
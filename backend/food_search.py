@@ -0,0 +1,302 @@
+import bisect
+import re
+import unicodedata
+from array import array
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from string_table import StringTable, pack_strings
+
+# Relative importance of the field a query term matched in
+FIELD_WEIGHTS = {"name": 3.0, "alias": 2.5, "category": 1.0, "region": 0.5}
+
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.85
+FUZZY_SCORE = 0.7
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip accents and split into alphanumeric tokens"""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return _TOKEN_RE.findall(text.lower())
+
+
+def trigrams(token: str) -> List[str]:
+    padded = f"  {token} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def max_typos(token: str) -> int:
+    return 0 if len(token) <= 3 else 1 if len(token) <= 6 else 2
+
+
+def bounded_levenshtein(a: str, b: str, limit: int) -> int:
+    """Edit distance, giving up early (returning limit + 1) once it must exceed ``limit``"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, char_b in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            current.append(cost)
+            row_min = min(row_min, cost)
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def gram_key(gram: str) -> int:
+    """A trigram's three ASCII bytes (tokens are [a-z0-9], padded with spaces) packed into one integer"""
+    return int.from_bytes(gram.encode("ascii"), "big")
+
+
+# Arrays compile_search_arrays produces; the catalog store saves them as <name>.npy
+SEARCH_ARRAYS = (
+    "search_vocab_offsets", "search_vocab", "search_posting_starts", "search_posting_ids",
+    "search_posting_weights", "search_trigram_keys", "search_trigram_starts", "search_trigram_tokens",
+    "search_name_lengths", "search_category_codes", "search_region_codes",
+    "search_category_offsets", "search_categories", "search_region_offsets", "search_regions",
+)
+
+
+def compile_search_arrays(foods: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Everything FoodSearchIndex needs, as flat arrays that can be saved and memory-mapped"""
+    postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+    categories: Dict[str, int] = {}
+    regions: Dict[str, int] = {}
+    category_codes = np.empty(len(foods), dtype=np.int32)
+    region_codes = np.empty(len(foods), dtype=np.int32)
+    name_lengths = np.empty(len(foods), dtype=np.int32)
+
+    for food_id, food in enumerate(foods):
+        name_lengths[food_id] = len(food["name"])
+        fields = [("name", food["name"]), ("category", food.get("category", "")),
+                  ("region", food.get("region", ""))]
+        fields += [("alias", alias) for alias in food.get("aliases", [])]
+        for field, text in fields:
+            for token in tokenize(text):
+                weight = FIELD_WEIGHTS[field]
+                if postings[token].get(food_id, 0) < weight:
+                    postings[token][food_id] = weight
+        category_codes[food_id] = categories.setdefault(food.get("category", "").lower(), len(categories))
+        region_codes[food_id] = regions.setdefault(food.get("region", "").lower(), len(regions))
+
+    # Postings in CSR form: token i owns entries posting_starts[i]:posting_starts[i + 1]
+    vocabulary = sorted(postings)
+    sizes = np.fromiter((len(postings[token]) for token in vocabulary), dtype=np.int64, count=len(vocabulary))
+    posting_starts = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+    posting_ids = np.empty(int(posting_starts[-1]), dtype=np.int32)
+    posting_weights = np.empty(int(posting_starts[-1]), dtype=np.float32)
+    for token_id, token in enumerate(vocabulary):
+        start, end = posting_starts[token_id], posting_starts[token_id + 1]
+        entries = postings.pop(token)
+        posting_ids[start:end] = np.fromiter(entries.keys(), dtype=np.int32, count=end - start)
+        posting_weights[start:end] = np.fromiter(entries.values(), dtype=np.float32, count=end - start)
+
+    # Trigram -> vocabulary token ids, also CSR, keyed by sorted gram_key
+    grams: Dict[int, array] = defaultdict(lambda: array("i"))
+    for token_id, token in enumerate(vocabulary):
+        for gram in set(trigrams(token)):
+            grams[gram_key(gram)].append(token_id)
+    trigram_keys = np.array(sorted(grams), dtype=np.int64)
+    trigram_sizes = np.fromiter((len(grams[key]) for key in trigram_keys.tolist()), dtype=np.int64,
+                                count=len(trigram_keys))
+    trigram_starts = np.concatenate(([0], np.cumsum(trigram_sizes))).astype(np.int64)
+    trigram_tokens = np.empty(int(trigram_starts[-1]), dtype=np.int32)
+    for i, key in enumerate(trigram_keys.tolist()):
+        trigram_tokens[trigram_starts[i]:trigram_starts[i + 1]] = np.frombuffer(grams.pop(key), dtype=np.int32)
+
+    vocab_offsets, vocab = pack_strings(vocabulary)
+    category_offsets, category_names = pack_strings(categories)
+    region_offsets, region_names = pack_strings(regions)
+    return {
+        "search_vocab_offsets": vocab_offsets,
+        "search_vocab": vocab,
+        "search_posting_starts": posting_starts,
+        "search_posting_ids": posting_ids,
+        "search_posting_weights": posting_weights,
+        "search_trigram_keys": trigram_keys,
+        "search_trigram_starts": trigram_starts,
+        "search_trigram_tokens": trigram_tokens,
+        "search_name_lengths": name_lengths,
+        "search_category_codes": category_codes,
+        "search_region_codes": region_codes,
+        "search_category_offsets": category_offsets,
+        "search_categories": category_names,
+        "search_region_offsets": region_offsets,
+        "search_regions": region_names,
+    }
+
+
+class FoodSearchIndex:
+    """Ranked search over the food catalog.
+
+    Every distinct token of a food's name, aliases, category and region goes
+    into a vocabulary with postings (food, field weight). A query term is
+    resolved against the vocabulary by exact lookup, then prefix range (bisect
+    over the sorted vocabulary), then trigram candidates verified with a
+    bounded edit distance for typos. All terms must match; foods are ranked
+    by summed term score x field weight.
+
+    The vocabulary, postings and trigram lists are flat arrays from
+    compile_search_arrays. A memory-mapped catalog carries them compiled
+    into its store, so every worker maps the same pages; a plain list of
+    foods is compiled in memory.
+
+    Scores are accumulated in dense NumPy arrays and only the requested page
+    is ordered (argpartition), so broad queries never sort every match.
+    Candidate sets are memoized per (query, filters) for cheap paging, in
+    an LRU bounded by entry count and by total array bytes; a set larger
+    than a quarter of the byte budget (a broad prefix over a big catalog)
+    is recomputed instead of pinning memory.
+    """
+
+    def __init__(self, foods: Sequence[Dict[str, Any]], cache_size: int = 1024,
+                 cache_max_bytes: int = 16 * 1024 * 1024):
+        self.foods = foods
+        self.cache_size = cache_size
+        self.cache_max_bytes = cache_max_bytes
+        self._cache: "OrderedDict[tuple, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._cache_bytes = 0
+
+        arrays = getattr(foods, "search_arrays", None) or compile_search_arrays(foods)
+        self.vocabulary = StringTable(arrays["search_vocab_offsets"], arrays["search_vocab"])
+        self._posting_starts = arrays["search_posting_starts"]
+        self._posting_ids = arrays["search_posting_ids"]
+        self._posting_weights = arrays["search_posting_weights"]
+        self._trigram_keys = arrays["search_trigram_keys"]
+        self._trigram_starts = arrays["search_trigram_starts"]
+        self._trigram_tokens = arrays["search_trigram_tokens"]
+        self._category_codes = arrays["search_category_codes"]
+        self._region_codes = arrays["search_region_codes"]
+        # A handful of distinct values each
+        self._categories = {name: code for code, name in enumerate(
+            StringTable(arrays["search_category_offsets"], arrays["search_categories"]))}
+        self._regions = {name: code for code, name in enumerate(
+            StringTable(arrays["search_region_offsets"], arrays["search_regions"]))}
+        # Shorter names first among equal scores: "Dal" before "Dal Makhani Special"
+        self._tiebreak = arrays["search_name_lengths"]
+
+    def __len__(self) -> int:
+        return len(self.foods)
+
+    def search(self, query: str = "", category: Optional[str] = None, region: Optional[str] = None,
+               offset: int = 0, limit: int = 10) -> Tuple[List[Dict[str, Any]], int]:
+        """Return one page of ranked matches and the total match count"""
+        terms = tuple(tokenize(query))
+        key = (terms, (category or "").lower(), (region or "").lower())
+        candidates = self._cache.get(key)
+        if candidates is None:
+            candidates = self._candidates(terms, key[1], key[2])
+            self._remember(key, candidates)
+        else:
+            self._cache.move_to_end(key)
+
+        food_ids, rank_keys = candidates
+        total = len(food_ids)
+        end = min(offset + limit, total)
+        if offset >= end:
+            return [], total
+
+        # Order only the top `end` candidates instead of all of them
+        if end < total:
+            top = np.argpartition(-rank_keys, end - 1)[:end]
+        else:
+            top = np.arange(total)
+        top = top[np.argsort(-rank_keys[top], kind="stable")]
+        return [self.foods[food_id] for food_id in food_ids[top[offset:end]].tolist()], total
+
+    def _remember(self, key: tuple, candidates: Tuple[np.ndarray, np.ndarray]):
+        size = sum(array.nbytes for array in candidates)
+        if size > self.cache_max_bytes // 4:
+            return
+        self._cache[key] = candidates
+        self._cache_bytes += size
+        while len(self._cache) > self.cache_size or self._cache_bytes > self.cache_max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= sum(array.nbytes for array in evicted)
+
+    def cache_stats(self) -> Dict[str, int]:
+        return {"entries": len(self._cache), "bytes": self._cache_bytes, "max_bytes": self.cache_max_bytes}
+
+    def _allowed(self, category: str, region: str) -> Optional[np.ndarray]:
+        allowed = None
+        if category:
+            allowed = self._category_codes == self._categories.get(category, -1)
+        if region:
+            # Foods eaten everywhere ("all") match any regional filter
+            regional = np.isin(self._region_codes, [self._regions.get(region, -1), self._regions.get("all", -1)])
+            allowed = regional if allowed is None else allowed & regional
+        return allowed
+
+    def _candidates(self, terms: Tuple[str, ...], category: str, region: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Matching food ids and their rank keys (higher is better)"""
+        allowed = self._allowed(category, region)
+
+        if not terms:
+            # No query: catalog order, filtered
+            food_ids = np.arange(len(self.foods)) if allowed is None else np.flatnonzero(allowed)
+            return food_ids, -food_ids.astype(np.float64)
+
+        totals = np.zeros(len(self.foods))
+        matched = np.ones(len(self.foods), dtype=bool) if allowed is None else allowed
+        for term in terms:
+            term_scores = self._term_scores(term)
+            matched &= term_scores > 0
+            totals += term_scores
+
+        food_ids = np.flatnonzero(matched)
+        # Score dominates; name length then catalog position break ties
+        rank_keys = totals[food_ids] * 1e6 - self._tiebreak[food_ids] - food_ids * 1e-6
+        return food_ids, rank_keys
+
+    def _term_scores(self, term: str) -> np.ndarray:
+        """Best score per food for a single query term (0 where it doesn't match)"""
+        scores = np.zeros(len(self.foods))
+        for token_id, quality in self._match_tokens(term):
+            start, end = self._posting_starts[token_id], self._posting_starts[token_id + 1]
+            np.maximum.at(scores, self._posting_ids[start:end], quality * self._posting_weights[start:end])
+        return scores
+
+    def _match_tokens(self, term: str) -> List[Tuple[int, float]]:
+        matches = []
+        start = bisect.bisect_left(self.vocabulary, term)
+        if start < len(self.vocabulary) and self.vocabulary[start] == term:
+            matches.append((start, EXACT_SCORE))
+            start += 1
+
+        # Prefix matches ("pan" -> "paneer") via the sorted vocabulary
+        end = bisect.bisect_left(self.vocabulary, term + "\x7f", lo=start)
+        matches.extend((token_id, PREFIX_SCORE) for token_id in range(start, min(end, start + 200)))
+        if matches:
+            return matches
+
+        # Typo tolerance: tokens sharing enough trigrams, confirmed by edit distance
+        limit = max_typos(term)
+        if limit == 0:
+            return matches
+        grams = set(trigrams(term))
+        overlap: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            key = gram_key(gram)
+            i = int(np.searchsorted(self._trigram_keys, key))
+            if i < len(self._trigram_keys) and self._trigram_keys[i] == key:
+                start, end = self._trigram_starts[i:i + 2].tolist()
+                for token_id in self._trigram_tokens[start:end].tolist():
+                    overlap[token_id] += 1
+
+        needed = max(1, len(grams) - 3 * limit)
+        for token_id, shared in overlap.items():
+            if shared < needed:
+                continue
+            distance = bounded_levenshtein(term, self.vocabulary[token_id], limit)
+            if distance <= limit:
+                matches.append((token_id, FUZZY_SCORE * (1 - distance / (len(term) + 1))))
+        return matches
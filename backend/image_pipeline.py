@@ -0,0 +1,70 @@
+import asyncio
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from image_prefilter import assess_image
+from perceptual_index import dhash
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_image(image_bytes: bytes, max_edge: int = 1024, quality: int = 80) -> bytes:
+    """Decode, EXIF-orient, downsize to ``max_edge`` and re-encode as JPEG"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        needs_rotation = img.getexif().get(0x0112, 1) != 1  # EXIF Orientation tag
+        needs_resize = max(img.size) > max_edge
+        if not needs_rotation and not needs_resize and img.format == "JPEG":
+            return image_bytes
+
+        img = ImageOps.exif_transpose(img)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        output = io.BytesIO()
+        img.save(output, format="JPEG", quality=quality, optimize=True)
+
+    normalized = output.getvalue()
+    if len(normalized) >= len(image_bytes) and not needs_rotation:
+        return image_bytes
+    return normalized
+
+
+def prepare_image(image_bytes: bytes, max_edge: int = 1024, quality: int = 80,
+                  prefilter: bool = True) -> Tuple[bytes, int, Optional[Dict[str, Any]]]:
+    """Normalize an image, compute its perceptual hash and (optionally) prefilter it in a single worker round trip"""
+    normalized = normalize_image(image_bytes, max_edge, quality)
+    return normalized, dhash(normalized), assess_image(normalized) if prefilter else None
+
+
+class ImagePipeline:
+    """Runs Pillow work in a process pool so the event loop never decodes images itself"""
+
+    def __init__(self, max_edge: int = 1024, quality: int = 80, max_workers: Optional[int] = None):
+        self.max_edge = max_edge
+        self.quality = quality
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, func, *args):
+        """Run any picklable image function on the pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def prepare(self, image_bytes: bytes, prefilter: bool = True) -> Tuple[bytes, int, Optional[Dict[str, Any]]]:
+        return await self.run(prepare_image, image_bytes, self.max_edge, self.quality, prefilter)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,155 @@
+import io
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Longest edge the checks look at; JPEGs are decoded straight at roughly this size
+ASSESS_EDGE = 256
+
+# Conservative limits: only images no analysis could use are rejected.
+# Calibrated on 256px thumbnails (luminance 0-255).
+MIN_BRIGHT_LEVEL = 35        # 99th percentile luminance below this: essentially black
+MAX_DARK_LEVEL = 235         # 1st percentile above this: blown out
+MIN_CONTRAST = 12            # p99 - p1 below this: blank/uniform frame
+MIN_SHARPNESS = 6.0          # variance of the Laplacian; sharp photos score in the hundreds+
+MIN_COLORFULNESS = 3.0       # Hasan-Suesstrunk colorfulness; grayscale images score ~0
+MAX_FLAT_FRACTION = 0.5      # screenshots/graphics: large noise-free areas...
+MAX_CLIPPED_FRACTION = 0.4   # ...mostly pure white or black
+
+# User-facing explanation for each rejection reason
+REJECTION_MESSAGES = {
+    "too_dark": "The photo is too dark to analyze. Please retake it in better light.",
+    "overexposed": "The photo is overexposed. Please retake it without direct glare or flash.",
+    "blank": "The photo looks blank. Please take a photo of your meal.",
+    "blurry": "The photo is too blurry to analyze. Please hold the camera steady and retake it.",
+    "monochrome": "The photo has no color information. Please take a color photo of your meal.",
+    "not_photo": "This looks like a screenshot or graphic rather than a photo of food. Please take a photo of your meal."
+}
+
+
+def assess_image(image_bytes: bytes) -> Dict[str, Any]:
+    """Cheap quality and plausibility checks; returns {"reason": str or None, "metrics": {...}}.
+
+    Exposure, contrast and blur come from luminance percentiles and the
+    Laplacian variance; a small color/texture rule set flags grayscale
+    images and screenshots (large flat areas of clipped white/black).
+    Hue is deliberately not used: green, brown and white dishes are all
+    common, so it can't separate food from non-food reliably.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img.draft("RGB", (ASSESS_EDGE, ASSESS_EDGE))  # JPEG: decode at reduced scale
+        img = img.convert("RGB")
+        img.thumbnail((ASSESS_EDGE, ASSESS_EDGE))
+        rgb = np.asarray(img, dtype=np.float32)
+
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    dark_level, bright_level = np.percentile(gray, (1, 99))
+    laplacian = (4 * gray[1:-1, 1:-1] - gray[:-2, 1:-1] - gray[2:, 1:-1]
+                 - gray[1:-1, :-2] - gray[1:-1, 2:])
+    # Within +-1 of both neighbours: flat even allowing for JPEG noise
+    flat = ((np.abs(gray[1:, 1:] - gray[:-1, 1:]) <= 1) & (np.abs(gray[1:, 1:] - gray[1:, :-1]) <= 1)).mean()
+    clipped = ((gray >= 250) | (gray <= 5)).mean()
+    rg = rgb[..., 0] - rgb[..., 1]
+    yb = 0.5 * (rgb[..., 0] + rgb[..., 1]) - rgb[..., 2]
+    colorfulness = np.hypot(rg.std(), yb.std()) + 0.3 * np.hypot(rg.mean(), yb.mean())
+
+    metrics = {
+        "dark_level": round(float(dark_level), 1),
+        "bright_level": round(float(bright_level), 1),
+        "sharpness": round(float(laplacian.var()), 1),
+        "flat_fraction": round(float(flat), 3),
+        "clipped_fraction": round(float(clipped), 3),
+        "colorfulness": round(float(colorfulness), 1)
+    }
+
+    reason = None
+    if bright_level < MIN_BRIGHT_LEVEL:
+        reason = "too_dark"
+    elif dark_level > MAX_DARK_LEVEL:
+        reason = "overexposed"
+    elif bright_level - dark_level < MIN_CONTRAST:
+        reason = "blank"
+    elif metrics["sharpness"] < MIN_SHARPNESS:
+        reason = "blurry"
+    elif metrics["colorfulness"] < MIN_COLORFULNESS:
+        reason = "monochrome"
+    elif flat > MAX_FLAT_FRACTION and clipped > MAX_CLIPPED_FRACTION:
+        reason = "not_photo"
+    return {"reason": reason, "metrics": metrics}
+
+
+def rejected_analysis(reason: str) -> Dict[str, Any]:
+    """The analyze-meal payload for an image the prefilter turned away"""
+    return {
+        "food_name": "Unable to analyze image",
+        "estimated_quantity": None,
+        "nutrition": {
+            "calories": None,
+            "protein": None,
+            "carbs": None,
+            "fat": None,
+            "fiber": None
+        },
+        "ai_analysis": REJECTION_MESSAGES[reason],
+        "confidence": 1,
+        "is_indian_food": False,
+        "rejected_reason": reason
+    }
+
+
+class PrefilterLog:
+    """Counts prefilter decisions and records every rejection for later review.
+
+    In ``shadow`` mode (the default) images that would be rejected still go
+    to the LLM, so the recorded decisions can be checked against what
+    Gemini said before the filter is enforced.
+    """
+
+    def __init__(self, collection, mode: str = "shadow"):
+        if mode not in ("enforce", "shadow", "off"):
+            raise ValueError(f"Unknown prefilter mode: {mode}")
+        self.collection = collection
+        self.mode = mode
+        self.checked = 0
+        self.passed = 0
+        self.rejected: Dict[str, int] = {}
+
+    async def record(self, cache_key: str, assessment: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Count one decision; returns the rejection reason if the LLM call should be skipped"""
+        if self.mode == "off" or assessment is None:
+            return None
+
+        self.checked += 1
+        reason = assessment["reason"]
+        if reason is None:
+            self.passed += 1
+            return None
+
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        try:
+            await self.collection.insert_one({
+                "cache_key": cache_key,
+                "reason": reason,
+                "metrics": assessment["metrics"],
+                "enforced": self.mode == "enforce",
+                "created_at": datetime.utcnow()
+            })
+        except Exception as e:
+            logger.warning(f"Error recording prefilter decision: {str(e)}")
+        return reason if self.mode == "enforce" else None
+
+    def stats(self) -> Dict[str, Any]:
+        rejected = sum(self.rejected.values())
+        return {
+            "mode": self.mode,
+            "checked": self.checked,
+            "passed": self.passed,
+            "rejected": self.rejected,
+            "llm_calls_saved": rejected if self.mode == "enforce" else 0,
+            "reject_rate": round(rejected / self.checked, 4) if self.checked else 0.0
+        }
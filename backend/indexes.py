@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Declarative index definitions and query-plan verification.
+
+Every index the API relies on is listed in INDEXES and created at startup.
+production_queries() mirrors the find(), aggregate() and distinct() shapes
+server.py issues; check_query_plans runs explain() on each one and flags any
+that fall back to a COLLSCAN.
+
+    python indexes.py --ensure --check
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from meal_aggregates import nutrition_pipeline
+from rollups import rebuild_pipeline
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "meals": [
+        # History listing, summary/protein windows and retention boundaries
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                   name="user_timestamp"),
+        # Deduplicates replayed offline-sync meals; meals logged without a key are not indexed
+        IndexModel([("user_id", ASCENDING), ("idempotency_key", ASCENDING)], name="user_idempotency_key",
+                   unique=True, partialFilterExpression={"idempotency_key": {"$type": "string"}}),
+        # Meals whose image is still embedded, for the startup blob migration; empty once it has run
+        IndexModel([("image_base64", ASCENDING)], name="inline_images",
+                   partialFilterExpression={"image_base64": {"$type": "string"}}),
+    ],
+    "analysis_cache": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "daily_rollups": [
+        IndexModel([("user_id", ASCENDING), ("day", ASCENDING)], name="user_day"),
+    ],
+    "image_hashes": [
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+    ],
+    "analysis_jobs": [
+        # Workers claim the oldest queued job; depth counts queued ones
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "prefilter_decisions": [
+        # Rejections are kept for a month of review
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=30 * 24 * 60 * 60),
+    ],
+}
+
+
+def production_queries() -> List[Dict[str, Any]]:
+    """The query shapes server.py issues, with representative parameters.
+
+    Entries are find() filters unless they carry a ``pipeline`` (aggregate)
+    or a ``distinct`` key.
+    """
+    now = datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    user_id = "default_user"
+    return [
+        {
+            "name": "recent_meals",
+            "collection": "meals",
+            "filter": {"user_id": user_id},
+            "sort": {"timestamp": -1, "_id": -1},
+            "limit": 15,
+        },
+        {
+            "name": "meal_history_page",
+            "collection": "meals",
+            "filter": {
+                "user_id": user_id,
+                "timestamp": {"$lte": now, "$gte": now - timedelta(days=365)},
+                "$or": [
+                    {"timestamp": {"$lt": now}},
+                    {"timestamp": now, "_id": {"$lt": ObjectId()}}
+                ]
+            },
+            "sort": {"timestamp": -1, "_id": -1},
+            "limit": 15,
+        },
+        {
+            "name": "nutrition_summary",
+            "collection": "meals",
+            "filter": {"user_id": user_id, "timestamp": {"$gte": now - timedelta(days=30)}},
+        },
+        {
+            "name": "summary_partial_day",
+            "collection": "meals",
+            "filter": {"user_id": user_id, "timestamp": {"$gte": now - timedelta(days=30), "$lt": now}},
+        },
+        {
+            "name": "summary_rollups",
+            "collection": "daily_rollups",
+            "filter": {"user_id": user_id, "day": {"$gt": "2024-01-01"}},
+        },
+        {
+            # Summary in aggregate mode, and windows served before the rollup backfill finishes
+            "name": "summary_aggregate",
+            "collection": "meals",
+            "pipeline": nutrition_pipeline({"user_id": user_id, "timestamp": {"$gte": now - timedelta(days=30)}}),
+        },
+        {
+            "name": "summary_grouped",
+            "collection": "meals",
+            "pipeline": nutrition_pipeline({"user_id": user_id, "timestamp": {"$gte": now - timedelta(days=30)}}, "day"),
+        },
+        {
+            # Protein recommendations and the dashboard's today totals
+            "name": "today_aggregate",
+            "collection": "meals",
+            "pipeline": nutrition_pipeline({"user_id": user_id, "timestamp": {"$gte": today_start}}),
+        },
+        {
+            "name": "rollup_rebuild",
+            "collection": "meals",
+            "pipeline": rebuild_pipeline(user_id),
+        },
+        {
+            "name": "rollup_rebuild_users",
+            "collection": "meals",
+            "distinct": "user_id",
+        },
+        {
+            "name": "rollup_rebuild_stale_users",
+            "collection": "daily_rollups",
+            "distinct": "user_id",
+            "filter": {"user_id": {"$type": "string"}},
+        },
+        {
+            "name": "rollup_rebuild_versions",
+            "collection": "daily_rollups",
+            "filter": {"user_id": user_id},
+        },
+        {
+            # Also each meal a retention sweep claims with find_one_and_delete
+            "name": "meal_by_id",
+            "collection": "meals",
+            "filter": {"_id": ObjectId()},
+        },
+        {
+            "name": "idempotency_lookup",
+            "collection": "meals",
+            "filter": {
+                "$or": [
+                    {"user_id": user_id, "idempotency_key": {"$in": ["offline-1", "offline-2"]}}
+                ]
+            },
+        },
+        {
+            "name": "retention_boundary",
+            "collection": "meals",
+            "filter": {"user_id": user_id},
+            "sort": {"timestamp": -1, "_id": -1},
+            "skip": 14,
+            "limit": 1,
+        },
+        {
+            "name": "retention_expired",
+            "collection": "meals",
+            "filter": {
+                "user_id": user_id,
+                "$or": [
+                    {"timestamp": {"$lt": now}},
+                    {"timestamp": now, "_id": {"$lte": ObjectId()}}
+                ]
+            },
+            "limit": 500,
+        },
+        {
+            "name": "inline_image_claim",
+            "collection": "meals",
+            "filter": {
+                "image_base64": {"$type": "string"},
+                "$or": [
+                    {"image_migrating": {"$exists": False}},
+                    {"image_migrating": {"$lt": now - timedelta(minutes=10)}}
+                ]
+            },
+        },
+        {
+            "name": "analysis_cache_lookup",
+            "collection": "analysis_cache",
+            "filter": {"_id": "0" * 64, "expires_at": {"$gt": now}},
+        },
+        {
+            "name": "perceptual_sync",
+            "collection": "image_hashes",
+            "filter": {"created_at": {"$gte": now}},
+            "sort": {"created_at": 1},
+        },
+        {
+            "name": "perceptual_candidates",
+            "collection": "image_hashes",
+            "filter": {"_id": {"$in": ["0" * 64]}, "description": ""},
+        },
+        {
+            "name": "blob_meta",
+            "collection": "meal_images_meta",
+            "filter": {"_id": "0" * 64},
+        },
+        {
+            "name": "analysis_job_claim",
+            "collection": "analysis_jobs",
+            "filter": {"status": "queued"},
+            "sort": {"created_at": 1},
+            "limit": 1,
+        },
+        {
+            "name": "analysis_job_stale",
+            "collection": "analysis_jobs",
+            "filter": {"status": "running", "started_at": {"$lt": now}},
+        },
+        {
+            "name": "user_settings",
+            "collection": "user_settings",
+            "filter": {"_id": "default_user"},
+        },
+    ]
+
+
+async def ensure_indexes(db):
+    """Create every declared index (a no-op for ones that already exist)"""
+    for collection, models in INDEXES.items():
+        await db[collection].create_indexes(models)
+
+
+def plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten the stage names of an explain() plan tree"""
+    stages = []
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return stages
+
+
+def winning_plan(explained: Dict[str, Any]) -> Dict[str, Any]:
+    """Winning plan of a find/distinct explain, or of the $cursor stage an aggregate's $match runs in"""
+    if "queryPlanner" in explained:
+        return explained["queryPlanner"]["winningPlan"]
+    for stage in explained.get("stages", []):
+        if "$cursor" in stage:
+            return stage["$cursor"]["queryPlanner"]["winningPlan"]
+    raise ValueError("explain output has no query plan")
+
+
+async def explain_query(db, query: Dict[str, Any]) -> Dict[str, Any]:
+    if "pipeline" in query:
+        command = {"aggregate": query["collection"], "pipeline": query["pipeline"], "cursor": {}}
+    elif "distinct" in query:
+        command = {"distinct": query["collection"], "key": query["distinct"], "query": query.get("filter", {})}
+    else:
+        command = {"find": query["collection"], "filter": query["filter"]}
+        for option in ("sort", "skip", "limit"):
+            if option in query:
+                command[option] = query[option]
+
+    explained = await db.command({"explain": command, "verbosity": "queryPlanner"})
+    stages = plan_stages(winning_plan(explained))
+    return {
+        "name": query["name"],
+        "collection": query["collection"],
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages
+    }
+
+
+async def check_query_plans(db) -> Dict[str, Any]:
+    """Explain every production query; ``ok`` is False if any of them scans a whole collection"""
+    plans = [await explain_query(db, query) for query in production_queries()]
+    return {
+        "ok": not any(plan["collscan"] for plan in plans),
+        "plans": plans
+    }
+
+
+async def main(args) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    db = client[os.environ.get('DB_NAME', 'calorie_tracker')]
+    try:
+        if args.ensure:
+            await ensure_indexes(db)
+            print("✅ Indexes ensured")
+
+        if args.check:
+            report = await check_query_plans(db)
+            for plan in report["plans"]:
+                status = "❌ COLLSCAN" if plan["collscan"] else "✅"
+                print(f"{status} {plan['name']:<26} {' <- '.join(plan['stages'])}")
+            return 0 if report["ok"] else 1
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ensure", action="store_true", help="create all declared indexes")
+    parser.add_argument("--check", action="store_true", help="explain production queries, exit 1 on COLLSCAN")
+    args = parser.parse_args()
+    if not (args.ensure or args.check):
+        parser.error("nothing to do, pass --ensure and/or --check")
+    sys.exit(asyncio.run(main(args)))
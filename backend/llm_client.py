@@ -0,0 +1,320 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+SYSTEM_MESSAGE = (
+    "You are a nutritionist AI specialized in Indian cuisine. "
+    "Analyze food images and provide detailed nutritional information."
+)
+
+# Analysis prompt, split once around the description slot so building it is a concatenation
+PROMPT_TEMPLATE = """
+        Analyze this food image carefully and provide a detailed analysis:
+        
+        IMPORTANT INSTRUCTIONS:
+        1. First, determine if this is Indian food or cuisine
+        2. If it's NOT Indian food, respond with "NOT_INDIAN_FOOD" and stop analysis
+        3. If it IS Indian food, provide detailed nutritional analysis
+        
+        For INDIAN FOOD only, analyze:
+        - Identify specific Indian dishes (dal, rice, roti, sabzi, etc.)
+        - Estimate realistic portion size in grams based on image
+        - Provide accurate nutritional values based on the specific Indian foods identified
+        - Give confidence level of your analysis (1-10)
+        
+        Additional context: {description}
+        
+        Format your response clearly:
+        - If NOT Indian food: Just write "NOT_INDIAN_FOOD - This appears to be [food type] which is not Indian cuisine"
+        - If Indian food: Provide detailed analysis of the specific dishes, realistic portion size, and accurate nutrition facts
+        
+        Be very accurate with portion sizes and nutrition - don't guess wildly.
+        """
+_PROMPT_HEAD, _PROMPT_TAIL = PROMPT_TEMPLATE.split("{description}")
+
+
+def build_prompt(description: str = "") -> str:
+    return _PROMPT_HEAD + description + _PROMPT_TAIL
+
+
+class LlmClientPool:
+    """Pre-built chat clients, checked out by one request at a time.
+
+    ``LlmChat`` is conversation-scoped: a client used for ``max_uses``
+    requests carries that history, so with the default of 1 no client is
+    ever reused. Instead a spent client is replaced by a callback scheduled
+    with ``loop.call_soon``: the request that released it doesn't wait for
+    construction, and the next request usually finds a client ready. The
+    construction itself still runs on the event loop. A request that finds
+    the pool empty builds its own client inline (counted in ``misses``).
+    Raise ``max_uses`` for SDK builds whose clients are stateless.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 4, max_uses: int = 1):
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self._idle: List[Tuple[Any, int]] = []
+        self._refilling = 0
+        self.created = 0
+        self.reused = 0
+        self.misses = 0
+
+    def _create(self) -> Tuple[Any, int]:
+        self.created += 1
+        return self.factory(), 0
+
+    @asynccontextmanager
+    async def client(self) -> AsyncIterator[Any]:
+        if self._idle:
+            chat, uses = self._idle.pop()
+            if uses:
+                self.reused += 1
+        else:
+            self.misses += 1
+            chat, uses = self._create()
+        try:
+            yield chat
+        finally:
+            uses += 1
+            if uses < self.max_uses and len(self._idle) < self.size:
+                self._idle.append((chat, uses))
+            else:
+                self._schedule_refill()
+
+    def _schedule_refill(self):
+        if len(self._idle) + self._refilling >= self.size:
+            return
+        self._refilling += 1
+        asyncio.get_running_loop().call_soon(self._refill)
+
+    def _refill(self):
+        self._refilling -= 1
+        if len(self._idle) < self.size:
+            self._idle.append(self._create())
+
+    def warm(self):
+        """Fill the pool so the first requests don't pay for client construction"""
+        while len(self._idle) < self.size:
+            self._idle.append(self._create())
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": self.size, "idle": len(self._idle), "max_uses": self.max_uses,
+                "created": self.created, "reused": self.reused, "misses": self.misses}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the LLM while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Error-rate circuit breaker over the last ``window`` calls.
+
+    Opens once at least ``min_calls`` outcomes are recorded and the failure
+    share reaches ``failure_threshold``. After ``cooldown_seconds`` one probe
+    call is let through (half-open): success closes the circuit, failure
+    opens it for another cooldown.
+    """
+
+    def __init__(self, failure_threshold: float = 0.5, window: int = 20, min_calls: int = 5,
+                 cooldown_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at: Optional[float] = None
+        self.state = "closed"
+        self.opened = 0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if now - self._opened_at >= self.cooldown_seconds:
+            # Let one probe through; if it never reports back, another goes after the next cooldown
+            self.state = "half_open"
+            self._opened_at = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, success: bool):
+        if self.state == "half_open":
+            if success:
+                self.state = "closed"
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+
+        self._outcomes.append(success)
+        failures = self._outcomes.count(False)
+        if (self.state == "closed" and len(self._outcomes) >= self.min_calls
+                and failures >= self.failure_threshold * len(self._outcomes)):
+            self._open()
+
+    def _open(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self.opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "opened": self.opened, "rejected": self.rejected,
+                "recent_failures": self._outcomes.count(False), "recent_calls": len(self._outcomes)}
+
+
+class LlmCaller:
+    """Deadlines, hedging and circuit breaking around pooled LLM calls.
+
+    Every call is bounded by ``timeout_seconds``. With hedging on, a second
+    attempt on another client starts when the first has been running longer
+    than the recent ``hedge_percentile`` latency (or as soon as it fails),
+    and whichever answers first wins. Hedging waits for ``hedge_min_samples``
+    successful calls so it never fires on a guess, and is skipped while the
+    breaker is probing.
+    """
+
+    def __init__(self, pool: LlmClientPool, timeout_seconds: float = 30.0, hedge: bool = True,
+                 hedge_percentile: float = 95, hedge_min_seconds: float = 1.0, hedge_min_samples: int = 20,
+                 breaker: Optional[CircuitBreaker] = None, latency_window: int = 200):
+        self.pool = pool
+        self.timeout_seconds = timeout_seconds
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_seconds = hedge_min_seconds
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile / 100))]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None when this call shouldn't hedge"""
+        if not self.hedge or self.breaker.state != "closed" or len(self._latencies) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_seconds, self.latency_percentile(self.hedge_percentile))
+
+    async def send(self, message: Any) -> Any:
+        if not self.breaker.allow():
+            raise CircuitOpen("LLM circuit breaker is open after repeated failures")
+
+        self.calls += 1
+        try:
+            response = await asyncio.wait_for(self._send_hedged(message), self.timeout_seconds)
+        except asyncio.CancelledError:
+            # The caller went away; that says nothing about the LLM's health
+            raise
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.failures += 1
+            self.breaker.record(False)
+            raise asyncio.TimeoutError(f"LLM did not answer within {self.timeout_seconds:g}s")
+        except Exception:
+            self.failures += 1
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True)
+        return response
+
+    async def stream(self, message: Any) -> AsyncIterator[str]:
+        """Yield the response in chunks as the model produces them, under the same deadline and breaker.
+
+        Clients without ``stream_message`` answer in a single chunk. Streams
+        aren't hedged: a second attempt can't be spliced into text already sent.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpen("LLM circuit breaker is open after repeated failures")
+
+        self.calls += 1
+        started = time.monotonic()
+        deadline = started + self.timeout_seconds
+        try:
+            async with self.pool.client() as chat:
+                if hasattr(chat, "stream_message"):
+                    chunks = chat.stream_message(message).__aiter__()
+                else:
+                    chunks = _single_chunk(chat.send_message(message))
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), deadline - time.monotonic())
+                    except StopAsyncIteration:
+                        break
+                    yield chunk
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.failures += 1
+            self.breaker.record(False)
+            raise asyncio.TimeoutError(f"LLM did not finish within {self.timeout_seconds:g}s")
+        except Exception:
+            self.failures += 1
+            self.breaker.record(False)
+            raise
+        self._latencies.append(time.monotonic() - started)
+        self.breaker.record(True)
+
+    async def _send_once(self, message: Any) -> Any:
+        started = time.monotonic()
+        async with self.pool.client() as chat:
+            response = await chat.send_message(message)
+        self._latencies.append(time.monotonic() - started)
+        return response
+
+    async def _send_hedged(self, message: Any) -> Any:
+        delay = self.hedge_delay()
+        first = asyncio.ensure_future(self._send_once(message))
+        pending = {first}
+        started = time.monotonic()
+        error: Optional[BaseException] = None
+        try:
+            while True:
+                timeout = None if delay is None else max(0.0, delay - (time.monotonic() - started))
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+
+                if delay is not None:
+                    # Slow past the percentile, or failed early: one more attempt races the first
+                    delay = None
+                    self.hedged += 1
+                    pending.add(asyncio.ensure_future(self._send_once(message)))
+                elif not pending:
+                    raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "latency_p50": round(p50, 3) if p50 is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+            "breaker": self.breaker.stats()
+        }
+
+
+async def _single_chunk(response: Awaitable[str]) -> AsyncIterator[str]:
+    yield await response
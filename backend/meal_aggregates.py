@@ -0,0 +1,60 @@
+from typing import Any, Dict, List, Optional
+
+from rollups import NUTRIENTS, empty_totals
+
+GROUP_KEYS = {
+    "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+    "meal_type": {"$ifNull": ["$meal_type", "general"]},
+}
+
+
+async def sum_nutrition(collection, match: Dict[str, Any], projection: bool = True) -> Dict[str, float]:
+    """Python-loop totals: stream matching meals and add them up client-side"""
+    fields = {"_id": 0, **{field: 1 for field in NUTRIENTS}} if projection else None
+    totals = empty_totals()
+    async for meal in collection.find(match, fields):
+        for field in NUTRIENTS:
+            totals[field] += meal.get(field) or 0
+        totals["meal_count"] += 1
+    return totals
+
+
+def nutrition_pipeline(match: Dict[str, Any], group_by: Optional[str] = None) -> List[Dict[str, Any]]:
+    """$match + $group pipeline behind aggregate_nutrition (also explained by the query-plan check)"""
+    return [
+        {"$match": match},
+        {"$project": {
+            "_id": 0,
+            "key": GROUP_KEYS[group_by] if group_by else {"$literal": None},
+            **{field: {"$ifNull": [f"${field}", 0]} for field in NUTRIENTS}
+        }},
+        {"$group": {
+            "_id": "$key",
+            **{field: {"$sum": f"${field}"} for field in NUTRIENTS},
+            "meal_count": {"$sum": 1}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+
+
+async def aggregate_nutrition(collection, match: Dict[str, Any],
+                              group_by: Optional[str] = None) -> Dict[str, Any]:
+    """Server-side totals via $match + $group, so only the sums cross the wire.
+
+    Returns overall totals and, when ``group_by`` is "day" or "meal_type",
+    per-group totals sorted by group key.
+    """
+    totals = empty_totals()
+    groups = []
+    async for group in collection.aggregate(nutrition_pipeline(match, group_by)):
+        for field in (*NUTRIENTS, "meal_count"):
+            totals[field] += group[field]
+        if group_by:
+            groups.append({
+                group_by: group["_id"],
+                "meal_count": group["meal_count"],
+                **{field: round(group[field], 2) for field in NUTRIENTS}
+            })
+
+    return {"totals": totals, "groups": groups}
+
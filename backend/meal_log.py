@@ -0,0 +1,128 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+Identity = Tuple[str, str]
+
+
+class MealLog:
+    """Idempotent meal inserts that keep image blobs and derived data consistent.
+
+    A meal whose ``idempotency_key`` is already stored for its user resolves
+    to the stored meal_id instead of being inserted again. Every meal that
+    was actually written goes through ``on_inserted`` (rollups, ETag
+    versions, retention), and the image blob of every meal the database
+    rejected is released, including when a batch fails part-way.
+    """
+
+    def __init__(self, meals, blob_store, on_inserted: Callable[[List[Dict[str, Any]]], Awaitable[None]]):
+        self.meals = meals
+        self.blob_store = blob_store
+        self.on_inserted = on_inserted
+
+    async def find_logged(self, identities: Iterable[Identity]) -> Dict[Identity, str]:
+        """meal_id of already-stored meals by (user_id, idempotency_key), in one query"""
+        keys_by_user: Dict[str, List[str]] = {}
+        for user_id, key in identities:
+            keys_by_user.setdefault(user_id, []).append(key)
+        if not keys_by_user:
+            return {}
+
+        cursor = self.meals.find(
+            {"$or": [{"user_id": user_id, "idempotency_key": {"$in": keys}} for user_id, keys in keys_by_user.items()]},
+            {"user_id": 1, "idempotency_key": 1}
+        )
+        return {(meal["user_id"], meal["idempotency_key"]): str(meal["_id"]) async for meal in cursor}
+
+    async def insert(self, document: Dict[str, Any], image: Optional[bytes]) -> str:
+        """Store one meal (``image`` becomes its image_id blob) and return its meal_id"""
+        identity = (document["user_id"], document.get("idempotency_key"))
+        if identity[1]:
+            logged = await self.find_logged([identity])
+            if logged:
+                return logged[identity]
+
+        document["image_id"] = await self.blob_store.put(image) if image else None
+        try:
+            await self.meals.insert_one(document)
+        except DuplicateKeyError:
+            await self._release([document])
+            if not identity[1]:
+                raise
+            # A concurrent retry stored the same key first
+            logged = await self.find_logged([identity])
+            if not logged:
+                raise
+            return logged[identity]
+        await self.on_inserted([document])
+        return str(document["_id"])
+
+    async def insert_batch(self, documents: List[Dict[str, Any]], images: List[Optional[bytes]]) -> List[Tuple[str, str]]:
+        """Store a batch with one insert_many; returns (meal_id, "created" | "duplicate") per document.
+
+        Documents repeating a key that is already stored, or that appears
+        earlier in the batch, are duplicates of that meal, so a batch can be
+        retried safely.
+        """
+        first_index: Dict[Identity, int] = {}
+        for index, document in enumerate(documents):
+            if "idempotency_key" in document:
+                first_index.setdefault((document["user_id"], document["idempotency_key"]), index)
+        logged = await self.find_logged(first_index)
+
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+        for index, (document, image) in enumerate(zip(documents, images)):
+            identity = (document["user_id"], document.get("idempotency_key"))
+            if identity in first_index and (identity in logged or first_index[identity] != index):
+                continue
+            document["image_id"] = await self.blob_store.put(image) if image else None
+            pending.append((index, document))
+
+        if pending:
+            try:
+                await self.meals.insert_many([document for _, document in pending], ordered=False)
+            except BulkWriteError as e:
+                # Unordered: everything but the reported indexes was written
+                write_errors = e.details.get("writeErrors", [])
+                failed = {error["index"] for error in write_errors}
+                rejected = [document for position, (_, document) in enumerate(pending) if position in failed]
+                pending = [item for position, item in enumerate(pending) if position not in failed]
+                if len(pending) != e.details.get("nInserted", len(pending)):
+                    logger.warning(f"Bulk meal insert wrote {e.details.get('nInserted')} of {len(pending)} meals")
+                await self._release(rejected)
+
+                raced = all(error.get("code") == 11000 for error in write_errors) and all(
+                    "idempotency_key" in document for document in rejected
+                )
+                if not raced:
+                    if pending:
+                        await self.on_inserted([document for _, document in pending])
+                    raise
+                # A concurrent retry of the same batch stored these keys first
+                logged.update(await self.find_logged(
+                    (document["user_id"], document["idempotency_key"]) for document in rejected
+                ))
+            if pending:
+                await self.on_inserted([document for _, document in pending])
+
+        created = {index: str(document["_id"]) for index, document in pending}
+        for index, document in pending:
+            if "idempotency_key" in document:
+                logged[(document["user_id"], document["idempotency_key"])] = created[index]
+
+        return [
+            (created[index], "created") if index in created
+            else (logged.get((document["user_id"], document.get("idempotency_key"))), "duplicate")
+            for index, document in enumerate(documents)
+        ]
+
+    async def _release(self, documents: List[Dict[str, Any]]):
+        for document in documents:
+            if document.get("image_id"):
+                try:
+                    await self.blob_store.release(document["image_id"])
+                except Exception as e:
+                    logger.error(f"Failed to release image {document['image_id']}: {str(e)}")
@@ -0,0 +1,90 @@
+import zlib
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from rollups import NUTRIENTS
+
+# Catalog nutritional_info keys, in NUTRIENTS column order
+PER_100G_FIELDS = tuple(f"{field}_per_100g" for field in NUTRIENTS)
+
+
+# Arrays compile_name_arrays produces; the catalog store saves them as <name>.npy
+NAME_ARRAYS = ("name_hashes", "name_rows")
+
+
+def name_hash(name: str) -> int:
+    """Stable 32-bit key of a lowercased food name; collisions are resolved against the catalog"""
+    return zlib.crc32(name.lower().encode("utf-8"))
+
+
+def compile_name_arrays(foods: Sequence[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Case-insensitive name -> row lookup as arrays sorted by name hash (later duplicates win)"""
+    rows = {food["name"].lower(): row for row, food in enumerate(foods)}
+    entries = sorted((name_hash(name), row) for name, row in rows.items())
+    return {
+        "name_hashes": np.array([key for key, _ in entries], dtype=np.uint32),
+        "name_rows": np.array([row for _, row in entries], dtype=np.int32),
+    }
+
+
+class NutritionTable:
+    """Catalog nutrition as a columnar matrix: one row per food, one column per nutrient (per 100 g).
+
+    ``calculate`` scales many (row, grams) pairs in a single vectorized
+    multiply, so a multi-dish plate costs one NumPy operation instead of a
+    dict walk per dish.
+    """
+
+    def __init__(self, foods: Sequence[Dict[str, Any]]):
+        self.foods = foods
+        # A memory-mapped catalog already carries the matrix and name lookup; use them without copying
+        self.matrix = getattr(foods, "nutrition", None)
+        if self.matrix is None:
+            self.matrix = np.array(
+                [[food["nutritional_info"][field] for field in PER_100G_FIELDS] for food in foods],
+                dtype=np.float64
+            ).reshape(len(foods), len(NUTRIENTS))
+        arrays = getattr(foods, "name_arrays", None) or compile_name_arrays(foods)
+        self._name_hashes = arrays["name_hashes"]
+        self._name_rows = arrays["name_rows"]
+
+    def __len__(self) -> int:
+        return len(self.foods)
+
+    def row(self, name: str) -> int:
+        """Row of a food by catalog name (case-insensitive); raises KeyError if unknown"""
+        key = name_hash(name)
+        lowered = name.lower()
+        i = int(np.searchsorted(self._name_hashes, key))
+        while i < len(self._name_hashes) and self._name_hashes[i] == key:
+            row = int(self._name_rows[i])
+            if self.foods[row]["name"].lower() == lowered:
+                return row
+            i += 1
+        raise KeyError(name)
+
+    def calculate(self, rows: Sequence[int], grams: Sequence[float]) -> np.ndarray:
+        """Nutrition per item: an (items x nutrients) matrix"""
+        return self.matrix[np.asarray(rows, dtype=np.intp)] * (np.asarray(grams, dtype=np.float64)[:, None] / 100.0)
+
+    def batch(self, items: Sequence[Tuple[str, float]]) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+        """Per-item and total nutrition for (food name, grams) pairs, rounded to 0.1"""
+        if not items:
+            return [], {field: 0.0 for field in NUTRIENTS}
+
+        names, grams = zip(*items)
+        rows = [self.row(name) for name in names]
+        row_names = [self.foods[row]["name"] for row in rows]
+        values = self.calculate(rows, grams)
+        per_item = np.round(values, 1).tolist()
+        totals = np.round(values.sum(axis=0), 1).tolist()
+
+        return [
+            {
+                "food_name": row_name,
+                "quantity": float(quantity),
+                "nutrition": dict(zip(NUTRIENTS, item))
+            }
+            for row_name, quantity, item in zip(row_names, grams, per_item)
+        ], dict(zip(NUTRIENTS, totals))
@@ -0,0 +1,50 @@
+import base64
+import binascii
+from datetime import datetime, timedelta
+from typing import Any, Dict, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+EPOCH = datetime(1970, 1, 1)
+CURSOR_VERSION = "1"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp: datetime, meal_id: ObjectId) -> str:
+    """Opaque page token for the position just after (timestamp, _id) in newest-first order"""
+    # Mongo datetimes have millisecond precision, so integer milliseconds round-trip exactly
+    millis = (timestamp - EPOCH) // timedelta(milliseconds=1)
+    raw = f"{CURSOR_VERSION}:{millis}:{meal_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("ascii")
+        version, millis, meal_id = raw.split(":")
+        if version != CURSOR_VERSION:
+            raise InvalidCursor("Unsupported cursor version")
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(meal_id)
+    except InvalidCursor:
+        raise
+    except (binascii.Error, UnicodeDecodeError, ValueError, InvalidId):
+        raise InvalidCursor("Invalid cursor")
+
+
+def keyset_filter(timestamp: datetime, meal_id: ObjectId) -> Dict[str, Any]:
+    """Meals strictly after (timestamp, _id) in (timestamp desc, _id desc) order.
+
+    The top-level $lte bound lets the (user_id, timestamp, _id) index start
+    scanning at the cursor, so a page costs the same however deep it is.
+    """
+    return {
+        "timestamp": {"$lte": timestamp},
+        "$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": meal_id}}
+        ]
+    }
@@ -0,0 +1,175 @@
+import io
+import logging
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+
+
+def dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a tiny grayscale thumbnail"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        small = img.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def to_signed64(value: int) -> int:
+    """Mongo stores int64, so fold unsigned hashes into the signed range"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+class MultiIndexHashTable:
+    """Hamming-distance lookup over 64-bit hashes via multi-index hashing.
+
+    Each hash is split into ``max_distance + 1`` disjoint chunks and every
+    chunk is indexed exactly. By the pigeonhole principle any hash within
+    ``max_distance`` bits of the query shares at least one chunk with it, so
+    only the bucket members need a popcount check instead of every entry.
+    """
+
+    def __init__(self, max_distance: int = 4):
+        self.max_distance = max_distance
+        chunk_count = max_distance + 1
+        bounds = [round(i * HASH_BITS / chunk_count) for i in range(chunk_count + 1)]
+        self._chunks = [(bounds[i], (1 << (bounds[i + 1] - bounds[i])) - 1) for i in range(chunk_count)]
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(chunk_count)]
+        self._hashes = array("Q")
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._positions
+
+    def add(self, item_id: str, value: int):
+        if item_id in self._positions:
+            return
+        position = len(self._ids)
+        self._hashes.append(value)
+        self._ids.append(item_id)
+        self._positions[item_id] = position
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table.setdefault((value >> shift) & mask, []).append(position)
+
+    def search(self, value: int, max_distance: Optional[int] = None, limit: int = 5) -> List[Tuple[int, str]]:
+        """Return up to ``limit`` (distance, id) pairs within ``max_distance``, closest first"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        seen = set()
+        matches = []
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            for position in table.get((value >> shift) & mask, ()):
+                if position in seen:
+                    continue
+                seen.add(position)
+                distance = (self._hashes[position] ^ value).bit_count()
+                if distance <= max_distance:
+                    matches.append((distance, self._ids[position]))
+
+        matches.sort()
+        return matches[:limit]
+
+
+class PerceptualIndex:
+    """Near-duplicate lookup of past analyses, persisted in Mongo and mirrored in memory"""
+
+    def __init__(self, collection, max_distance: int = 4, sync_interval_seconds: float = 30.0):
+        self.collection = collection
+        self.max_distance = max_distance
+        self.sync_interval_seconds = sync_interval_seconds
+        self.table = MultiIndexHashTable(max_distance)
+        self._synced_until: Optional[datetime] = None
+        self._last_sync = 0.0
+        self.near_hits = 0
+        self.near_misses = 0
+
+    async def rebuild(self):
+        """Load every stored hash into a fresh in-memory table"""
+        self.table = MultiIndexHashTable(self.max_distance)
+        self._synced_until = None
+        loaded = await self.sync()
+        logger.info(f"Perceptual index rebuilt with {loaded} hashes")
+
+    async def sync(self) -> int:
+        """Pull hashes stored since the last sync, including ones written by other workers"""
+        query = {}
+        if self._synced_until is not None:
+            query["created_at"] = {"$gte": self._synced_until}
+
+        loaded = 0
+        cursor = self.collection.find(query, {"phash": 1, "created_at": 1}).sort("created_at", 1)
+        async for doc in cursor:
+            if doc["_id"] not in self.table:
+                self.table.add(doc["_id"], from_signed64(doc["phash"]))
+                loaded += 1
+            self._synced_until = doc["created_at"]
+
+        self._last_sync = time.monotonic()
+        return loaded
+
+    async def find(self, value: int, description: str = "") -> Optional[Dict[str, Any]]:
+        """Return the stored analysis of the closest near-duplicate image, if any"""
+        if time.monotonic() - self._last_sync > self.sync_interval_seconds:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning(f"Perceptual index sync failed: {str(e)}")
+
+        candidates = self.table.search(value)
+        if candidates:
+            ids = [item_id for _, item_id in candidates]
+            docs = {}
+            async for doc in self.collection.find(
+                {"_id": {"$in": ids}, "description": description},
+                {"result": 1}
+            ):
+                docs[doc["_id"]] = doc
+            for item_id in ids:
+                if item_id in docs:
+                    self.near_hits += 1
+                    return docs[item_id]["result"]
+
+        self.near_misses += 1
+        return None
+
+    async def add(self, item_id: str, value: int, description: str, result: Dict[str, Any]):
+        self.table.add(item_id, value)
+        await self.collection.replace_one(
+            {"_id": item_id},
+            {
+                "_id": item_id,
+                "phash": to_signed64(value),
+                "description": description,
+                "result": result,
+                "created_at": datetime.utcnow()
+            },
+            upsert=True
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hashes": len(self.table),
+            "max_distance": self.max_distance,
+            "near_hits": self.near_hits,
+            "near_misses": self.near_misses
+        }
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MealRetention:
+    """Trims each user's meal history to their configured limit.
+
+    Instead of loading the whole history, a sweep walks the
+    (user_id, timestamp, _id) index to the first meal past the limit and
+    deletes everything at or before that boundary in bounded batches.
+    ``on_removed`` only sees meals this sweep itself deleted.
+    Sweeps run in a background task; ``schedule`` coalesces repeated
+    requests for the same user.
+    """
+
+    def __init__(self, meals, settings, default_keep: int = 14, batch_size: int = 500,
+                 projection: Optional[Dict[str, int]] = None,
+                 on_removed: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None):
+        self.meals = meals
+        self.settings = settings
+        self.default_keep = default_keep
+        self.batch_size = batch_size
+        self.projection = projection or {"_id": 1}
+        self.on_removed = on_removed
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._queued = set()
+        self._task: Optional[asyncio.Task] = None
+        self.sweeps = 0
+        self.removed = 0
+        self.last_sweep: Optional[Dict[str, Any]] = None
+
+    async def get_keep_limit(self, user_id: str) -> int:
+        """Meals to keep for a user; 0 means unlimited"""
+        doc = await self.settings.find_one({"_id": user_id}, {"meal_retention": 1})
+        if doc is not None and doc.get("meal_retention") is not None:
+            return doc["meal_retention"]
+        return self.default_keep
+
+    async def set_keep_limit(self, user_id: str, keep: Optional[int]):
+        if keep is None:
+            await self.settings.update_one({"_id": user_id}, {"$unset": {"meal_retention": ""}})
+        else:
+            await self.settings.update_one({"_id": user_id}, {"$set": {"meal_retention": keep}}, upsert=True)
+
+    async def sweep_user(self, user_id: str) -> int:
+        """Delete meals beyond the user's limit; returns how many were removed"""
+        self.sweeps += 1
+        keep = await self.get_keep_limit(user_id)
+        if keep <= 0:
+            return 0
+
+        # The newest meal that falls outside the limit marks the deletion boundary
+        boundary = await self.meals.find(
+            {"user_id": user_id},
+            {"timestamp": 1}
+        ).sort([("timestamp", -1), ("_id", -1)]).skip(keep).limit(1).to_list(1)
+        if not boundary:
+            return 0
+
+        boundary = boundary[0]
+        expired = {
+            "user_id": user_id,
+            "$or": [
+                {"timestamp": {"$lt": boundary["timestamp"]}},
+                {"timestamp": boundary["timestamp"], "_id": {"$lte": boundary["_id"]}}
+            ]
+        }
+
+        removed = 0
+        while True:
+            batch = await self.meals.find(expired, {"_id": 1}).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+            # Overlapping sweeps (and single-meal deletes) race for the same meals, so
+            # each one is claimed by deleting it and only the winner applies side effects
+            deleted = await asyncio.gather(*(
+                self.meals.find_one_and_delete({"_id": meal["_id"]}, self.projection) for meal in batch
+            ))
+            deleted = [meal for meal in deleted if meal is not None]
+            removed += len(deleted)
+            if deleted and self.on_removed is not None:
+                await self.on_removed(deleted)
+
+        self.removed += removed
+        self.last_sweep = {"user_id": user_id, "removed": removed, "at": datetime.utcnow()}
+        if removed:
+            logger.info(f"Retention sweep removed {removed} old meals for user {user_id}")
+        return removed
+
+    def schedule(self, user_id: str):
+        """Queue a background sweep for the user unless one is already pending"""
+        if user_id in self._queued:
+            return
+        self._queued.add(user_id)
+        self._queue.put_nowait(user_id)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            user_id = await self._queue.get()
+            self._queued.discard(user_id)
+            try:
+                await self.sweep_user(user_id)
+            except Exception as e:
+                logger.error(f"Error sweeping old meals for user {user_id}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default_keep": self.default_keep,
+            "sweeps": self.sweeps,
+            "removed": self.removed,
+            "pending": self._queue.qsize(),
+            "last_sweep": self.last_sweep
+        }
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+NUTRIENTS = ("calories", "protein", "carbs", "fat", "fiber")
+
+# Fields a meal needs for its rollup contribution to be applied or reversed
+ROLLUP_PROJECTION = {"user_id": 1, "timestamp": 1, **{field: 1 for field in NUTRIENTS}}
+
+# Marker document (it has no user_id, so no rollup query matches it) for the one-time backfill
+BACKFILL_ID = "backfill"
+
+
+def day_key(timestamp: datetime) -> str:
+    """UTC calendar day of a timestamp, as stored in daily_rollups.day"""
+    return timestamp.strftime("%Y-%m-%d")
+
+
+def empty_totals() -> Dict[str, float]:
+    return {**{field: 0.0 for field in NUTRIENTS}, "meal_count": 0}
+
+
+def rebuild_pipeline(user_id: str) -> List[Dict[str, Any]]:
+    """Per-day totals of a user's raw meals, as ``rebuild`` writes them"""
+    return [
+        {"$match": {"user_id": user_id}},
+        {
+            "$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                **{field: {"$sum": {"$ifNull": [f"${field}", 0]}} for field in NUTRIENTS},
+                "meal_count": {"$sum": 1}
+            }
+        }
+    ]
+
+
+class DailyRollups:
+    """Per-user, per-day nutrition totals maintained incrementally with $inc.
+
+    log/delete paths call ``apply`` with the affected meals, so a summary
+    only reads one small document per day in its window. ``rebuild``
+    recomputes rollups from raw meals to repair any drift; ``backfill``
+    runs it once for history that predates the rollups.
+    """
+
+    def __init__(self, collection, meals):
+        self.collection = collection
+        self.meals = meals
+        self.ready = False
+
+    async def apply(self, meals: Iterable[Dict[str, Any]], sign: int = 1):
+        """Add (sign=1) or remove (sign=-1) meals from their day's rollup"""
+        grouped: Dict[tuple, Dict[str, float]] = defaultdict(empty_totals)
+        for meal in meals:
+            totals = grouped[(meal["user_id"], day_key(meal["timestamp"]))]
+            for field in NUTRIENTS:
+                totals[field] += sign * (meal.get(field) or 0)
+            totals["meal_count"] += sign
+
+        if not grouped:
+            return
+
+        # Every change bumps the day's version, which is how rebuild detects writes it raced with
+        await self.collection.bulk_write([
+            UpdateOne(
+                {"_id": f"{user_id}:{day}"},
+                {"$inc": {**totals, "version": 1}, "$setOnInsert": {"user_id": user_id, "day": day}},
+                upsert=True
+            )
+            for (user_id, day), totals in grouped.items()
+        ], ordered=False)
+        if sign < 0:
+            await self.collection.delete_many({
+                "_id": {"$in": [f"{user_id}:{day}" for user_id, day in grouped]},
+                "meal_count": {"$lte": 0}
+            })
+
+    async def totals_since(self, user_id: str, start: datetime) -> Dict[str, float]:
+        """Totals for meals at or after ``start``: whole days from rollups, the partial first day from raw meals"""
+        first_day = day_key(start)
+        next_midnight = datetime.strptime(first_day, "%Y-%m-%d") + timedelta(days=1)
+        totals = empty_totals()
+
+        async for meal in self.meals.find(
+            {"user_id": user_id, "timestamp": {"$gte": start, "$lt": next_midnight}},
+            {"_id": 0, **{field: 1 for field in NUTRIENTS}}
+        ):
+            for field in NUTRIENTS:
+                totals[field] += meal.get(field) or 0
+            totals["meal_count"] += 1
+
+        async for rollup in self.collection.find(
+            {"user_id": user_id, "day": {"$gt": first_day}},
+            {"_id": 0, "meal_count": 1, **{field: 1 for field in NUTRIENTS}}
+        ):
+            for field in NUTRIENTS:
+                totals[field] += rollup.get(field, 0)
+            totals["meal_count"] += rollup.get("meal_count", 0)
+
+        return totals
+
+    async def rebuild(self, user_id: Optional[str] = None, attempts: int = 5) -> int:
+        """Recompute rollups from raw meals (for one user or everyone); returns rollups written.
+
+        Live traffic keeps applying $inc meanwhile, so each day is written
+        only if its version is still the one read before the aggregate;
+        if any day moved on, the user's days are recomputed. Rollups of
+        days (or users) that no longer have meals are deleted.
+        """
+        if user_id is None:
+            users = set(await self.meals.distinct("user_id"))
+            users.update(await self.collection.distinct("user_id", {"user_id": {"$type": "string"}}))
+            rebuilt = 0
+            for user in users:
+                rebuilt += await self.rebuild(user, attempts)
+            logger.info(f"Rebuilt {rebuilt} daily rollups")
+            return rebuilt
+
+        for _ in range(attempts):
+            versions = {
+                rollup["day"]: rollup.get("version")
+                async for rollup in self.collection.find({"user_id": user_id}, {"day": 1, "version": 1})
+            }
+            days = {
+                group["_id"]: group
+                async for group in self.meals.aggregate(rebuild_pipeline(user_id), allowDiskUse=True)
+            }
+            if await self._replace_days(user_id, versions, days):
+                return len(days)
+        logger.warning(f"Rollups for user {user_id} kept changing during rebuild; gave up after {attempts} attempts")
+        return 0
+
+    async def _replace_days(self, user_id: str, versions: Dict[str, Any], days: Dict[str, Dict[str, Any]]) -> bool:
+        """Write recomputed days over the versions they were computed against; False if any of them moved on"""
+        operations = []
+        for day, group in days.items():
+            totals = {"meal_count": group["meal_count"], **{field: group[field] for field in NUTRIENTS}}
+            if day in versions:
+                operations.append(UpdateOne(
+                    {"_id": f"{user_id}:{day}", "version": versions[day]},
+                    {"$set": totals, "$inc": {"version": 1}}
+                ))
+            else:
+                operations.append(InsertOne({"_id": f"{user_id}:{day}", "user_id": user_id, "day": day,
+                                             "version": 1, **totals}))
+        emptied = [day for day in versions if day not in days]
+        operations.extend(DeleteOne({"_id": f"{user_id}:{day}", "version": versions[day]}) for day in emptied)
+        if not operations:
+            return True
+
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            matched, removed = result.matched_count, result.deleted_count
+        except BulkWriteError as e:
+            # A meal logged meanwhile already upserted a day we meant to insert
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            return False
+        return matched == sum(day in versions for day in days) and removed == len(emptied)
+
+    async def backfill(self, poll_seconds: float = 5.0, stale_after: timedelta = timedelta(minutes=30)):
+        """One-time rebuild covering meals logged before rollups were maintained.
+
+        A marker document records completion, so this runs once per
+        deployment: the worker that claims the marker rebuilds, the others
+        wait for it (retaking the claim if it goes stale). ``ready`` stays
+        False until then and summaries are served from raw meals meanwhile.
+        """
+        while True:
+            state = await self.collection.find_one({"_id": BACKFILL_ID})
+            if state is not None and state.get("completed_at"):
+                break
+            if await self._claim_backfill(state, stale_after):
+                await self.rebuild()
+                await self.collection.update_one({"_id": BACKFILL_ID}, {"$set": {"completed_at": datetime.utcnow()}})
+                break
+            await asyncio.sleep(poll_seconds)
+        self.ready = True
+
+    async def _claim_backfill(self, state: Optional[Dict[str, Any]], stale_after: timedelta) -> bool:
+        now = datetime.utcnow()
+        if state is None:
+            try:
+                await self.collection.insert_one({"_id": BACKFILL_ID, "started_at": now})
+                return True
+            except DuplicateKeyError:
+                return False
+        if state["started_at"] > now - stale_after:
+            return False
+        result = await self.collection.update_one(
+            {"_id": BACKFILL_ID, "started_at": state["started_at"]},
+            {"$set": {"started_at": now}}
+        )
+        return result.modified_count == 1
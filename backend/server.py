@@ -1,10 +1,12 @@
-from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile
+from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.formparsers import MultiPartParser
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Set, Tuple
+from datetime import datetime, timedelta, timezone
 from bson import ObjectId
 import os
 import logging
@@ -13,10 +15,37 @@ import base64
 import io
 from PIL import Image
 import asyncio
+import binascii
+import json
+import tempfile
 
 # Import emergent integrations
 from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
 
+from analysis_cache import AnalysisCache, analysis_cache_key
+from api_responses import ApiJSONResponse, fast_response
+from analysis_jobs import QueueFull, create_job_queue
+from blob_store import create_blob_store
+from catalog_store import load_catalog
+from compression import CompressionMiddleware
+from data_versions import UserDataVersions
+from meal_aggregates import GROUP_KEYS, aggregate_nutrition, sum_nutrition
+from dish_matcher import DishMatcher
+from food_search import FoodSearchIndex
+from indexes import check_query_plans, ensure_indexes
+from fake_llm import FakeLlmChat
+from meal_log import MealLog
+from llm_client import CircuitBreaker, CircuitOpen, LlmCaller, LlmClientPool, SYSTEM_MESSAGE, build_prompt
+from nutrition_table import NutritionTable
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+from image_pipeline import ImagePipeline, normalize_image
+from image_prefilter import PrefilterLog, rejected_analysis
+from perceptual_index import PerceptualIndex
+from retention import MealRetention
+from rollups import DailyRollups, ROLLUP_PROJECTION
+from singleflight import SingleFlight
+from variant_cache import VariantCache
+
 # Load environment variables
 load_dotenv()
 
@@ -26,9 +55,128 @@ db_name = os.environ.get('DB_NAME', 'calorie_tracker')
 client = AsyncIOMotorClient(mongo_url)
 db = client[db_name]
 
+# Analysis result cache (in-process LRU backed by a shared Mongo collection)
+analysis_cache = AnalysisCache(
+    db.analysis_cache,
+    max_entries=int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', '512')),
+    max_bytes=int(os.environ.get('ANALYSIS_CACHE_MAX_BYTES', str(8 * 1024 * 1024))),
+    ttl_seconds=int(os.environ.get('ANALYSIS_CACHE_TTL_SECONDS', str(24 * 60 * 60)))
+)
+
+# Meal images live in a content-addressed blob store, meals only keep a reference
+blob_store = create_blob_store(
+    db,
+    backend=os.environ.get('BLOB_STORE', 'gridfs'),
+    root=os.environ.get('BLOB_STORE_PATH', 'blob_store')
+)
+
+# Per-user daily nutrition totals, kept current on every write
+daily_rollups = DailyRollups(db.daily_rollups, db.meals)
+
+# Per-user data versions: bumped on every meal write, they back the read endpoints' ETags
+user_versions = UserDataVersions(
+    db.user_versions,
+    ttl_seconds=float(os.environ.get('USER_VERSION_CACHE_SECONDS', '1'))
+)
+
+async def on_meals_removed(meals: List[dict]):
+    """Reverse rollup contributions and drop blob references of meals that were just deleted"""
+    await daily_rollups.apply(meals, sign=-1)
+    await user_versions.bump_many(meal["user_id"] for meal in meals if meal.get("user_id"))
+    for meal in meals:
+        if meal.get("image_id"):
+            await blob_store.release(meal["image_id"])
+
+# Per-user meal history retention, applied by a background sweeper
+meal_retention = MealRetention(
+    db.meals,
+    db.user_settings,
+    default_keep=int(os.environ.get('MEAL_RETENTION_DEFAULT', '14')),
+    projection={"image_id": 1, **ROLLUP_PROJECTION},
+    on_removed=on_meals_removed
+)
+
+# Largest image accepted by the streaming upload endpoints
+upload_max_bytes = int(os.environ.get('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+
+# Batch analysis: at most this many images per request, analyzed this many at a time (across all batches)
+batch_max_images = int(os.environ.get('ANALYZE_BATCH_MAX_IMAGES', '10'))
+batch_analysis_slots = asyncio.Semaphore(int(os.environ.get('ANALYZE_BATCH_CONCURRENCY', '4')))
+
+# Offline sync: at most this many meals per bulk log request
+bulk_log_max_meals = int(os.environ.get('BULK_LOG_MAX_MEALS', '200'))
+
+# Gemini chat clients are built ahead of time; identical concurrent analyses share one call.
+# LLM_BACKEND=fake swaps in a local stand-in with injectable latency and errors.
+llm_backend = os.environ.get('LLM_BACKEND', 'gemini')
+
+def new_llm_chat() -> LlmChat:
+    if llm_backend == 'fake':
+        return FakeLlmChat(
+            latency_seconds=float(os.environ.get('FAKE_LLM_LATENCY_SECONDS', '0.5')),
+            jitter_seconds=float(os.environ.get('FAKE_LLM_JITTER_SECONDS', '0.2')),
+            slow_rate=float(os.environ.get('FAKE_LLM_SLOW_RATE', '0')),
+            slow_seconds=float(os.environ.get('FAKE_LLM_SLOW_SECONDS', '10')),
+            error_rate=float(os.environ.get('FAKE_LLM_ERROR_RATE', '0'))
+        )
+    return LlmChat(
+        api_key=os.environ.get('EMERGENT_LLM_KEY', ''),
+        session_id=f"food_analysis_{uuid.uuid4()}",
+        system_message=SYSTEM_MESSAGE
+    ).with_model("gemini", "gemini-2.0-flash")
+
+llm_pool = LlmClientPool(
+    new_llm_chat,
+    size=int(os.environ.get('LLM_POOL_SIZE', '4')),
+    max_uses=int(os.environ.get('LLM_CLIENT_MAX_USES', '1'))
+)
+analysis_flights = SingleFlight()
+
+# Per-call deadline, hedging past the p95 latency, and a breaker that fails fast to the fallback
+llm_caller = LlmCaller(
+    llm_pool,
+    timeout_seconds=float(os.environ.get('LLM_TIMEOUT_SECONDS', '30')),
+    hedge=os.environ.get('LLM_HEDGE_ENABLED', 'true').lower() == 'true',
+    hedge_percentile=float(os.environ.get('LLM_HEDGE_PERCENTILE', '95')),
+    hedge_min_seconds=float(os.environ.get('LLM_HEDGE_MIN_SECONDS', '1')),
+    breaker=CircuitBreaker(
+        failure_threshold=float(os.environ.get('LLM_BREAKER_FAILURE_RATE', '0.5')),
+        window=int(os.environ.get('LLM_BREAKER_WINDOW', '20')),
+        min_calls=int(os.environ.get('LLM_BREAKER_MIN_CALLS', '5')),
+        cooldown_seconds=float(os.environ.get('LLM_BREAKER_COOLDOWN_SECONDS', '30'))
+    )
+)
+
+# Image normalization runs in a process pool ahead of the LLM call
+image_pipeline = ImagePipeline(
+    max_edge=int(os.environ.get('IMAGE_MAX_EDGE', '1024')),
+    quality=int(os.environ.get('IMAGE_JPEG_QUALITY', '80')),
+    max_workers=int(os.environ['IMAGE_WORKERS']) if os.environ.get('IMAGE_WORKERS') else None
+)
+
+# Local blur/exposure/screenshot checks that can answer unusable images without Gemini
+# (IMAGE_PREFILTER=shadow|enforce|off; shadow only records what would have been rejected,
+# and stays the default until the recorded decisions show the false-reject rate)
+image_prefilter = PrefilterLog(db.prefilter_decisions, mode=os.environ.get('IMAGE_PREFILTER', 'shadow'))
+
+# Resized meal image variants (longest edge in px), cached on disk once generated
+IMAGE_VARIANTS = {"thumb": 192, "medium": 768}
+variant_cache = VariantCache(
+    os.environ.get('VARIANT_CACHE_PATH', 'variant_cache'),
+    max_bytes=int(os.environ.get('VARIANT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+)
+
+# Near-duplicate image index over past analyses
+phash_enabled = os.environ.get('PHASH_ENABLED', 'true').lower() == 'true'
+perceptual_index = PerceptualIndex(
+    db.image_hashes,
+    max_distance=int(os.environ.get('PHASH_MAX_DISTANCE', '4')),
+    sync_interval_seconds=float(os.environ.get('PHASH_SYNC_SECONDS', '30'))
+)
+
 # Initialize FastAPI
 app = FastAPI(title="Indian Calorie Tracker API")
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", default_response_class=ApiJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -37,8 +185,14 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    # Web builds read ETags to send If-None-Match on the dashboard refetch
+    expose_headers=["ETag"],
 )
 
+# Brotli/gzip for complete JSON responses above the threshold; streams are never buffered
+if os.environ.get('RESPONSE_COMPRESSION', 'true').lower() == 'true':
+    app.add_middleware(CompressionMiddleware, minimum_size=int(os.environ.get('COMPRESSION_MIN_BYTES', '1024')))
+
 # Logging setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -58,6 +212,8 @@ class IndianFood(BaseModel):
     region: str  # north, south, east, west
     nutritional_info: NutritionalInfo
     description: Optional[str] = None
+    aliases: List[str] = []  # regional names and transliterations
+    serving_grams: float = 100.0  # typical portion when one of several dishes on a plate
 
 class MealEntry(BaseModel):
     id: Optional[str] = Field(default_factory=lambda: str(ObjectId()))
@@ -73,11 +229,21 @@ class MealEntry(BaseModel):
     ai_analysis: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     meal_type: str = "general"  # breakfast, lunch, dinner, snack
+    idempotency_key: Optional[str] = Field(default=None, min_length=1, max_length=128)  # client-generated, per user
+
+class BulkMealLogRequest(BaseModel):
+    meals: List[MealEntry] = Field(..., min_length=1)
 
 class MealAnalysisRequest(BaseModel):
     image_base64: str
     description: Optional[str] = None
 
+class BatchMealAnalysisRequest(BaseModel):
+    images: List[MealAnalysisRequest] = Field(..., min_length=1)
+
+class RetentionSettings(BaseModel):
+    keep_meals: Optional[int] = Field(default=None, ge=0)  # None = server default, 0 = keep everything
+
 class ProteinRecommendation(BaseModel):
     recommended_daily_protein: float
     current_protein: float
@@ -85,149 +251,101 @@ class ProteinRecommendation(BaseModel):
     high_protein_foods: List[str]
     meal_suggestions: List[str]
 
-# Initialize Indian foods database
-indian_foods_db = [
-    {
-        "name": "Basmati Rice (cooked)",
-        "category": "grain",
-        "region": "north",
-        "nutritional_info": {
-            "calories_per_100g": 121,
-            "protein_per_100g": 2.6,
-            "carbs_per_100g": 25,
-            "fat_per_100g": 0.4,
-            "fiber_per_100g": 0.4
-        }
-    },
-    {
-        "name": "Dal (Toor/Arhar)",
-        "category": "dal",
-        "region": "all",
-        "nutritional_info": {
-            "calories_per_100g": 343,
-            "protein_per_100g": 22.3,
-            "carbs_per_100g": 59.8,
-            "fat_per_100g": 1.5,
-            "fiber_per_100g": 9.5
-        }
-    },
-    {
-        "name": "Paneer",
-        "category": "dairy",
-        "region": "north",
-        "nutritional_info": {
-            "calories_per_100g": 265,
-            "protein_per_100g": 18.3,
-            "carbs_per_100g": 1.2,
-            "fat_per_100g": 20.8,
-            "fiber_per_100g": 0
-        }
-    },
-    {
-        "name": "Chicken Curry",
-        "category": "meat",
-        "region": "all",
-        "nutritional_info": {
-            "calories_per_100g": 180,
-            "protein_per_100g": 25.0,
-            "carbs_per_100g": 3.0,
-            "fat_per_100g": 7.5,
-            "fiber_per_100g": 0.5
-        }
-    },
-    {
-        "name": "Roti/Chapati",
-        "category": "grain",
-        "region": "north",
-        "nutritional_info": {
-            "calories_per_100g": 297,
-            "protein_per_100g": 11.0,
-            "carbs_per_100g": 58.6,
-            "fat_per_100g": 4.4,
-            "fiber_per_100g": 11.5
-        }
-    },
-    {
-        "name": "Idli",
-        "category": "breakfast",
-        "region": "south",
-        "nutritional_info": {
-            "calories_per_100g": 146,
-            "protein_per_100g": 4.2,
-            "carbs_per_100g": 28.8,
-            "fat_per_100g": 1.0,
-            "fiber_per_100g": 1.0
-        }
-    },
-    {
-        "name": "Samosa",
-        "category": "snack",
-        "region": "north",
-        "nutritional_info": {
-            "calories_per_100g": 308,
-            "protein_per_100g": 5.4,
-            "carbs_per_100g": 30.0,
-            "fat_per_100g": 19.0,
-            "fiber_per_100g": 3.0
-        }
-    },
-    {
-        "name": "Curd/Yogurt",
-        "category": "dairy",
-        "region": "all",
-        "nutritional_info": {
-            "calories_per_100g": 60,
-            "protein_per_100g": 3.5,
-            "carbs_per_100g": 4.7,
-            "fat_per_100g": 3.3,
-            "fiber_per_100g": 0
-        }
-    }
+# Food catalog: compiled from a JSON/CSV file into memory-mapped columns that all workers share
+catalog_path = os.environ.get(
+    'CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'indian_foods.json')
+)
+catalog_store_path = os.environ.get('CATALOG_STORE_PATH', 'catalog_store')
+catalog_watch_seconds = float(os.environ.get('CATALOG_WATCH_SECONDS', '10'))  # 0 disables the file watcher
+# Memory the food search may spend memoizing candidate sets for paging
+food_search_cache_max_bytes = int(os.environ.get('FOOD_SEARCH_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+catalog_reload_lock = asyncio.Lock()
+indian_foods_db, _ = load_catalog(catalog_path, catalog_store_path)
+
+# Dish classes for Gemini responses: (food_name, estimated_quantity, keywords), highest priority first
+DISH_CLASSES = [
+    ("Rice-based Indian dish", 200.0, ["rice", "biryani", "pulao"]),
+    ("Dal/Lentil curry", 150.0, ["dal", "lentil", "sambar", "rasam"]),
+    ("Indian bread", 80.0, ["roti", "chapati", "naan", "paratha"]),
+    ("Indian vegetable curry", 120.0, ["curry", "sabzi", "vegetable"]),
+    ("Indian meat curry", 150.0, ["chicken", "mutton", "meat"]),
+    ("Paneer dish", 130.0, ["paneer"]),
+    ("South Indian breakfast", 120.0, ["idli", "dosa", "uttapam"]),
+    ("Indian snack", 100.0, ["samosa", "pakoda", "chaat"]),
 ]
 
+def build_catalog_indexes(foods) -> tuple:
+    """Everything derived from the catalog, built without touching the live globals"""
+    return (
+        # Ranked, typo-tolerant search over the catalog
+        FoodSearchIndex(foods, cache_max_bytes=food_search_cache_max_bytes),
+        # One-pass dish/food recognition for analysis text and food names
+        DishMatcher(foods, DISH_CLASSES),
+        # Columnar per-100g nutrition for batched calculation
+        NutritionTable(foods)
+    )
+
+def on_catalog_changed(foods, indexes: Optional[tuple] = None):
+    """Swap in a new catalog together with its derived indexes"""
+    global indian_foods_db, food_search_index, dish_matcher, nutrition_table
+    if indexes is None:
+        indexes = build_catalog_indexes(foods)
+    indian_foods_db = foods
+    food_search_index, dish_matcher, nutrition_table = indexes
+
+on_catalog_changed(indian_foods_db)
+
+async def reload_catalog() -> Dict[str, Any]:
+    """Recompile the catalog file if its content changed and hot-swap it in"""
+    async with catalog_reload_lock:
+        catalog, compiled = await asyncio.to_thread(load_catalog, catalog_path, catalog_store_path)
+        reloaded = catalog.version != indian_foods_db.version
+        if reloaded:
+            # Index builds are CPU-bound; keep serving the old catalog until they finish
+            indexes = await asyncio.to_thread(build_catalog_indexes, catalog)
+            on_catalog_changed(catalog, indexes)
+            logger.info(f"Food catalog reloaded: version {catalog.version}, {len(catalog)} foods")
+        return {"version": indian_foods_db.version, "foods": len(indian_foods_db),
+                "reloaded": reloaded, "compiled": compiled}
+
+async def watch_catalog():
+    """Poll the catalog file and hot-reload it when it changes"""
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.stat(catalog_path).st_mtime_ns
+            if last_mtime is not None and mtime != last_mtime:
+                await reload_catalog()
+            last_mtime = mtime
+        except Exception as e:
+            logger.error(f"Error reloading food catalog: {str(e)}")
+        await asyncio.sleep(catalog_watch_seconds)
+
 # Utility Functions
+def food_analysis_message(image_base64: str, description: str = "") -> UserMessage:
+    """The Gemini request for one meal photo"""
+    return UserMessage(
+        text=build_prompt(description),
+        file_contents=[ImageContent(image_base64=image_base64)]
+    )
+
+def gemini_failure(e: Exception) -> Dict[str, Any]:
+    """Log a failed Gemini call and return the unsuccessful AI result"""
+    if isinstance(e, CircuitOpen):
+        # Expected while Gemini is unhealthy; don't log every short-circuited request as an error
+        logger.warning(f"Skipping Gemini analysis: {str(e)}")
+    else:
+        logger.error(f"Error analyzing food with Gemini: {str(e)}")
+    return {
+        "analysis": f"Error analyzing image: {str(e)}",
+        "success": False
+    }
+
 async def analyze_food_with_gemini(image_base64: str, description: str = "") -> Dict[str, Any]:
     """Analyze food image using Gemini AI"""
     try:
-        # Use emergent integration for Gemini
-        chat = LlmChat(
-            api_key=os.environ.get('EMERGENT_LLM_KEY', ''),
-            session_id=f"food_analysis_{uuid.uuid4()}",
-            system_message="You are a nutritionist AI specialized in Indian cuisine. Analyze food images and provide detailed nutritional information."
-        ).with_model("gemini", "gemini-2.0-flash")
-
-        # Create image content
-        image_content = ImageContent(image_base64=image_base64)
-        
-        prompt = f"""
-        Analyze this food image carefully and provide a detailed analysis:
-        
-        IMPORTANT INSTRUCTIONS:
-        1. First, determine if this is Indian food or cuisine
-        2. If it's NOT Indian food, respond with "NOT_INDIAN_FOOD" and stop analysis
-        3. If it IS Indian food, provide detailed nutritional analysis
-        
-        For INDIAN FOOD only, analyze:
-        - Identify specific Indian dishes (dal, rice, roti, sabzi, etc.)
-        - Estimate realistic portion size in grams based on image
-        - Provide accurate nutritional values based on the specific Indian foods identified
-        - Give confidence level of your analysis (1-10)
-        
-        Additional context: {description}
-        
-        Format your response clearly:
-        - If NOT Indian food: Just write "NOT_INDIAN_FOOD - This appears to be [food type] which is not Indian cuisine"
-        - If Indian food: Provide detailed analysis of the specific dishes, realistic portion size, and accurate nutrition facts
-        
-        Be very accurate with portion sizes and nutrition - don't guess wildly.
-        """
-
-        user_message = UserMessage(
-            text=prompt,
-            file_contents=[image_content]
-        )
-
-        response = await chat.send_message(user_message)
+        # Use emergent integration for Gemini (deadline, hedging and breaker applied by the caller)
+        response = await llm_caller.send(food_analysis_message(image_base64, description))
         
         # Parse the response (assuming it returns JSON-like format)
         return {
@@ -236,35 +354,68 @@ async def analyze_food_with_gemini(image_base64: str, description: str = "") ->
         }
         
     except Exception as e:
-        logger.error(f"Error analyzing food with Gemini: {str(e)}")
-        return {
-            "analysis": f"Error analyzing image: {str(e)}",
-            "success": False
-        }
+        return gemini_failure(e)
+
+def decode_image_base64(image_base64: str) -> bytes:
+    """Decode a base64 image payload, tolerating data-URL prefixes"""
+    if image_base64.startswith("data:") and "," in image_base64:
+        image_base64 = image_base64.split(",", 1)[1]
+    try:
+        return base64.b64decode(image_base64)
+    except (binascii.Error, ValueError):
+        # Not valid base64 - still give the payload a stable identity
+        return image_base64.encode("utf-8")
+
+async def limited_body_stream(request: Request, max_bytes: int):
+    """Yield the request body, aborting with 413 as soon as it grows past max_bytes"""
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+        yield chunk
+
+async def read_image_upload(request: Request, image_required: bool = True) -> Tuple[bytes, Dict[str, str]]:
+    """Read an image from a multipart form (`image` file) or a raw image body.
+
+    The body is streamed into a spooled temporary file with the size limit
+    enforced chunk by chunk, so oversized uploads are rejected without
+    being buffered in full. Returns the image bytes and any text fields.
+    """
+    content_type = request.headers.get("content-type", "")
+    stream = limited_body_stream(request, upload_max_bytes)
+
+    if content_type.startswith("multipart/form-data"):
+        form = await MultiPartParser(request.headers, stream, max_files=1, max_fields=20).parse()
+        try:
+            fields = {key: value for key, value in form.multi_items() if isinstance(value, str)}
+            upload = form.get("image")
+            image_bytes = await upload.read() if upload is not None and not isinstance(upload, str) else b""
+        finally:
+            await form.close()
+    else:
+        fields = {}
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+            async for chunk in stream:
+                spool.write(chunk)
+            spool.seek(0)
+            image_bytes = spool.read()
+
+    if image_required and not image_bytes:
+        raise HTTPException(status_code=422, detail="No image data received")
+    return image_bytes, fields
 
 def find_similar_food(food_name: str) -> Optional[dict]:
-    """Find similar food in our database"""
-    food_name_lower = food_name.lower()
-    
-    for food in indian_foods_db:
-        if food_name_lower in food["name"].lower() or food["name"].lower() in food_name_lower:
-            return food
-    
-    # If no exact match, return a default rice entry
-    return indian_foods_db[0]  # Default to rice
+    """Find similar food in our database, or None if nothing in the catalog matches"""
+    return dish_matcher.find_food(food_name)
 
-def calculate_nutrition(food_data: dict, quantity_grams: float) -> Dict[str, float]:
-    """Calculate nutrition based on quantity"""
-    nutrition = food_data["nutritional_info"]
-    factor = quantity_grams / 100.0
-    
-    return {
-        "calories": nutrition["calories_per_100g"] * factor,
-        "protein": nutrition["protein_per_100g"] * factor,
-        "carbs": nutrition["carbs_per_100g"] * factor,
-        "fat": nutrition["fat_per_100g"] * factor,
-        "fiber": nutrition["fiber_per_100g"] * factor
-    }
+def calculate_nutrition(items: List[Tuple[str, float]]) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """Per-item and total nutrition for (food name, grams) pairs in one vectorized pass"""
+    return nutrition_table.batch(items)
 
 # API Endpoints
 @api_router.get("/")
@@ -275,142 +426,377 @@ async def root():
 async def analyze_meal(request: MealAnalysisRequest):
     """Analyze meal from image using AI"""
     try:
-        # Analyze with Gemini
-        ai_result = await analyze_food_with_gemini(
-            request.image_base64, 
-            request.description or ""
+        return await run_meal_analysis(
+            decode_image_base64(request.image_base64),
+            request.description or "",
+            image_base64=request.image_base64
         )
-        
-        if not ai_result["success"]:
-            # Fallback - return empty values since we can't analyze properly
-            return {
-                "food_name": "Unable to analyze image",
-                "estimated_quantity": None,
-                "nutrition": {
-                    "calories": None,
-                    "protein": None,
-                    "carbs": None,
-                    "fat": None,
-                    "fiber": None
-                },
-                "ai_analysis": "Could not analyze the image. Please try again with a clearer photo.",
-                "confidence": 1,
-                "is_indian_food": False
-            }
-        
-        # Parse AI response and extract meaningful information
-        analysis_text = ai_result["analysis"]
-        
-        # Check if it's not Indian food
-        if "NOT_INDIAN_FOOD" in analysis_text.upper():
-            return {
-                "food_name": "Non-Indian Food Detected",
-                "estimated_quantity": None,
-                "nutrition": {
-                    "calories": None,
-                    "protein": None,
-                    "carbs": None,
-                    "fat": None,
-                    "fiber": None
-                },
-                "ai_analysis": analysis_text,
-                "confidence": 1,
-                "is_indian_food": False
-            }
-        
-        # Extract meaningful information from AI analysis for Indian food
-        food_name = "Indian meal"
-        estimated_quantity = 150.0  # Default reasonable portion
-        
-        # Try to extract more specific food identification
-        analysis_lower = analysis_text.lower()
-        
-        # Identify specific Indian dishes
-        if any(word in analysis_lower for word in ["rice", "biryani", "pulao"]):
-            food_name = "Rice-based Indian dish"
-            estimated_quantity = 200.0
-        elif any(word in analysis_lower for word in ["dal", "lentil", "sambar", "rasam"]):
-            food_name = "Dal/Lentil curry"
-            estimated_quantity = 150.0
-        elif any(word in analysis_lower for word in ["roti", "chapati", "naan", "paratha"]):
-            food_name = "Indian bread"
-            estimated_quantity = 80.0
-        elif any(word in analysis_lower for word in ["curry", "sabzi", "vegetable"]):
-            food_name = "Indian vegetable curry"
-            estimated_quantity = 120.0
-        elif any(word in analysis_lower for word in ["chicken", "mutton", "meat"]):
-            food_name = "Indian meat curry"
-            estimated_quantity = 150.0
-        elif any(word in analysis_lower for word in ["paneer"]):
-            food_name = "Paneer dish"
-            estimated_quantity = 130.0
-        elif any(word in analysis_lower for word in ["idli", "dosa", "uttapam"]):
-            food_name = "South Indian breakfast"
-            estimated_quantity = 120.0
-        elif any(word in analysis_lower for word in ["samosa", "pakoda", "chaat"]):
-            food_name = "Indian snack"
-            estimated_quantity = 100.0
-        
-        # Find similar food in database for more accurate nutrition
-        similar_food = find_similar_food(food_name)
-        
-        # Calculate realistic nutrition based on identified food type
-        if similar_food:
-            nutrition = calculate_nutrition(similar_food, estimated_quantity)
-        else:
-            # Provide reasonable estimates for mixed Indian meals
-            base_calories_per_gram = 1.5  # Reasonable for Indian food
-            nutrition = {
-                "calories": round(estimated_quantity * base_calories_per_gram, 1),
-                "protein": round(estimated_quantity * 0.06, 1),  # 6% protein
-                "carbs": round(estimated_quantity * 0.25, 1),   # 25% carbs  
-                "fat": round(estimated_quantity * 0.04, 1),     # 4% fat
-                "fiber": round(estimated_quantity * 0.02, 1)    # 2% fiber
-            }
-        
+
+    except Exception as e:
+        logger.error(f"Error in meal analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@api_router.post("/analyze-meal/upload", response_model=dict)
+async def analyze_meal_upload(request: Request, description: str = ""):
+    """Analyze a meal image sent as multipart/form-data or raw image bytes"""
+    try:
+        image_bytes, fields = await read_image_upload(request)
+        return await run_meal_analysis(image_bytes, fields.get("description", description))
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in meal analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@api_router.post("/analyze-meal/stream")
+async def analyze_meal_stream(request: MealAnalysisRequest):
+    """Analyze a meal, streaming Server-Sent Events: chunk, preview, then result"""
+    return sse_response(stream_meal_analysis(
+        decode_image_base64(request.image_base64),
+        request.description or "",
+        image_base64=request.image_base64
+    ))
+
+@api_router.get("/analyze-meal/stream")
+async def analyze_logged_meal_stream(meal_id: str, description: str = ""):
+    """EventSource-friendly variant (GET only): streams the analysis of a logged meal's stored image"""
+    try:
+        meal = await db.meals.find_one({"_id": ObjectId(meal_id)}, {"image_id": 1})
+        if meal is None or not meal.get("image_id"):
+            raise HTTPException(status_code=404, detail="Image not found")
+        image_bytes = await blob_store.read(meal["image_id"])
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in meal analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+    return sse_response(stream_meal_analysis(image_bytes, description))
+
+@api_router.post("/analyze-meals/batch")
+async def analyze_meals_batch(request: BatchMealAnalysisRequest):
+    """Analyze several meal photos concurrently, streaming one NDJSON line per image as it finishes"""
+    if len(request.images) > batch_max_images:
+        raise HTTPException(status_code=413, detail=f"At most {batch_max_images} images per batch")
+
+    async def analyze_one(index: int, item: MealAnalysisRequest) -> Dict[str, Any]:
+        try:
+            async with batch_analysis_slots:
+                result = await run_meal_analysis(
+                    decode_image_base64(item.image_base64),
+                    item.description or "",
+                    image_base64=item.image_base64
+                )
+            return {"index": index, "success": True, "result": result}
+        except Exception as e:
+            # One bad image must not fail the rest of the batch
+            logger.error(f"Error in batch meal analysis (image {index}): {str(e)}")
+            return {"index": index, "success": False, "error": f"Analysis failed: {str(e)}"}
+
+    async def stream_results():
+        tasks = [asyncio.create_task(analyze_one(i, item)) for i, item in enumerate(request.images)]
+        failed = 0
+        try:
+            for finished in asyncio.as_completed(tasks):
+                line = await finished
+                failed += not line["success"]
+                yield json.dumps(line, default=str) + "\n"
+            yield json.dumps({"done": True, "count": len(tasks), "failed": failed}) + "\n"
+        finally:
+            # Client went away mid-stream: don't keep analyzing for nobody
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+async def run_meal_analysis(image_bytes: bytes, description: str = "",
+                            image_base64: Optional[str] = None) -> Dict[str, Any]:
+    """Cached, normalized meal analysis shared by the JSON and upload endpoints"""
+    cache_key = analysis_cache_key(image_bytes, description)
+    cached = await analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Double-taps and retries of the same photo wait on the analysis already in flight
+    return await analysis_flights.do(
+        cache_key, lambda: analyze_uncached(cache_key, image_bytes, description, image_base64)
+    )
+
+async def analyze_uncached(cache_key: str, image_bytes: bytes, description: str,
+                           image_base64: Optional[str]) -> Dict[str, Any]:
+    """Normalize, look up near-duplicates, then ask Gemini; caches successful results"""
+    early_result, image_base64, image_hash = await prepare_llm_image(cache_key, image_bytes, description, image_base64)
+    if early_result is not None:
+        return early_result
+
+    # Analyze with Gemini
+    ai_result = await analyze_food_with_gemini(image_base64, description)
+    result = build_meal_analysis(ai_result)
+
+    # Only cache real answers, never the transient failure fallback
+    if ai_result["success"]:
+        await remember_analysis(cache_key, image_hash, description, result)
+
+    return result
+
+async def prepare_llm_image(cache_key: str, image_bytes: bytes, description: str,
+                            image_base64: Optional[str]) -> Tuple[Optional[Dict[str, Any]], str, Optional[int]]:
+    """Normalize, prefilter and look for a near-duplicate.
+
+    Returns (an answer that makes the LLM call unnecessary, or None; LLM base64; perceptual hash).
+    """
+    # Downsize/orient the image off the event loop; the same pass yields its perceptual hash and prefilter verdict
+    llm_image_bytes = image_bytes
+    image_hash = None
+    assessment = None
+    try:
+        llm_image_bytes, image_hash, assessment = await image_pipeline.prepare(
+            image_bytes, prefilter=image_prefilter.mode != "off"
+        )
+    except Exception as e:
+        logger.warning(f"Image normalization skipped: {str(e)}")
+
+    # Black, blank, blurry or screenshot images are answered locally instead of costing a Gemini call
+    rejected_reason = await image_prefilter.record(cache_key, assessment)
+    if rejected_reason is not None:
+        return rejected_analysis(rejected_reason), image_base64, image_hash
+
+    # Re-photographed plates won't match byte for byte, so try a near-duplicate lookup
+    if phash_enabled and image_hash is not None:
+        try:
+            similar = await perceptual_index.find(image_hash, description)
+            if similar is not None:
+                await analysis_cache.set(cache_key, similar)
+                return similar, image_base64, image_hash
+        except Exception as e:
+            logger.warning(f"Perceptual lookup skipped: {str(e)}")
+
+    # Base64 is only produced once, at the LLM boundary, and reused when the image was left untouched
+    if image_base64 is None or llm_image_bytes is not image_bytes:
+        image_base64 = base64.b64encode(llm_image_bytes).decode("ascii")
+    return None, image_base64, image_hash
+
+async def remember_analysis(cache_key: str, image_hash: Optional[int], description: str, result: Dict[str, Any]):
+    """Cache a successful analysis and index its perceptual hash for near-duplicate lookups"""
+    await analysis_cache.set(cache_key, result)
+    if phash_enabled and image_hash is not None:
+        try:
+            await perceptual_index.add(cache_key, image_hash, description, result)
+        except Exception as e:
+            logger.warning(f"Error storing perceptual hash: {str(e)}")
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def stream_meal_analysis(image_bytes: bytes, description: str = "",
+                               image_base64: Optional[str] = None):
+    """Server-Sent Events for one analysis.
+
+    ``chunk`` events carry Gemini's text as it arrives; a ``preview`` (the
+    response payload minus ai_analysis) is sent whenever the text seen so
+    far identifies the dish, so the UI can show numbers before Gemini is
+    done; ``result`` is exactly what /analyze-meal would have returned.
+    Cache hits, near-duplicates and prefilter rejections go straight to ``result``.
+    """
+    try:
+        cache_key = analysis_cache_key(image_bytes, description)
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            yield sse_event("result", cached)
+            return
+
+        early_result, image_base64, image_hash = await prepare_llm_image(cache_key, image_bytes, description, image_base64)
+        if early_result is not None:
+            yield sse_event("result", early_result)
+            return
+
+        text = ""
+        last_preview = None
+        try:
+            async for chunk in llm_caller.stream(food_analysis_message(image_base64, description)):
+                text += chunk
+                yield sse_event("chunk", {"text": chunk})
+
+                preview = build_meal_analysis({"analysis": text, "success": True})
+                del preview["ai_analysis"]
+                # "Indian meal" without items is just the default guess, not something recognized yet
+                if preview != last_preview and (preview.get("items") or preview["food_name"] != "Indian meal"):
+                    last_preview = preview
+                    yield sse_event("preview", preview)
+            ai_result = {"analysis": text, "success": True}
+        except Exception as e:
+            ai_result = gemini_failure(e)
+
+        result = build_meal_analysis(ai_result)
+        if ai_result["success"]:
+            await remember_analysis(cache_key, image_hash, description, result)
+        yield sse_event("result", result)
+
+    except Exception as e:
+        logger.error(f"Error in streaming meal analysis: {str(e)}")
+        yield sse_event("error", {"detail": f"Analysis failed: {str(e)}"})
+
+def sse_response(events) -> StreamingResponse:
+    # No-transform/buffering off so proxies forward each event as soon as it is written
+    return StreamingResponse(events, media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache, no-transform",
+        "X-Accel-Buffering": "no"
+    })
+
+def build_meal_analysis(ai_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a Gemini result into the analyze-meal response payload"""
+    if not ai_result["success"]:
+        # Fallback - return empty values since we can't analyze properly
+        return {
+            "food_name": "Unable to analyze image",
+            "estimated_quantity": None,
+            "nutrition": {
+                "calories": None,
+                "protein": None,
+                "carbs": None,
+                "fat": None,
+                "fiber": None
+            },
+            "ai_analysis": "Could not analyze the image. Please try again with a clearer photo.",
+            "confidence": 1,
+            "is_indian_food": False
+        }
+    
+    # Parse AI response and extract meaningful information
+    analysis_text = ai_result["analysis"]
+    
+    # Check if it's not Indian food
+    if "NOT_INDIAN_FOOD" in analysis_text.upper():
         return {
-            "food_name": food_name,
-            "estimated_quantity": estimated_quantity,
-            "nutrition": nutrition,
+            "food_name": "Non-Indian Food Detected",
+            "estimated_quantity": None,
+            "nutrition": {
+                "calories": None,
+                "protein": None,
+                "carbs": None,
+                "fat": None,
+                "fiber": None
+            },
             "ai_analysis": analysis_text,
-            "confidence": 8,
-            "is_indian_food": True
+            "confidence": 1,
+            "is_indian_food": False
         }
-        
+    
+    # Extract meaningful information from AI analysis for Indian food
+    food_name = "Indian meal"
+    estimated_quantity = 150.0  # Default reasonable portion
+    
+    # Identify specific Indian dishes and catalog foods in one pass over the text
+    match = dish_matcher.scan(analysis_text)
+    if match.dish_class:
+        food_name, estimated_quantity, _ = match.dish_class
+    
+    # Prefer a catalog food the analysis mentions for more accurate nutrition
+    similar_food = match.food or find_similar_food(food_name)
+    
+    # Calculate realistic nutrition based on identified food type
+    items = []
+    if len(match.foods) > 1:
+        # Several catalog dishes on the plate (e.g. a thali): a typical serving of each
+        items, nutrition = calculate_nutrition([(food["name"], food.get("serving_grams", 100.0)) for food in match.foods])
+        estimated_quantity = sum(item["quantity"] for item in items)
+    elif similar_food:
+        items, nutrition = calculate_nutrition([(similar_food["name"], estimated_quantity)])
+    else:
+        # Provide reasonable estimates for mixed Indian meals
+        base_calories_per_gram = 1.5  # Reasonable for Indian food
+        nutrition = {
+            "calories": round(estimated_quantity * base_calories_per_gram, 1),
+            "protein": round(estimated_quantity * 0.06, 1),  # 6% protein
+            "carbs": round(estimated_quantity * 0.25, 1),   # 25% carbs  
+            "fat": round(estimated_quantity * 0.04, 1),     # 4% fat
+            "fiber": round(estimated_quantity * 0.02, 1)    # 2% fiber
+        }
+    
+    return {
+        "food_name": food_name,
+        "estimated_quantity": estimated_quantity,
+        "nutrition": nutrition,
+        "items": items,
+        "ai_analysis": analysis_text,
+        "confidence": 8,
+        "is_indian_food": True
+    }
+
+# Asynchronous analysis jobs: a bounded queue drained by a fixed pool of workers
+analysis_jobs = create_job_queue(
+    os.environ.get('ANALYSIS_JOB_STORE', 'memory'),  # "mongo" survives restarts and is shared by all workers
+    run_meal_analysis,
+    collection=db.analysis_jobs,
+    blob_store=blob_store,
+    workers=int(os.environ.get('ANALYSIS_JOB_WORKERS', '4')),
+    max_depth=int(os.environ.get('ANALYSIS_JOB_MAX_DEPTH', '100')),
+    result_ttl_seconds=int(os.environ.get('ANALYSIS_JOB_RESULT_TTL_SECONDS', '3600')),
+    # Mongo store only: running jobs older than this are presumed orphaned and requeued
+    stale_seconds=int(os.environ.get('ANALYSIS_JOB_STALE_SECONDS', '300')),
+    poll_seconds=float(os.environ.get('ANALYSIS_JOB_POLL_SECONDS', '1'))
+)
+
+async def submit_analysis_job(image_bytes: bytes, description: str) -> Dict[str, Any]:
+    try:
+        return await analysis_jobs.submit(image_bytes, description)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@api_router.post("/analysis-jobs", response_model=dict, status_code=202)
+async def create_analysis_job(request: MealAnalysisRequest):
+    """Queue a meal analysis and return its job id right away"""
+    try:
+        return await submit_analysis_job(decode_image_base64(request.image_base64), request.description or "")
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error in meal analysis: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+        logger.error(f"Error queueing analysis job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/analysis-jobs/upload", response_model=dict, status_code=202)
+async def create_analysis_job_upload(request: Request, description: str = ""):
+    """Queue a meal analysis for a multipart or raw image upload"""
+    try:
+        image_bytes, fields = await read_image_upload(request)
+        return await submit_analysis_job(image_bytes, fields.get("description", description))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queueing analysis job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/analysis-jobs/stats")
+async def get_analysis_job_stats():
+    """Queue depth, worker utilization and outcome counters"""
+    return await analysis_jobs.stats()
+
+@api_router.get("/analysis-jobs/{job_id}")
+async def get_analysis_job(job_id: str, wait: float = 0):
+    """Job status and, once done, its analysis; ``wait`` long-polls up to that many seconds (max 30)"""
+    try:
+        job = await analysis_jobs.get(job_id, wait=min(max(wait, 0), 30))
+    except Exception as e:
+        logger.error(f"Error fetching analysis job: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return job
 
 @api_router.post("/log-meal", response_model=dict)
 async def log_meal(meal_data: dict):
     """Log a meal entry"""
     try:
-        # Create meal entry
-        meal_entry = {
-            "_id": ObjectId(),
-            "user_id": meal_data.get("user_id", "default_user"),
-            "food_name": meal_data["food_name"],
-            "estimated_quantity": meal_data["estimated_quantity"],
-            "calories": meal_data["nutrition"]["calories"],
-            "protein": meal_data["nutrition"]["protein"],
-            "carbs": meal_data["nutrition"]["carbs"],
-            "fat": meal_data["nutrition"]["fat"],
-            "fiber": meal_data["nutrition"]["fiber"],
-            "image_base64": meal_data.get("image_base64"),
-            "ai_analysis": meal_data.get("ai_analysis"),
-            "timestamp": datetime.utcnow(),
-            "meal_type": meal_data.get("meal_type", "general")
-        }
-        
-        # Insert into database
-        result = await db.meals.insert_one(meal_entry)
-        
-        # Clean up old meals (keep only last 14)
-        await cleanup_old_meals(meal_entry["user_id"])
+        image_base64 = meal_data.get("image_base64")
+        image_bytes = decode_image_base64(image_base64) if image_base64 else None
+        meal_id = await store_meal(meal_data, image_bytes)
         
         return {
             "success": True,
-            "meal_id": str(result.inserted_id),
+            "meal_id": meal_id,
             "message": "Meal logged successfully"
         }
         
@@ -418,140 +804,463 @@ async def log_meal(meal_data: dict):
         logger.error(f"Error logging meal: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to log meal: {str(e)}")
 
+@api_router.post("/log-meal/upload", response_model=dict)
+async def log_meal_upload(request: Request):
+    """Log a meal sent as multipart/form-data: an `image` file plus a `meal` JSON field"""
+    try:
+        image_bytes, fields = await read_image_upload(request, image_required=False)
+        if "meal" not in fields:
+            raise HTTPException(status_code=422, detail="Missing 'meal' form field")
+        meal_data = json.loads(fields["meal"])
+        meal_id = await store_meal(meal_data, image_bytes or None)
+
+        return {
+            "success": True,
+            "meal_id": meal_id,
+            "message": "Meal logged successfully"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error logging meal: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to log meal: {str(e)}")
+
+@api_router.post("/log-meals/bulk", response_model=dict)
+async def log_meals_bulk(request: BulkMealLogRequest):
+    """Log a batch of meals (e.g. replayed by a phone that was offline) with a single insert.
+
+    Meals whose ``idempotency_key`` is already stored for that user, or
+    repeated earlier in the batch, are reported as duplicates with the
+    original meal_id instead of being inserted again, so a batch can be
+    retried safely. Rollups, ETag versions and retention are updated once
+    for the whole batch.
+    """
+    if len(request.meals) > bulk_log_max_meals:
+        raise HTTPException(status_code=413, detail=f"At most {bulk_log_max_meals} meals per batch")
+
+    try:
+        documents = [meal_document(entry) for entry in request.meals]
+        images = [decode_image_base64(entry.image_base64) if entry.image_base64 else None for entry in request.meals]
+        outcomes = await meal_log.insert_batch(documents, images)
+
+        results = []
+        for index, (entry, (meal_id, status)) in enumerate(zip(request.meals, outcomes)):
+            results.append({
+                "index": index,
+                "meal_id": meal_id,
+                "idempotency_key": entry.idempotency_key,
+                "status": status
+            })
+
+        created = sum(status == "created" for _, status in outcomes)
+        return {
+            "success": True,
+            "created": created,
+            "duplicates": len(results) - created,
+            "results": results
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error bulk logging meals: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to log meals: {str(e)}")
+
+def meal_document(entry: MealEntry) -> Dict[str, Any]:
+    """Mongo document for a validated meal entry (image_id is set when it's stored); client timestamps are kept (as naive UTC)"""
+    document = {
+        "_id": ObjectId(),
+        "user_id": entry.user_id,
+        "food_name": entry.food_name,
+        "estimated_quantity": entry.estimated_quantity,
+        "calories": entry.calories,
+        "protein": entry.protein,
+        "carbs": entry.carbs,
+        "fat": entry.fat,
+        "fiber": entry.fiber,
+        "ai_analysis": entry.ai_analysis,
+        "timestamp": naive_utc(entry.timestamp),
+        "meal_type": entry.meal_type
+    }
+    if entry.idempotency_key:
+        document["idempotency_key"] = entry.idempotency_key
+    return document
+
+async def meals_inserted(meals: List[Dict[str, Any]]):
+    """Fold newly inserted meals into rollups and ETag versions, and queue one retention sweep per user"""
+    await daily_rollups.apply(meals)
+    user_ids = {meal["user_id"] for meal in meals}
+    await user_versions.bump_many(user_ids)
+    
+    # Trim history past each user's retention limit in the background
+    for user_id in user_ids:
+        meal_retention.schedule(user_id)
+
+meal_log = MealLog(db.meals, blob_store, meals_inserted)
+
+async def store_meal(meal_data: dict, image_bytes: Optional[bytes]) -> str:
+    """Insert a meal document and apply history retention; a repeated ``idempotency_key`` returns the stored meal"""
+    # Create meal entry
+    meal_entry = {
+        "_id": ObjectId(),
+        "user_id": meal_data.get("user_id", "default_user"),
+        "food_name": meal_data["food_name"],
+        "estimated_quantity": meal_data["estimated_quantity"],
+        "calories": meal_data["nutrition"]["calories"],
+        "protein": meal_data["nutrition"]["protein"],
+        "carbs": meal_data["nutrition"]["carbs"],
+        "fat": meal_data["nutrition"]["fat"],
+        "fiber": meal_data["nutrition"]["fiber"],
+        "ai_analysis": meal_data.get("ai_analysis"),
+        "timestamp": datetime.utcnow(),
+        "meal_type": meal_data.get("meal_type", "general")
+    }
+    if meal_data.get("idempotency_key"):
+        meal_entry["idempotency_key"] = meal_data["idempotency_key"]
+
+    return await meal_log.insert(meal_entry, image_bytes)
+
+async def conditional_get(request: Request, response: Response, user_id: str, view: str,
+                          *parts: Any) -> Optional[Response]:
+    """Put the view's ETag on ``response``; returns a 304 to send instead when the client's copy is current.
+
+    Runs before any meal query, so unchanged data costs no Mongo reads.
+    """
+    etag = await user_versions.etag(user_id, view, *parts)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if user_versions.matches(view, request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+def naive_utc(value: datetime) -> datetime:
+    """Meal timestamps are stored as naive UTC"""
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
 @api_router.get("/meals/recent/{user_id}")
-async def get_recent_meals(user_id: str = "default_user", limit: int = 14):
-    """Get recent meals for user"""
+async def get_recent_meals(request: Request, response: Response, user_id: str = "default_user", limit: int = 14,
+                           cursor: Optional[str] = None, start: Optional[datetime] = None,
+                           end: Optional[datetime] = None, fields: Optional[str] = None,
+                           exclude: Optional[str] = None):
+    """Get a page of a user's meals, newest first.
+
+    Pages are keyset-paginated on (timestamp, _id): pass the returned
+    ``next_cursor`` as ``cursor`` for the next page. ``start``/``end``
+    bound the timestamps (start inclusive, end exclusive);
+    ``fields``/``exclude`` (comma-separated) select what is fetched and
+    returned.
+    """
     try:
-        cursor = db.meals.find(
-            {"user_id": user_id}
-        ).sort("timestamp", -1).limit(limit)
+        limit = min(max(limit, 1), 100)
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        projection, keep, drop = meal_projection(fields, exclude)
+        # The next cursor is read from timestamp/_id even when the client didn't ask for them
+        if keep is not None:
+            projection["timestamp"] = 1
+        else:
+            projection.pop("timestamp", None)
+
+        not_modified = await conditional_get(request, response, user_id, "recent")
+        if not_modified is not None:
+            return not_modified
+
+        query: Dict[str, Any] = {"user_id": user_id}
+        if after is not None:
+            query.update(keyset_filter(*after))
+        time_range = query.setdefault("timestamp", {})
+        if start is not None:
+            time_range["$gte"] = naive_utc(start)
+        if end is not None:
+            time_range["$lt"] = naive_utc(end)
+        if not time_range:
+            del query["timestamp"]
+
+        # Never skip: the index is entered at the cursor and one extra meal tells whether another page exists
+        page = await db.meals.find(query, projection).sort(
+            [("timestamp", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        has_more = len(page) > limit
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1]["timestamp"], page[-1]["_id"]) if has_more else None
         
-        meals = []
-        async for meal in cursor:
-            meal["_id"] = str(meal["_id"])
-            meals.append(meal)
+        meals = [shape_meal(meal, keep, drop) for meal in page]
         
-        return {
+        return fast_response({
             "meals": meals,
-            "total": len(meals)
-        }
+            "total": len(meals),
+            "has_more": has_more,
+            "next_cursor": next_cursor
+        }, response)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching meals: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch meals: {str(e)}")
 
+# Response-only meal fields, derived from image_id
+IMAGE_URL_FIELDS = {"image_url", "image_urls"}
+
+def field_list(value: Optional[str]) -> Set[str]:
+    names = {name.strip() for name in value.split(",") if name.strip()} if value else set()
+    if any(name.startswith("$") for name in names):
+        raise HTTPException(status_code=422, detail="fields/exclude must be plain meal field names")
+    return names
+
+def meal_projection(fields: Optional[str], exclude: Optional[str],
+                    images: bool = True) -> Tuple[Dict[str, int], Optional[Set[str]], Set[str]]:
+    """Mongo projection for a meal listing, plus the response keys to keep (None: all) and to drop.
+
+    Only the requested fields are fetched; image URLs pull in image_id,
+    which is dropped again unless it was asked for. images=False removes
+    every image reference.
+    """
+    requested = field_list(fields)
+    excluded = field_list(exclude)
+    if requested and excluded:
+        raise HTTPException(status_code=422, detail="Use either fields or exclude, not both")
+    if not images:
+        requested -= IMAGE_URL_FIELDS | {"image_id"}
+        excluded |= IMAGE_URL_FIELDS | {"image_id"}
+
+    if requested:
+        projection = {field: 1 for field in requested - IMAGE_URL_FIELDS}
+        if requested & IMAGE_URL_FIELDS:
+            projection["image_id"] = 1
+        projection["_id"] = 1
+        return projection, requested | {"_id"}, excluded
+
+    projection = {field: 0 for field in (excluded | {"image_base64", "image_migrating"}) - IMAGE_URL_FIELDS - {"_id"}}
+    if IMAGE_URL_FIELDS - excluded:
+        projection.pop("image_id", None)
+    return projection, None, excluded
+
+def shape_meal(meal: Dict[str, Any], keep: Optional[Set[str]] = None, drop: Set[str] = frozenset()) -> Dict[str, Any]:
+    """Serialize a meal and trim it to the fields selected by meal_projection"""
+    meal = serialize_meal(meal)
+    if keep is not None:
+        return {key: value for key, value in meal.items() if key in keep}
+    for key in drop:
+        meal.pop(key, None)
+    return meal
+
+def serialize_meal(meal: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-ready meal: string id plus image URLs"""
+    meal["_id"] = str(meal["_id"])
+    meal["image_url"] = f"/api/meals/{meal['_id']}/image" if meal.get("image_id") else None
+    meal["image_urls"] = meal_image_urls(meal["_id"]) if meal.get("image_id") else None
+    return meal
+
 @api_router.get("/nutrition/summary/{user_id}")
-async def get_nutrition_summary(user_id: str = "default_user", days: int = 1):
-    """Get nutrition summary for specified days"""
+async def get_nutrition_summary(request: Request, response: Response, user_id: str = "default_user",
+                                days: int = 1, mode: str = "rollup", group_by: Optional[str] = None):
+    """Get nutrition summary for specified days.
+
+    mode=rollup reads daily rollups, mode=aggregate totals meals in a Mongo
+    pipeline, mode=raw sums the meals in Python and mode=compare returns the
+    rollup result alongside a check against raw. group_by=day|meal_type adds
+    per-group totals computed by the aggregation pipeline.
+    """
     try:
+        if mode not in ("rollup", "aggregate", "raw", "compare"):
+            raise HTTPException(status_code=422, detail="mode must be one of: rollup, aggregate, raw, compare")
+        if group_by is not None and group_by not in GROUP_KEYS:
+            raise HTTPException(status_code=422, detail=f"group_by must be one of: {', '.join(GROUP_KEYS)}")
+
         start_date = datetime.utcnow() - timedelta(days=days)
-        
-        cursor = db.meals.find({
-            "user_id": user_id,
-            "timestamp": {"$gte": start_date}
-        })
-        
-        total_calories = 0
-        total_protein = 0
-        total_carbs = 0
-        total_fat = 0
-        total_fiber = 0
-        meal_count = 0
-        
-        async for meal in cursor:
-            total_calories += meal.get("calories", 0)
-            total_protein += meal.get("protein", 0)
-            total_carbs += meal.get("carbs", 0)
-            total_fat += meal.get("fat", 0)
-            total_fiber += meal.get("fiber", 0)
-            meal_count += 1
-        
-        return {
-            "period_days": days,
-            "total_meals": meal_count,
-            "total_calories": round(total_calories, 2),
-            "total_protein": round(total_protein, 2),
-            "total_carbs": round(total_carbs, 2),
-            "total_fat": round(total_fat, 2),
-            "total_fiber": round(total_fiber, 2),
-            "daily_average": {
-                "calories": round(total_calories / days, 2),
-                "protein": round(total_protein / days, 2),
-                "carbs": round(total_carbs / days, 2),
-                "fat": round(total_fat / days, 2),
-                "fiber": round(total_fiber / days, 2)
+        # The window slides, so the ETag also turns over each minute as old meals age out
+        not_modified = await conditional_get(request, response, user_id, "summary", start_date.strftime("%Y%m%d%H%M"))
+        if not_modified is not None:
+            return not_modified
+
+        match = {"user_id": user_id, "timestamp": {"$gte": start_date}}
+
+        # Until the one-time backfill finishes, rollups miss older meals; total the meals instead
+        if mode == "rollup" and not daily_rollups.ready:
+            mode = "aggregate"
+
+        aggregated = None
+        if mode == "aggregate" or group_by:
+            aggregated = await aggregate_nutrition(db.meals, match, group_by)
+
+        if mode == "raw":
+            summary = format_nutrition_summary(await sum_nutrition(db.meals, match), days)
+        elif mode == "aggregate":
+            summary = format_nutrition_summary(aggregated["totals"], days)
+        else:
+            summary = format_nutrition_summary(await daily_rollups.totals_since(user_id, start_date), days)
+
+        if group_by:
+            summary["group_by"] = group_by
+            summary["groups"] = aggregated["groups"]
+
+        if mode == "compare":
+            raw = format_nutrition_summary(await sum_nutrition(db.meals, match), days)
+            differences = {
+                key: {"rollup": summary[key], "raw": raw[key]}
+                for key in raw
+                if key.startswith("total_") and abs(summary[key] - raw[key]) > 0.01
             }
-        }
+            summary["comparison"] = {
+                "matches": not differences,
+                "differences": differences,
+                "rollups_ready": daily_rollups.ready
+            }
+        return summary
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting nutrition summary: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def window_totals(user_id: str, start: datetime) -> Dict[str, float]:
+    """Totals since ``start`` as /nutrition/summary's default mode computes them"""
+    if daily_rollups.ready:
+        return await daily_rollups.totals_since(user_id, start)
+    # Until the one-time backfill finishes, rollups miss older meals
+    return (await aggregate_nutrition(db.meals, {"user_id": user_id, "timestamp": {"$gte": start}}))["totals"]
+
+def format_nutrition_summary(totals: Dict[str, float], days: int) -> Dict[str, Any]:
+    return {
+        "period_days": days,
+        "total_meals": totals["meal_count"],
+        "total_calories": round(totals["calories"], 2),
+        "total_protein": round(totals["protein"], 2),
+        "total_carbs": round(totals["carbs"], 2),
+        "total_fat": round(totals["fat"], 2),
+        "total_fiber": round(totals["fiber"], 2),
+        "daily_average": {
+            "calories": round(totals["calories"] / days, 2),
+            "protein": round(totals["protein"] / days, 2),
+            "carbs": round(totals["carbs"] / days, 2),
+            "fat": round(totals["fat"] / days, 2),
+            "fiber": round(totals["fiber"] / days, 2)
+        }
+    }
+
 @api_router.get("/protein-recommendations/{user_id}")
-async def get_protein_recommendations(user_id: str = "default_user"):
+async def get_protein_recommendations(request: Request, response: Response, user_id: str = "default_user"):
     """Get personalized protein recommendations"""
     try:
         # Get today's protein intake
         today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        not_modified = await conditional_get(request, response, user_id, "protein", today_start.strftime("%Y%m%d"))
+        if not_modified is not None:
+            return not_modified
         
-        cursor = db.meals.find({
+        aggregated = await aggregate_nutrition(db.meals, {
             "user_id": user_id,
             "timestamp": {"$gte": today_start}
         })
-        
-        current_protein = 0
-        async for meal in cursor:
-            current_protein += meal.get("protein", 0)
-        
-        # Recommended daily protein (0.8g per kg body weight, assuming 70kg person)
-        recommended_daily = 56.0  # Can be made dynamic based on user profile
-        deficit = max(0, recommended_daily - current_protein)
-        
-        high_protein_foods = [
-            "Paneer (18g protein per 100g)",
-            "Dal/Lentils (22g protein per 100g)",
-            "Chicken (25g protein per 100g)",
-            "Chickpeas (19g protein per 100g)",
-            "Greek Yogurt (10g protein per 100g)"
-        ]
-        
-        meal_suggestions = []
-        if deficit > 20:
-            meal_suggestions = [
-                "Add a bowl of dal or lentils (15-20g protein)",
-                "Include paneer in your next meal (15-18g protein)",
-                "Have a protein smoothie with yogurt and nuts"
-            ]
-        elif deficit > 10:
-            meal_suggestions = [
-                "Add some nuts or seeds to your meal",
-                "Include a small portion of paneer or dal",
-                "Have a glass of buttermilk or lassi"
-            ]
-        elif deficit > 0:
-            meal_suggestions = [
-                "You're close to your target! Add some nuts as snack",
-                "A small bowl of yogurt will complete your protein needs"
-            ]
-        else:
-            meal_suggestions = [
-                "Great job! You've met your protein target for today",
-                "Maintain this balanced approach to nutrition"
-            ]
-        
-        return {
-            "recommended_daily_protein": recommended_daily,
-            "current_protein": round(current_protein, 2),
-            "deficit": round(deficit, 2),
-            "percentage_complete": round((current_protein / recommended_daily) * 100, 1),
-            "high_protein_foods": high_protein_foods,
-            "meal_suggestions": meal_suggestions
-        }
+        return protein_recommendation(aggregated["totals"]["protein"])
         
     except Exception as e:
         logger.error(f"Error getting protein recommendations: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def protein_recommendation(current_protein: float) -> Dict[str, Any]:
+    """Protein target, deficit and suggestions for today's intake"""
+    # Recommended daily protein (0.8g per kg body weight, assuming 70kg person)
+    recommended_daily = 56.0  # Can be made dynamic based on user profile
+    deficit = max(0, recommended_daily - current_protein)
+    
+    high_protein_foods = [
+        "Paneer (18g protein per 100g)",
+        "Dal/Lentils (22g protein per 100g)",
+        "Chicken (25g protein per 100g)",
+        "Chickpeas (19g protein per 100g)",
+        "Greek Yogurt (10g protein per 100g)"
+    ]
+    
+    meal_suggestions = []
+    if deficit > 20:
+        meal_suggestions = [
+            "Add a bowl of dal or lentils (15-20g protein)",
+            "Include paneer in your next meal (15-18g protein)",
+            "Have a protein smoothie with yogurt and nuts"
+        ]
+    elif deficit > 10:
+        meal_suggestions = [
+            "Add some nuts or seeds to your meal",
+            "Include a small portion of paneer or dal",
+            "Have a glass of buttermilk or lassi"
+        ]
+    elif deficit > 0:
+        meal_suggestions = [
+            "You're close to your target! Add some nuts as snack",
+            "A small bowl of yogurt will complete your protein needs"
+        ]
+    else:
+        meal_suggestions = [
+            "Great job! You've met your protein target for today",
+            "Maintain this balanced approach to nutrition"
+        ]
+    
+    return {
+        "recommended_daily_protein": recommended_daily,
+        "current_protein": round(current_protein, 2),
+        "deficit": round(deficit, 2),
+        "percentage_complete": round((current_protein / recommended_daily) * 100, 1),
+        "high_protein_foods": high_protein_foods,
+        "meal_suggestions": meal_suggestions
+    }
+
+@api_router.get("/dashboard/{user_id}")
+async def get_dashboard(request: Request, response: Response, user_id: str = "default_user", limit: int = 14,
+                        days: int = 1, fields: Optional[str] = None, exclude: Optional[str] = None,
+                        images: bool = True):
+    """Recent meals, nutrition summary and protein recommendations in one round trip.
+
+    The three views run concurrently as bounded, indexed queries (a limited
+    find, the summary window's totals and today's totals), computed the same
+    way as their standalone endpoints, so a launch costs the same however
+    long the user's history is. ``fields``/``exclude`` (comma-separated)
+    select the meal fields fetched and returned; images=false drops image
+    references so clients can skip thumbnails.
+    """
+    try:
+        limit = min(max(limit, 1), 100)
+        days = max(days, 1)
+        projection, keep, drop = meal_projection(fields, exclude, images)
+
+        now = datetime.utcnow()
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        not_modified = await conditional_get(
+            request, response, user_id, "dashboard",
+            today_start.strftime("%Y%m%d"), (now - timedelta(days=days)).strftime("%Y%m%d%H%M")
+        )
+        if not_modified is not None:
+            return not_modified
+
+        recent, summary, today = await asyncio.gather(
+            db.meals.find({"user_id": user_id}, projection).sort(
+                [("timestamp", -1), ("_id", -1)]
+            ).limit(limit).to_list(limit),
+            window_totals(user_id, now - timedelta(days=days)),
+            aggregate_nutrition(db.meals, {"user_id": user_id, "timestamp": {"$gte": today_start}})
+        )
+
+        meals = [shape_meal(meal, keep, drop) for meal in recent]
+
+        return fast_response({
+            "user_id": user_id,
+            "recent_meals": {"meals": meals, "total": len(meals)},
+            "nutrition_summary": format_nutrition_summary(summary, days),
+            "protein_recommendations": protein_recommendation(today["totals"]["protein"])
+        }, response)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error building dashboard: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to load dashboard: {str(e)}")
+
 @api_router.delete("/meals/{meal_id}")
 async def delete_meal(meal_id: str):
     """Delete a specific meal by ID"""
@@ -560,9 +1269,10 @@ async def delete_meal(meal_id: str):
         object_id = ObjectId(meal_id)
         
         # Delete the meal
-        result = await db.meals.delete_one({"_id": object_id})
+        deleted = await db.meals.find_one_and_delete({"_id": object_id}, {"image_id": 1, **ROLLUP_PROJECTION})
         
-        if result.deleted_count == 1:
+        if deleted is not None:
+            await on_meals_removed([deleted])
             return {
                 "success": True,
                 "message": "Meal deleted successfully"
@@ -574,54 +1284,260 @@ async def delete_meal(meal_id: str):
         logger.error(f"Error deleting meal: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to delete meal: {str(e)}")
 
+def meal_image_urls(meal_id: str) -> Dict[str, str]:
+    """URLs of the original image and every resized variant of a meal"""
+    base_url = f"/api/meals/{meal_id}/image"
+    urls = {size: f"{base_url}?size={size}" for size in IMAGE_VARIANTS}
+    urls["original"] = base_url
+    return urls
+
+@api_router.get("/meals/{meal_id}/image")
+async def get_meal_image(meal_id: str, request: Request, size: str = "original"):
+    """Stream a meal's image (or a resized variant) with long-lived cache headers"""
+    try:
+        if size != "original" and size not in IMAGE_VARIANTS:
+            raise HTTPException(status_code=422, detail=f"Unknown size '{size}', expected one of: original, {', '.join(IMAGE_VARIANTS)}")
+
+        meal = await db.meals.find_one({"_id": ObjectId(meal_id)}, {"image_id": 1})
+        if meal is None or not meal.get("image_id"):
+            raise HTTPException(status_code=404, detail="Image not found")
+
+        image_id = meal["image_id"]
+        # Blobs are content-addressed, so the id is a strong validator and never changes
+        headers = {
+            "ETag": f'"{image_id}"' if size == "original" else f'"{image_id}-{size}"',
+            "Cache-Control": "public, max-age=31536000, immutable"
+        }
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+
+        if size != "original":
+            async def render_variant() -> bytes:
+                original = await blob_store.read(image_id)
+                return await image_pipeline.run(normalize_image, original, IMAGE_VARIANTS[size], 80)
+
+            data = await variant_cache.get_or_create(f"{image_id}-{size}.jpg", render_variant)
+            return Response(content=data, media_type="image/jpeg", headers=headers)
+
+        blob = await blob_store.stat(image_id)
+        if blob is None:
+            raise HTTPException(status_code=404, detail="Image not found")
+        headers["Content-Length"] = str(blob["length"])
+
+        return StreamingResponse(blob_store.stream(image_id), media_type=blob["content_type"], headers=headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching meal image: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to fetch image: {str(e)}")
+
 @api_router.get("/foods/search")
-async def search_indian_foods(query: str = ""):
-    """Search Indian foods database"""
+async def search_indian_foods(query: str = "", category: Optional[str] = None, region: Optional[str] = None,
+                              offset: int = 0, limit: int = 10):
+    """Search Indian foods database (ranked, typo tolerant, paginated)"""
     try:
-        if not query:
-            return {"foods": indian_foods_db[:10]}
+        offset = max(offset, 0)
+        limit = min(max(limit, 1), 100)
+        foods, total = food_search_index.search(query, category=category, region=region,
+                                                offset=offset, limit=limit)
         
-        query_lower = query.lower()
-        matching_foods = []
-        
-        for food in indian_foods_db:
-            if (query_lower in food["name"].lower() or 
-                query_lower in food["category"].lower() or
-                query_lower in food["region"].lower()):
-                matching_foods.append(food)
-        
-        return {"foods": matching_foods}
+        return {
+            "foods": foods,
+            "total": total,
+            "offset": offset,
+            "limit": limit
+        }
         
     except Exception as e:
         logger.error(f"Error searching foods: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def cleanup_old_meals(user_id: str):
-    """Keep only the most recent 14 meals"""
+@api_router.get("/users/{user_id}/retention")
+async def get_retention_settings(user_id: str):
+    """How many meals are kept for a user (0 = unlimited)"""
     try:
-        # Get all meals for user, sorted by timestamp descending
-        cursor = db.meals.find({"user_id": user_id}).sort("timestamp", -1)
-        
-        meals = []
-        async for meal in cursor:
-            meals.append(meal)
-        
-        # If more than 14 meals, delete the oldest ones
-        if len(meals) > 14:
-            meals_to_delete = meals[14:]  # Keep first 14, delete rest
-            meal_ids = [meal["_id"] for meal in meals_to_delete]
-            
-            await db.meals.delete_many({"_id": {"$in": meal_ids}})
-            logger.info(f"Cleaned up {len(meal_ids)} old meals for user {user_id}")
-            
+        return {
+            "user_id": user_id,
+            "keep_meals": await meal_retention.get_keep_limit(user_id)
+        }
+
     except Exception as e:
-        logger.error(f"Error cleaning up old meals: {str(e)}")
+        logger.error(f"Error getting retention settings: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.put("/users/{user_id}/retention")
+async def update_retention_settings(user_id: str, settings: RetentionSettings):
+    """Set a user's meal retention limit and apply it immediately"""
+    try:
+        await meal_retention.set_keep_limit(user_id, settings.keep_meals)
+        removed = await meal_retention.sweep_user(user_id)
+        return {
+            "user_id": user_id,
+            "keep_meals": await meal_retention.get_keep_limit(user_id),
+            "removed": removed
+        }
+
+    except Exception as e:
+        logger.error(f"Error updating retention settings: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/retention/sweep/{user_id}")
+async def sweep_user_meals(user_id: str):
+    """Run a retention sweep for one user now"""
+    try:
+        removed = await meal_retention.sweep_user(user_id)
+        return {"user_id": user_id, "removed": removed}
+
+    except Exception as e:
+        logger.error(f"Error sweeping meals: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/retention/stats")
+async def get_retention_stats():
+    """Counters for the background retention sweeper"""
+    return meal_retention.stats()
+
+@api_router.post("/admin/rollups/rebuild")
+async def rebuild_daily_rollups(user_id: Optional[str] = None):
+    """Repair job: recompute daily rollups from raw meals (one user, or everyone)"""
+    try:
+        rebuilt = await daily_rollups.rebuild(user_id)
+        return {"user_id": user_id, "rollups": rebuilt}
+
+    except Exception as e:
+        logger.error(f"Error rebuilding rollups: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/admin/query-plans")
+async def get_query_plans():
+    """Explain every production query and fail if any of them falls back to a COLLSCAN"""
+    try:
+        report = await check_query_plans(db)
+    except Exception as e:
+        logger.error(f"Error explaining queries: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not report["ok"]:
+        raise HTTPException(status_code=500, detail=report)
+    return report
+
+@api_router.post("/admin/catalog/reload")
+async def reload_food_catalog():
+    """Recompile and hot-swap the food catalog from its data file"""
+    try:
+        return await reload_catalog()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reloading food catalog: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the meal analysis cache"""
+    return {
+        **analysis_cache.stats(),
+        "perceptual": perceptual_index.stats(),
+        "prefilter": image_prefilter.stats(),
+        "conditional_get": user_versions.stats(),
+        "llm": {**analysis_flights.stats(), "pool": llm_pool.stats(), "caller": llm_caller.stats()},
+        "image_variants": variant_cache.stats(),
+        "food_search": food_search_index.cache_stats()
+    }
+
+async def migrate_inline_images(stale_after: timedelta = timedelta(minutes=10)):
+    """Move images still embedded in meal documents into the blob store.
+
+    Every worker runs this at startup, so each meal is claimed atomically
+    before its image is stored; otherwise two workers could both ``put``
+    the same image and leave its blob with a reference nothing releases.
+    Claims older than ``stale_after`` (a worker died mid-move) are retaken.
+    The partial ``inline_images`` index holds only meals still to migrate,
+    so each claim is an index lookup rather than a collection scan.
+    """
+    migrated = 0
+    try:
+        while True:
+            claimed_at = datetime.utcnow()
+            meal = await db.meals.find_one_and_update(
+                {
+                    "image_base64": {"$type": "string"},
+                    "$or": [
+                        {"image_migrating": {"$exists": False}},
+                        {"image_migrating": {"$lt": claimed_at - stale_after}}
+                    ]
+                },
+                {"$set": {"image_migrating": claimed_at}},
+                projection={"image_base64": 1, "user_id": 1}
+            )
+            if meal is None:
+                break
+
+            image_id = await blob_store.put(decode_image_base64(meal["image_base64"]))
+            result = await db.meals.update_one(
+                {"_id": meal["_id"], "image_migrating": claimed_at},
+                {"$set": {"image_id": image_id}, "$unset": {"image_base64": "", "image_migrating": ""}}
+            )
+            if not result.modified_count:
+                # Our claim went stale and another worker took the meal over
+                await blob_store.release(image_id)
+                continue
+            # Cached copies of this user's meals lack the new image URLs
+            if meal.get("user_id"):
+                await user_versions.bump(meal["user_id"])
+            migrated += 1
+
+    except Exception as e:
+        logger.error(f"Error migrating inline meal images: {str(e)}")
+
+    if migrated:
+        logger.info(f"Moved {migrated} inline meal images to the blob store")
+
+async def backfill_daily_rollups():
+    """Build rollups for meals logged before they existed (once per deployment)"""
+    try:
+        await daily_rollups.backfill()
+    except Exception as e:
+        logger.error(f"Error backfilling daily rollups: {str(e)}")
 
 # Include router in app
 app.include_router(api_router)
 
+catalog_watcher: Optional[asyncio.Task] = None
+
+@app.on_event("startup")
+async def startup_db_client():
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Error creating indexes: {str(e)}")
+
+    meal_retention.start()
+    llm_pool.warm()
+    analysis_jobs.start()
+
+    global catalog_watcher
+    if catalog_watch_seconds > 0:
+        catalog_watcher = asyncio.create_task(watch_catalog())
+
+    # Legacy meals carried their image inline; migrate them without delaying startup
+    asyncio.create_task(migrate_inline_images())
+    asyncio.create_task(backfill_daily_rollups())
+
+    if phash_enabled:
+        try:
+            await perceptual_index.rebuild()
+        except Exception as e:
+            logger.error(f"Error rebuilding perceptual index: {str(e)}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await meal_retention.stop()
+    await analysis_jobs.stop()
+    if catalog_watcher:
+        catalog_watcher.cancel()
+    image_pipeline.shutdown()
     client.close()
 
 if __name__ == "__main__":
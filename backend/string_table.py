@@ -0,0 +1,39 @@
+from collections.abc import Sequence
+from typing import Iterable, Tuple
+
+import numpy as np
+
+
+def pack_strings(values: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 concatenation of ``values`` plus int64 offsets (string i is data[offsets[i]:offsets[i + 1]])"""
+    data = bytearray()
+    offsets = [0]
+    for value in values:
+        data += value.encode("utf-8")
+        offsets.append(len(data))
+    return np.array(offsets, dtype=np.int64), np.frombuffer(bytes(data), dtype=np.uint8)
+
+
+class StringTable(Sequence):
+    """Read-only list of strings over packed (offsets, data) arrays, typically memory-mapped.
+
+    Strings are decoded on access, so a sorted table can be bisected
+    without ever materializing it as Python objects.
+    """
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray):
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("string table index out of range")
+        start, end = self._offsets[index:index + 2].tolist()
+        return self._data[start:end].tobytes().decode("utf-8")
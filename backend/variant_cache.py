@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class VariantCache:
+    """On-disk cache of derived images (thumbnails etc.) with LRU eviction by total size.
+
+    Recency is tracked in memory and mirrored into file mtimes, so the LRU
+    order survives restarts. Concurrent requests for the same missing
+    variant share one generation.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # filename -> size
+        self._bytes = 0
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    def _load(self):
+        os.makedirs(self.root, exist_ok=True)
+        files = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".") or not os.path.isfile(path):
+                continue
+            info = os.stat(path)
+            files.append((info.st_mtime, name, info.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+        self._evict()
+
+    async def get_or_create(self, name: str, create: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Return the cached variant, generating and storing it on a miss"""
+        data = await asyncio.to_thread(self._read, name)
+        if data is not None:
+            self.hits += 1
+            self._touch(name)
+            return data
+        # Possibly evicted by another worker sharing the directory
+        self._forget(name)
+
+        pending = self._pending.get(name)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The request generating it was cancelled; generate it for this one instead
+                return await self.get_or_create(name, create)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[name] = future
+        try:
+            data = await create()
+            await asyncio.to_thread(self._write, name, data)
+            self._remember(name, len(data))
+            future.set_result(data)
+            return data
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved so waiter-less failures aren't logged as unhandled
+            raise
+        finally:
+            del self._pending[name]
+            # Cancelled mid-create: wake the waiters instead of leaving them on a future that never resolves
+            if not future.done():
+                future.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes
+        }
+
+    def _read(self, name: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.root, name), "rb") as handle:
+                return handle.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, name: str, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".")
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.replace(tmp_path, os.path.join(self.root, name))
+
+    def _touch(self, name: str):
+        if name in self._entries:
+            self._entries.move_to_end(name)
+        try:
+            os.utime(os.path.join(self.root, name))
+        except OSError:
+            pass
+
+    def _remember(self, name: str, size: int):
+        self._forget(name)
+        self._entries[name] = size
+        self._bytes += size
+        self._evict()
+
+    def _forget(self, name: str):
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError as e:
+                logger.warning(f"Error evicting image variant {name}: {str(e)}")
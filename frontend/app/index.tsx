@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
   View,
   Text,
@@ -18,6 +18,12 @@ import Constants from 'expo-constants';
 
 const API_BASE_URL = Constants.expoConfig?.extra?.EXPO_BACKEND_URL || process.env.EXPO_PUBLIC_BACKEND_URL;
 
+// Only the meal fields the screens render, so the dashboard payload stays small on mobile networks
+const DASHBOARD_MEAL_FIELDS = [
+  'food_name', 'estimated_quantity', 'calories', 'protein', 'carbs', 'fat', 'fiber',
+  'timestamp', 'ai_analysis', 'image_urls',
+].join(',');
+
 interface NutritionData {
   calories: number;
   protein: number;
@@ -36,7 +42,8 @@ interface MealEntry {
   fat: number;
   fiber: number;
   timestamp: string;
-  image_base64?: string;
+  image_url?: string | null;
+  image_urls?: { thumb: string; medium: string; original: string } | null;
   ai_analysis?: string;
 }
 
@@ -60,52 +67,37 @@ export default function CalorieTracker() {
   const [selectedAnalysis, setSelectedAnalysis] = useState<string | null>(null);
   const [showAnalysisModal, setShowAnalysisModal] = useState(false);
   const [deletingMealId, setDeletingMealId] = useState<string | null>(null);
+  // ETag of the dashboard currently on screen; the server answers 304 while it is still current
+  const dashboardEtag = useRef<string | null>(null);
 
   useEffect(() => {
     loadInitialData();
   }, []);
 
   const loadInitialData = async () => {
-    await Promise.all([
-      fetchRecentMeals(),
-      fetchTodaysNutrition(),
-      fetchProteinRecommendations()
-    ]);
-  };
-
-  const fetchRecentMeals = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/api/meals/recent/default_user`);
-      const data = await response.json();
-      setRecentMeals(data.meals || []);
-    } catch (error) {
-      console.error('Error fetching meals:', error);
-    }
-  };
-
-  const fetchTodaysNutrition = async () => {
+    // Recent meals, today's nutrition and protein recommendations in one request
     try {
-      const response = await fetch(`${API_BASE_URL}/api/nutrition/summary/default_user?days=1`);
+      const response = await fetch(
+        `${API_BASE_URL}/api/dashboard/default_user?days=1&fields=${DASHBOARD_MEAL_FIELDS}`,
+        { headers: dashboardEtag.current ? { 'If-None-Match': dashboardEtag.current } : {} }
+      );
+      if (response.status === 304) {
+        return;
+      }
       const data = await response.json();
+      dashboardEtag.current = response.ok ? response.headers.get('ETag') : null;
+      const summary = data.nutrition_summary || {};
+      setRecentMeals(data.recent_meals?.meals || []);
       setTodaysNutrition({
-        calories: data.total_calories || 0,
-        protein: data.total_protein || 0,
-        carbs: data.total_carbs || 0,
-        fat: data.total_fat || 0,
-        fiber: data.total_fiber || 0,
+        calories: summary.total_calories || 0,
+        protein: summary.total_protein || 0,
+        carbs: summary.total_carbs || 0,
+        fat: summary.total_fat || 0,
+        fiber: summary.total_fiber || 0,
       });
+      setProteinRec(data.protein_recommendations || null);
     } catch (error) {
-      console.error('Error fetching nutrition:', error);
-    }
-  };
-
-  const fetchProteinRecommendations = async () => {
-    try {
-      const response = await fetch(`${API_BASE_URL}/api/protein-recommendations/default_user`);
-      const data = await response.json();
-      setProteinRec(data);
-    } catch (error) {
-      console.error('Error fetching protein recommendations:', error);
+      console.error('Error fetching dashboard:', error);
     }
   };
 
@@ -375,9 +367,9 @@ export default function CalorieTracker() {
                   {Math.round(meal.calories)} cal • {Math.round(meal.protein)}g protein
                 </Text>
               </View>
-              {meal.image_base64 && (
+              {meal.image_urls && (
                 <Image 
-                  source={{ uri: `data:image/jpeg;base64,${meal.image_base64}` }}
+                  source={{ uri: `${API_BASE_URL}${meal.image_urls.thumb}` }}
                   style={styles.mealThumbnail}
                 />
               )}
@@ -417,9 +409,9 @@ export default function CalorieTracker() {
               </Text>
             </View>
             <View style={styles.mealHeaderRight}>
-              {meal.image_base64 && (
+              {meal.image_urls && (
                 <Image 
-                  source={{ uri: `data:image/jpeg;base64,${meal.image_base64}` }}
+                  source={{ uri: `${API_BASE_URL}${meal.image_urls.thumb}` }}
                   style={styles.mealImage}
                 />
               )}
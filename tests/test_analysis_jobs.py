@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from analysis_jobs import AnalysisJobQueue, QueueFull, create_job_queue
+from blob_store import FileSystemBlobStore
+
+
+async def analyze(image_bytes, description):
+    return {"food_name": description or "dal", "size": len(image_bytes)}
+
+
+def test_full_queue_refuses_with_retry_hint():
+    async def scenario():
+        queue = create_job_queue("memory", analyze, workers=2, max_depth=3)
+        for _ in range(3):
+            await queue.submit(b"img")
+
+        with pytest.raises(QueueFull) as refused:
+            await queue.submit(b"img")
+        assert refused.value.depth == 3
+        # No job has finished yet: 5 s per job, one job past the limit, two workers
+        assert refused.value.retry_after == 3
+        assert queue.rejected == 1
+
+        # The hint follows the measured job time
+        queue._avg_seconds = 20.0
+        assert queue.retry_after(7) == 50
+
+    asyncio.run(scenario())
+
+
+def test_memory_queue_runs_jobs_to_completion():
+    async def scenario():
+        queue = create_job_queue("memory", analyze, workers=1, max_depth=10)
+        queue.start()
+        try:
+            job = await queue.submit(b"image", "idli")
+            done = await queue.get(job["job_id"], wait=1)
+        finally:
+            await queue.stop()
+
+        assert done["status"] == "done"
+        assert done["result"] == {"food_name": "idli", "size": 5}
+        assert queue.completed == 1
+
+    asyncio.run(scenario())
+
+
+def test_stale_running_jobs_are_requeued_and_finished(tmp_path):
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["job_tests"]
+        blobs = FileSystemBlobStore(db.meta, str(tmp_path))
+        queue = create_job_queue("mongo", analyze, collection=db.analysis_jobs, blob_store=blobs,
+                                 workers=1, poll_seconds=0.01, stale_seconds=60)
+
+        job = await queue.submit(b"image", "poha")
+        # A worker in a process that then died claimed the job
+        job_id, _, _ = await queue._claim()
+        assert job_id == job["job_id"]
+        assert await queue.requeue_stale() == 0
+
+        await db.analysis_jobs.update_one({"_id": job_id}, {"$set": {"started_at": datetime.utcnow() - timedelta(minutes=5)}})
+        assert await queue.requeue_stale() == 1
+        assert (await queue.get(job_id))["status"] == "queued"
+
+        queue.start()
+        try:
+            done = await queue.get(job_id, wait=2)
+        finally:
+            await queue.stop()
+        assert done["status"] == "done"
+        assert done["result"]["food_name"] == "poha"
+        # The parked image is released once the job finishes
+        assert await db.meta.count_documents({}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_stale_and_poll_settings_only_reach_the_mongo_store():
+    queue = create_job_queue("mongo", analyze, collection=object(), blob_store=object(),
+                             poll_seconds=0.5, stale_seconds=120, result_ttl_seconds=60)
+    assert (queue.poll_seconds, queue.stale_seconds, queue.result_ttl_seconds) == (0.5, 120, 60)
+    assert create_job_queue("memory", analyze, poll_seconds=0.5, stale_seconds=120).store_name == "memory"
+
+    with pytest.raises(TypeError):
+        AnalysisJobQueue(analyze)
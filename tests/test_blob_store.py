@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from blob_store import FileSystemBlobStore
+
+JPEG = b"\xff\xd8\xff\xe0" + b"meal photo" * 100
+
+
+def new_store(tmp_path):
+    db = mongomock_motor.AsyncMongoMockClient()["blob_tests"]
+    return FileSystemBlobStore(db.meal_images_meta, str(tmp_path))
+
+
+def test_identical_bytes_share_one_refcounted_blob(tmp_path):
+    async def scenario():
+        store = new_store(tmp_path)
+        first = await store.put(JPEG)
+        second = await store.put(JPEG)
+
+        assert first == second == hashlib.sha256(JPEG).hexdigest()
+        blob = await store.stat(first)
+        assert blob["refs"] == 2
+        assert blob["length"] == len(JPEG)
+        assert blob["content_type"] == "image/jpeg"
+        assert await store.read(first) == JPEG
+
+    asyncio.run(scenario())
+
+
+def test_release_deletes_bytes_with_the_last_reference(tmp_path):
+    async def scenario():
+        store = new_store(tmp_path)
+        blob_id = await store.put(JPEG)
+        await store.put(JPEG)
+        other = await store.put(b"another image")
+
+        await store.release(blob_id)
+        assert (await store.stat(blob_id))["refs"] == 1
+        assert os.path.exists(store.path_for(blob_id))
+
+        await store.release(blob_id)
+        assert await store.stat(blob_id) is None
+        assert not os.path.exists(store.path_for(blob_id))
+        assert await store.read(other) == b"another image"
+
+    asyncio.run(scenario())
+
+
+def test_put_after_delete_stores_the_bytes_again(tmp_path):
+    async def scenario():
+        store = new_store(tmp_path)
+        blob_id = await store.put(JPEG)
+        await store.release(blob_id)
+
+        assert await store.put(JPEG) == blob_id
+        assert (await store.stat(blob_id))["refs"] == 1
+        assert await store.read(blob_id) == JPEG
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_puts_count_every_reference(tmp_path):
+    async def scenario():
+        store = new_store(tmp_path)
+        ids = await asyncio.gather(*(store.put(JPEG) for _ in range(5)))
+
+        assert len(set(ids)) == 1
+        assert (await store.stat(ids[0]))["refs"] == 5
+        for blob_id in ids:
+            await store.release(blob_id)
+        assert await store.stat(ids[0]) is None
+        assert not os.path.exists(store.path_for(ids[0]))
+
+    asyncio.run(scenario())
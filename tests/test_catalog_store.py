@@ -0,0 +1,60 @@
+import json
+
+from catalog_store import load_catalog
+from dish_matcher import DishMatcher
+from food_search import FoodSearchIndex
+from nutrition_table import NutritionTable
+
+DISH_CLASSES = [
+    ("Rice-based Indian dish", 200.0, ["rice", "biryani"]),
+    ("Dal/Lentil curry", 150.0, ["dal", "lentil"]),
+    ("Indian meat curry", 150.0, ["chicken", "mutton"]),
+]
+
+FOODS = [
+    {"name": "Dal (Toor/Arhar)", "category": "dal", "region": "all", "aliases": ["toor dal", "arhar dal"],
+     "nutritional_info": {"calories_per_100g": 343, "protein_per_100g": 22.3, "carbs_per_100g": 59.8,
+                          "fat_per_100g": 1.5, "fiber_per_100g": 9.5}},
+    {"name": "Chicken Biryani", "category": "rice", "region": "south", "aliases": ["murgh biryani"],
+     "nutritional_info": {"calories_per_100g": 200, "protein_per_100g": 12, "carbs_per_100g": 25,
+                          "fat_per_100g": 6, "fiber_per_100g": 1}},
+    {"name": "Roti/Chapati", "category": "bread", "region": "north", "aliases": ["phulka"],
+     "nutritional_info": {"calories_per_100g": 297, "protein_per_100g": 11, "carbs_per_100g": 55,
+                          "fat_per_100g": 4, "fiber_per_100g": 10}},
+]
+
+
+def mapped_catalog(tmp_path):
+    source = tmp_path / "foods.json"
+    source.write_text(json.dumps(FOODS))
+    catalog, compiled = load_catalog(str(source), str(tmp_path / "store"))
+    assert compiled
+    return catalog
+
+
+def test_mapped_indexes_use_the_compiled_arrays(tmp_path):
+    catalog = mapped_catalog(tmp_path)
+    search = FoodSearchIndex(catalog)
+    assert search._posting_ids is catalog.search_arrays["search_posting_ids"]
+    assert DishMatcher(catalog, DISH_CLASSES)._phrase_foods is catalog.phrase_arrays["phrase_foods"]
+
+
+def test_mapped_indexes_answer_like_in_memory_ones(tmp_path):
+    catalog = mapped_catalog(tmp_path)
+    foods = list(catalog)
+
+    for query, category, region in [("dal", None, None), ("biriyani", None, None), ("chap", None, None),
+                                    ("", "rice", None), ("", None, "south"), ("toor dal", "dal", "north")]:
+        assert FoodSearchIndex(catalog).search(query, category, region) == \
+            FoodSearchIndex(foods).search(query, category, region)
+
+    mapped, in_memory = DishMatcher(catalog, DISH_CLASSES), DishMatcher(foods, DISH_CLASSES)
+    for text in ["Chicken biryani with two chapatis and toor dal", "plain rice", "murgh biryanis", "nothing here"]:
+        a, b = mapped.scan(text), in_memory.scan(text)
+        assert (a.dish_class, a.foods, a.food) == (b.dish_class, b.foods, b.food)
+    assert mapped.find_food("Roti/Chapati")["name"] == "Roti/Chapati"
+    assert mapped.scan("chicken biryani").dish_class[0] == "Rice-based Indian dish"
+
+    items, totals = NutritionTable(catalog).batch([("chicken biryani", 150), ("DAL (TOOR/ARHAR)", 100)])
+    assert [item["food_name"] for item in items] == ["Chicken Biryani", "Dal (Toor/Arhar)"]
+    assert totals == NutritionTable(foods).batch([("Chicken Biryani", 150), ("dal (toor/arhar)", 100)])[1]
@@ -0,0 +1,33 @@
+from food_search import FoodSearchIndex
+
+FOODS = [{"name": f"Paneer tikka {i}", "category": "snack", "region": "north", "aliases": [f"tikka{i}"]}
+         for i in range(5000)]
+
+
+def test_paging_uses_memoized_candidates():
+    index = FoodSearchIndex(FOODS)
+    first, total = index.search("paneer", limit=10)
+    second, _ = index.search("paneer", offset=10, limit=10)
+    assert total == len(FOODS)
+    assert not {food["name"] for food in first} & {food["name"] for food in second}
+    assert index.cache_stats()["entries"] == 1
+
+
+def test_candidate_cache_is_bounded_by_bytes():
+    # Each of these matches all 5000 foods: 5000 ids + 5000 rank keys = 80,000 bytes
+    index = FoodSearchIndex(FOODS, cache_max_bytes=320 * 1024)
+    for query in ("paneer", "tikka", "paneer tikka", "snack", "north", "paneer snack"):
+        assert index.search(query)[1] == len(FOODS)
+    stats = index.cache_stats()
+    assert stats["entries"] == 4
+    assert stats["bytes"] <= stats["max_bytes"]
+
+    # Most recently used entries survive
+    index.search("paneer snack")
+    assert index.cache_stats()["entries"] == 4
+
+    # Sets over a quarter of the budget are recomputed rather than cached
+    small = FoodSearchIndex(FOODS, cache_max_bytes=64 * 1024)
+    results, total = small.search("paneer")
+    assert total == len(FOODS) and len(results) == 10
+    assert small.cache_stats() == {"entries": 0, "bytes": 0, "max_bytes": 64 * 1024}
@@ -0,0 +1,128 @@
+import asyncio
+import io
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from image_prefilter import PrefilterLog, assess_image, rejected_analysis
+
+WIDTH, HEIGHT = 640, 480
+
+
+def encode(pixels, fmt="JPEG"):
+    image = pixels if isinstance(pixels, Image.Image) else Image.fromarray(np.uint8(np.clip(pixels, 0, 255)))
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, quality=90)
+    return buffer.getvalue()
+
+
+def food_photo(seed=3):
+    """Warm, textured colour patches with sensor-like noise, standing in for a plate of food"""
+    rng = np.random.default_rng(seed)
+    patches = np.uint8(np.clip(128 + 50 * rng.normal(size=(HEIGHT // 16, WIDTH // 16, 3)), 0, 255))
+    pixels = np.asarray(Image.fromarray(patches).resize((WIDTH, HEIGHT), Image.BICUBIC), dtype=np.float32)
+    pixels += rng.normal(0, 12, pixels.shape)
+    pixels[..., 0] += 30
+    pixels[..., 2] -= 20
+    return np.clip(pixels, 0, 255)
+
+
+def screenshot():
+    """White page of black text lines and one coloured button"""
+    rng = np.random.default_rng(5)
+    image = Image.new("RGB", (WIDTH, HEIGHT), "white")
+    draw = ImageDraw.Draw(image)
+    for top in range(40, HEIGHT - 20, 24):
+        draw.rectangle([30, top, 30 + int(rng.integers(200, 560)), top + 10], fill="black")
+    draw.rectangle([450, 20, 620, 60], fill=(30, 120, 240))
+    return image
+
+
+def reason(image_bytes):
+    return assess_image(image_bytes)["reason"]
+
+
+def test_textured_photo_passes():
+    assessment = assess_image(encode(food_photo()))
+    assert assessment["reason"] is None
+    assert assessment["metrics"]["sharpness"] > 100
+    assert assessment["metrics"]["colorfulness"] > 50
+
+
+def test_dim_photo_and_white_plate_pass():
+    # Underexposed but readable
+    assert reason(encode(food_photo() * 0.35)) is None
+
+    # Food on a large white plate: bright, but shaded rather than clipped flat
+    rng = np.random.default_rng(7)
+    pixels = food_photo()
+    rows, cols = np.mgrid[:HEIGHT, :WIDTH]
+    plate = ((cols - 320) / 300) ** 2 + ((rows - 240) / 230) ** 2 < 1
+    food = ((cols - 320) / 150) ** 2 + ((rows - 240) / 110) ** 2 < 1
+    rim = plate & ~food
+    pixels[rim] = 248 + rng.normal(0, 2, (rim.sum(), 1))
+    assert reason(encode(pixels)) is None
+
+
+def test_black_frame_is_too_dark():
+    assert reason(encode(food_photo() * 0.08)) == "too_dark"
+
+
+def test_blown_out_frame_is_overexposed():
+    assert reason(encode(245 + food_photo() * 0.04)) == "overexposed"
+
+
+def test_uniform_frame_is_blank():
+    assert reason(encode(Image.new("RGB", (WIDTH, HEIGHT), (120, 110, 100)))) == "blank"
+
+
+def test_blurred_photo_is_blurry():
+    blurred = Image.fromarray(np.uint8(food_photo())).filter(ImageFilter.GaussianBlur(12))
+    assert reason(encode(blurred)) == "blurry"
+
+
+def test_grayscale_photo_is_monochrome():
+    gray = Image.fromarray(np.uint8(food_photo())).convert("L").convert("RGB")
+    assert reason(encode(gray)) == "monochrome"
+
+
+def test_screenshot_is_not_a_photo():
+    assessment = assess_image(encode(screenshot(), "PNG"))
+    assert assessment["reason"] == "not_photo"
+    assert assessment["metrics"]["sharpness"] > 1000
+
+
+def test_rejected_analysis_explains_the_reason():
+    payload = rejected_analysis("blurry")
+    assert payload["rejected_reason"] == "blurry"
+    assert "blurry" in payload["ai_analysis"]
+    assert payload["nutrition"]["calories"] is None
+
+
+def test_shadow_mode_records_without_rejecting():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["prefilter_tests"]
+        blurry = assess_image(encode(Image.fromarray(np.uint8(food_photo())).filter(ImageFilter.GaussianBlur(12))))
+        sharp = assess_image(encode(food_photo()))
+
+        shadow = PrefilterLog(db.prefilter_decisions)
+        assert shadow.mode == "shadow"
+        assert await shadow.record("a", blurry) is None
+        assert await shadow.record("b", sharp) is None
+        decision = await db.prefilter_decisions.find_one({"cache_key": "a"})
+        assert decision["reason"] == "blurry" and not decision["enforced"]
+        assert shadow.stats()["llm_calls_saved"] == 0
+        assert shadow.stats()["reject_rate"] == 0.5
+
+        enforce = PrefilterLog(db.prefilter_decisions, mode="enforce")
+        assert await enforce.record("c", blurry) == "blurry"
+        assert enforce.stats()["llm_calls_saved"] == 1
+
+        off = PrefilterLog(db.prefilter_decisions, mode="off")
+        assert await off.record("d", blurry) is None
+        assert off.stats()["checked"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,46 @@
+import asyncio
+
+from indexes import explain_query, production_queries, winning_plan
+
+
+class ExplainRecorder:
+    """Stands in for a database, answering explain with a canned plan"""
+
+    def __init__(self, explained):
+        self.explained = explained
+        self.commands = []
+
+    async def command(self, command):
+        self.commands.append(command)
+        return self.explained
+
+
+INDEX_SCAN = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+
+
+def test_winning_plan_of_find_and_aggregate_explains():
+    assert winning_plan({"queryPlanner": {"winningPlan": INDEX_SCAN}}) is INDEX_SCAN
+    aggregate = {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}}, {"$group": {}}]}
+    assert winning_plan(aggregate) == {"stage": "COLLSCAN"}
+
+
+def test_aggregate_and_distinct_paths_are_explained():
+    queries = {query["name"]: query for query in production_queries()}
+    for name in ("summary_aggregate", "summary_grouped", "today_aggregate", "rollup_rebuild"):
+        assert "$match" in queries[name]["pipeline"][0]
+    assert queries["rollup_rebuild_users"]["distinct"] == "user_id"
+
+    async def scenario():
+        db = ExplainRecorder({"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}}]})
+        plan = await explain_query(db, queries["summary_aggregate"])
+        assert plan["collscan"]
+        assert db.commands[0]["explain"]["aggregate"] == "meals"
+        assert db.commands[0]["explain"]["pipeline"] == queries["summary_aggregate"]["pipeline"]
+
+        db = ExplainRecorder({"queryPlanner": {"winningPlan": {"stage": "PROJECTION_COVERED",
+                                                               "inputStage": {"stage": "DISTINCT_SCAN"}}}})
+        plan = await explain_query(db, queries["rollup_rebuild_users"])
+        assert not plan["collscan"]
+        assert db.commands[0]["explain"] == {"distinct": "meals", "key": "user_id", "query": {}}
+
+    asyncio.run(scenario())
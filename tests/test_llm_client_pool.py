@@ -0,0 +1,50 @@
+import asyncio
+
+from llm_client import LlmClientPool
+
+
+def test_spent_client_is_replaced_after_release_not_during_it():
+    async def scenario():
+        built = []
+        pool = LlmClientPool(lambda: built.append(object()) or built[-1], size=2, max_uses=1)
+        pool.warm()
+        assert len(built) == 2
+
+        async with pool.client() as chat:
+            assert chat in built
+        # Releasing only schedules the replacement
+        assert len(built) == 2 and pool.stats()["idle"] == 1
+        await asyncio.sleep(0)
+        assert len(built) == 3 and pool.stats()["idle"] == 2
+        assert pool.stats()["misses"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_reusable_clients_go_back_to_the_pool():
+    async def scenario():
+        pool = LlmClientPool(object, size=1, max_uses=3)
+        pool.warm()
+        seen = []
+        for _ in range(3):
+            async with pool.client() as chat:
+                seen.append(chat)
+        assert seen[0] is seen[1] is seen[2]
+        async with pool.client() as chat:
+            assert chat is not seen[0]
+        assert pool.stats()["reused"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_empty_pool_builds_inline_and_never_overfills():
+    async def scenario():
+        pool = LlmClientPool(object, size=2, max_uses=1)
+        async with pool.client(), pool.client(), pool.client():
+            pass
+        await asyncio.sleep(0)
+        stats = pool.stats()
+        assert stats["misses"] == 3
+        assert stats["idle"] == 2
+
+    asyncio.run(scenario())
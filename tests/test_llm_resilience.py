@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import pytest
+
+from fake_llm import FAKE_RESPONSE, FakeLlmChat, FakeLlmError
+from llm_client import CircuitBreaker, CircuitOpen, LlmCaller, LlmClientPool
+
+
+def scripted_pool(chats):
+    """A pool that hands out ``chats`` in order, one per attempt (size 0: nothing is pre-built)"""
+    remaining = iter(chats)
+    return LlmClientPool(lambda: next(remaining), size=0)
+
+
+def fake(latency, error_rate=0.0):
+    return FakeLlmChat(latency_seconds=latency, jitter_seconds=0, error_rate=error_rate, seed=1)
+
+
+def test_breaker_opens_half_opens_and_closes():
+    breaker = CircuitBreaker(failure_threshold=0.5, window=10, min_calls=4, cooldown_seconds=0.05)
+    for success in (False, True, False):
+        breaker.record(success)
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    breaker.record(False)
+    assert breaker.state == "open" and breaker.opened == 2
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.stats()["recent_calls"] == 0
+
+
+def test_caller_fails_fast_while_open_and_recovers():
+    async def scenario():
+        chats = [fake(0.001, error_rate=1.0) for _ in range(3)] + [fake(0.001)]
+        breaker = CircuitBreaker(min_calls=3, cooldown_seconds=0.05)
+        caller = LlmCaller(scripted_pool(chats), hedge=False, breaker=breaker)
+
+        for _ in range(3):
+            with pytest.raises(FakeLlmError):
+                await caller.send("photo")
+        assert breaker.state == "open"
+
+        # No client is checked out while the circuit is open
+        with pytest.raises(CircuitOpen):
+            await caller.send("photo")
+        assert caller.pool.created == 3
+
+        await asyncio.sleep(0.06)
+        assert await caller.send("photo") == FAKE_RESPONSE
+        assert breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_hedge_wins_over_a_slow_first_attempt():
+    async def scenario():
+        warmup = [fake(0.01) for _ in range(3)]
+        caller = LlmCaller(scripted_pool(warmup + [fake(2.0), fake(0.01)]),
+                           hedge_min_samples=3, hedge_min_seconds=0.05)
+        for _ in warmup:
+            await caller.send("photo")
+
+        started = time.monotonic()
+        assert await caller.send("photo") == FAKE_RESPONSE
+        assert time.monotonic() - started < 1.0
+        assert caller.stats()["hedged"] == 1
+        assert caller.stats()["hedge_wins"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_hedge_retries_an_early_failure():
+    async def scenario():
+        warmup = [fake(0.01) for _ in range(3)]
+        caller = LlmCaller(scripted_pool(warmup + [fake(0.001, error_rate=1.0), fake(0.01)]),
+                           hedge_min_samples=3, hedge_min_seconds=0.5)
+        for _ in warmup:
+            await caller.send("photo")
+
+        assert await caller.send("photo") == FAKE_RESPONSE
+        assert caller.stats()["hedge_wins"] == 1
+        assert caller.breaker.stats()["recent_failures"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_no_hedging_before_enough_samples_or_past_the_deadline():
+    async def scenario():
+        caller = LlmCaller(scripted_pool([fake(0.5)]), timeout_seconds=0.1, hedge_min_samples=3)
+        assert caller.hedge_delay() is None
+        with pytest.raises(asyncio.TimeoutError):
+            await caller.send("photo")
+        stats = caller.stats()
+        assert stats["timeouts"] == 1 and stats["hedged"] == 0
+        assert stats["breaker"]["recent_failures"] == 1
+
+    asyncio.run(scenario())
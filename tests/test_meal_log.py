@@ -0,0 +1,154 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from blob_store import FileSystemBlobStore
+from meal_log import MealLog
+
+
+def meal(user_id="u", key=None, calories=100.0):
+    document = {"_id": ObjectId(), "user_id": user_id, "food_name": "dal", "calories": calories}
+    if key:
+        document["idempotency_key"] = key
+    return document
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, meals):
+        self.batches.append([meal["_id"] for meal in meals])
+
+
+async def new_log(tmp_path, meals=None):
+    db = mongomock_motor.AsyncMongoMockClient()["meal_log_tests"]
+    await db.meals.create_index([("user_id", 1), ("idempotency_key", 1)], unique=True)
+    recorder = Recorder()
+    blobs = FileSystemBlobStore(db.blob_meta, str(tmp_path))
+    return db, blobs, recorder, MealLog(meals or db.meals, blobs, recorder)
+
+
+async def refs(blobs, data):
+    blob = await blobs.stat(await blobs.put(data))
+    await blobs.release(blob["_id"])
+    return blob["refs"] - 1
+
+
+class FailingMeals:
+    """Writes every document except one, then reports it like a validation failure"""
+
+    def __init__(self, meals, fail_index):
+        self.meals = meals
+        self.fail_index = fail_index
+
+    def find(self, *args, **kwargs):
+        return self.meals.find(*args, **kwargs)
+
+    async def insert_many(self, documents, ordered=True):
+        written = [document for index, document in enumerate(documents) if index != self.fail_index]
+        await self.meals.insert_many(written)
+        raise BulkWriteError({
+            "writeErrors": [{"index": self.fail_index, "code": 121, "errmsg": "Document failed validation"}],
+            "nInserted": len(written)
+        })
+
+
+def test_in_batch_duplicates_are_inserted_once(tmp_path):
+    async def scenario():
+        db, blobs, recorder, log = await new_log(tmp_path)
+        documents = [meal(key="a"), meal(key="b"), meal(key="a"), meal()]
+        outcomes = await log.insert_batch(documents, [b"img-a", b"img-b", b"img-a", None])
+
+        assert [status for _, status in outcomes] == ["created", "created", "duplicate", "created"]
+        assert outcomes[2][0] == outcomes[0][0]
+        assert await db.meals.count_documents({}) == 3
+        assert recorder.batches == [[documents[0]["_id"], documents[1]["_id"], documents[3]["_id"]]]
+        # The repeated entry's image was never stored
+        assert await refs(blobs, b"img-a") == 1
+
+    asyncio.run(scenario())
+
+
+def test_retried_batch_reports_stored_meals(tmp_path):
+    async def scenario():
+        db, blobs, recorder, log = await new_log(tmp_path)
+        first = await log.insert_batch([meal(key="a"), meal(key="b")], [b"img-a", None])
+        retry = await log.insert_batch([meal(key="a"), meal(key="b"), meal(key="c")], [b"img-a", None, None])
+
+        assert [status for _, status in retry] == ["duplicate", "duplicate", "created"]
+        assert [meal_id for meal_id, _ in retry[:2]] == [meal_id for meal_id, _ in first]
+        assert await db.meals.count_documents({}) == 3
+        assert len(recorder.batches) == 2 and len(recorder.batches[1]) == 1
+        assert await refs(blobs, b"img-a") == 1
+
+    asyncio.run(scenario())
+
+
+def test_lost_duplicate_key_race_resolves_to_winner_and_releases_blob(tmp_path):
+    async def scenario():
+        db, blobs, recorder, log = await new_log(tmp_path)
+        winner = meal(key="a")
+        winner["image_id"] = await blobs.put(b"img-a")
+        await db.meals.insert_one(winner)
+
+        # The lookup ran before the concurrent retry stored "a"
+        find_logged = log.find_logged
+        calls = []
+
+        async def stale_first_lookup(identities):
+            identities = list(identities)
+            calls.append(identities)
+            return {} if len(calls) == 1 else await find_logged(identities)
+
+        log.find_logged = stale_first_lookup
+        documents = [meal(key="a"), meal(key="b")]
+        outcomes = await log.insert_batch(documents, [b"img-a", b"img-b"])
+
+        assert outcomes == [(str(winner["_id"]), "duplicate"), (str(documents[1]["_id"]), "created")]
+        assert recorder.batches == [[documents[1]["_id"]]]
+        assert await refs(blobs, b"img-a") == 1
+        assert await refs(blobs, b"img-b") == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_insert_applies_written_meals_and_releases_rejected_blobs(tmp_path):
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["meal_log_tests"]
+        _, blobs, recorder, log = await new_log(tmp_path, FailingMeals(db.meals, fail_index=1))
+        documents = [meal(key="a"), meal(key="b"), meal(key="c")]
+
+        with pytest.raises(BulkWriteError):
+            await log.insert_batch(documents, [b"img-a", b"img-b", b"img-c"])
+
+        assert recorder.batches == [[documents[0]["_id"], documents[2]["_id"]]]
+        assert await refs(blobs, b"img-a") == 1
+        assert await refs(blobs, b"img-b") == 0
+        assert await refs(blobs, b"img-c") == 1
+
+    asyncio.run(scenario())
+
+
+def test_single_insert_race_releases_blob(tmp_path):
+    async def scenario():
+        db, blobs, recorder, log = await new_log(tmp_path)
+        winner = meal(key="a")
+        await db.meals.insert_one(winner)
+
+        # The idempotency check ran before the concurrent retry stored "a"
+        async def nothing_logged(identities):
+            return {}
+
+        lookups = iter([nothing_logged, log.find_logged])
+        log.find_logged = lambda identities: next(lookups)(identities)
+
+        assert await log.insert(meal(key="a"), b"img-a") == str(winner["_id"])
+        assert recorder.batches == []
+        assert await refs(blobs, b"img-a") == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,58 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+
+
+def test_cursor_round_trips_millisecond_timestamps():
+    timestamp = datetime(2026, 10, 1, 12, 30, 15, 123000)
+    meal_id = ObjectId()
+    token = encode_cursor(timestamp, meal_id)
+    assert "=" not in token and "/" not in token and "+" not in token
+    assert decode_cursor(token) == (timestamp, meal_id)
+
+
+def test_cursor_truncates_to_mongo_precision():
+    timestamp = datetime(2026, 10, 1, 12, 30, 15, 123456)
+    decoded, _ = decode_cursor(encode_cursor(timestamp, ObjectId()))
+    assert decoded == datetime(2026, 10, 1, 12, 30, 15, 123000)
+
+
+@pytest.mark.parametrize("token", ["", "not base64!", "MTo", "Mjox OjA", encode_cursor(datetime(2026, 1, 1), ObjectId())[:-3]])
+def test_malformed_cursors_are_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+def test_unknown_cursor_version_is_rejected():
+    token = base64.urlsafe_b64encode(f"2:0:{ObjectId()}".encode()).decode().rstrip("=")
+    with pytest.raises(InvalidCursor, match="version"):
+        decode_cursor(token)
+
+
+def test_pages_split_timestamp_ties_without_repeats_or_gaps():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+
+    async def scenario():
+        meals = mongomock_motor.AsyncMongoMockClient()["pagination_tests"].meals
+        base = datetime(2026, 10, 1, 12)
+        # Five meals per timestamp, so page boundaries fall inside runs of ties
+        await meals.insert_many([{"user_id": "u", "timestamp": base - timedelta(minutes=i // 5)} for i in range(23)])
+        expected = await meals.find({"user_id": "u"}).sort([("timestamp", -1), ("_id", -1)]).to_list(None)
+
+        seen, cursor = [], None
+        while True:
+            query = {"user_id": "u", **(keyset_filter(*decode_cursor(cursor)) if cursor else {})}
+            page = await meals.find(query).sort([("timestamp", -1), ("_id", -1)]).limit(5).to_list(5)
+            seen += page[:4]
+            if len(page) <= 4:
+                break
+            cursor = encode_cursor(page[3]["timestamp"], page[3]["_id"])
+
+        assert [meal["_id"] for meal in seen] == [meal["_id"] for meal in expected]
+
+    asyncio.run(scenario())
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from retention import MealRetention
+
+
+class Removed:
+    def __init__(self):
+        self.meals = []
+
+    async def __call__(self, meals):
+        self.meals.extend(meals)
+
+
+class YieldingMeals:
+    """Yields to the event loop before each delete so concurrent sweeps interleave"""
+
+    def __init__(self, meals, before_delete=None):
+        self.meals = meals
+        self.before_delete = before_delete
+
+    def find(self, *args, **kwargs):
+        return self.meals.find(*args, **kwargs)
+
+    async def find_one_and_delete(self, *args, **kwargs):
+        await asyncio.sleep(0)
+        if self.before_delete is not None:
+            await self.before_delete()
+        return await self.meals.find_one_and_delete(*args, **kwargs)
+
+
+async def seed(db, user_id, count, start=datetime(2026, 10, 1)):
+    meals = [{"user_id": user_id, "timestamp": start + timedelta(hours=i), "image_id": "shared"} for i in range(count)]
+    await db.meals.insert_many(meals)
+    return meals
+
+
+def new_retention(db, meals=None, **kwargs):
+    removed = Removed()
+    retention = MealRetention(meals or db.meals, db.user_settings, projection={"image_id": 1, "timestamp": 1},
+                              on_removed=removed, **kwargs)
+    return retention, removed
+
+
+def test_sweep_keeps_the_newest_meals():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["retention_tests"]
+        meals = await seed(db, "u", 20)
+        await seed(db, "other", 20)
+        retention, removed = new_retention(db, default_keep=14, batch_size=4)
+
+        assert await retention.sweep_user("u") == 6
+        kept = await db.meals.find({"user_id": "u"}).sort("timestamp", 1).to_list(None)
+        assert [meal["_id"] for meal in kept] == [meal["_id"] for meal in meals[6:]]
+        assert sorted(meal["_id"] for meal in removed.meals) == sorted(meal["_id"] for meal in meals[:6])
+        assert await db.meals.count_documents({"user_id": "other"}) == 20
+        assert await retention.sweep_user("u") == 0
+
+    asyncio.run(scenario())
+
+
+def test_keep_limit_per_user_and_unlimited():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["retention_tests"]
+        await seed(db, "u", 10)
+        retention, removed = new_retention(db, default_keep=14)
+
+        await retention.set_keep_limit("u", 0)
+        assert await retention.sweep_user("u") == 0
+        await retention.set_keep_limit("u", 3)
+        assert await retention.get_keep_limit("u") == 3
+        assert await retention.sweep_user("u") == 7
+        await retention.set_keep_limit("u", None)
+        assert await retention.get_keep_limit("u") == 14
+
+    asyncio.run(scenario())
+
+
+def test_overlapping_sweeps_apply_each_meal_once():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["retention_tests"]
+        await seed(db, "u", 22)
+        retention, removed = new_retention(db, YieldingMeals(db.meals), default_keep=14, batch_size=3)
+
+        counts = await asyncio.gather(retention.sweep_user("u"), retention.sweep_user("u"))
+
+        assert sum(counts) == 8
+        assert await db.meals.count_documents({"user_id": "u"}) == 14
+        assert len(removed.meals) == 8
+        assert len({meal["_id"] for meal in removed.meals}) == 8
+
+    asyncio.run(scenario())
+
+
+def test_meal_deleted_during_sweep_is_not_applied_twice():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["retention_tests"]
+        meals = await seed(db, "u", 16)
+        raced = meals[0]
+
+        # DELETE /meals/{id} wins the race for the oldest meal
+        async def delete_first():
+            await db.meals.delete_one({"_id": raced["_id"]})
+
+        retention, removed = new_retention(db, YieldingMeals(db.meals, delete_first), default_keep=14)
+
+        assert await retention.sweep_user("u") == 1
+        assert [meal["_id"] for meal in removed.meals] == [meals[1]["_id"]]
+        assert await db.meals.count_documents({"user_id": "u"}) == 14
+
+    asyncio.run(scenario())
@@ -0,0 +1,175 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from rollups import BACKFILL_ID, DailyRollups
+
+
+def make_meal(user_id, timestamp, calories, protein=1.0):
+    return {"user_id": user_id, "timestamp": timestamp, "calories": calories, "protein": protein,
+            "carbs": 2.0, "fat": 3.0, "fiber": 0.5}
+
+
+def new_rollups():
+    db = mongomock_motor.AsyncMongoMockClient()["rollup_tests"]
+    return db, DailyRollups(db.daily_rollups, db.meals)
+
+
+async def raw_totals(db, user_id, start):
+    meals = await db.meals.find({"user_id": user_id, "timestamp": {"$gte": start}}).to_list(None)
+    return sum(meal["calories"] for meal in meals), len(meals)
+
+
+def test_apply_matches_raw_totals_since():
+    async def scenario():
+        db, rollups = new_rollups()
+        midnight = datetime(2026, 10, 10)
+        meals = [
+            make_meal("u", midnight - timedelta(days=2, hours=-8), 300),
+            make_meal("u", midnight - timedelta(hours=3), 250),
+            make_meal("u", midnight + timedelta(hours=9), 400),
+            make_meal("u", midnight + timedelta(hours=13), 150),
+            make_meal("other", midnight + timedelta(hours=9), 999),
+        ]
+        await db.meals.insert_many(meals)
+        await rollups.apply(meals)
+
+        # Window starts mid-day: the partial first day comes from raw meals, the rest from rollups
+        for start in (midnight - timedelta(days=3), midnight - timedelta(hours=5), midnight + timedelta(hours=10)):
+            totals = await rollups.totals_since("u", start)
+            calories, count = await raw_totals(db, "u", start)
+            assert totals["calories"] == pytest.approx(calories)
+            assert totals["meal_count"] == count
+
+        removed = meals[2]
+        await db.meals.delete_one({"_id": removed["_id"]})
+        await rollups.apply([removed], sign=-1)
+        totals = await rollups.totals_since("u", midnight - timedelta(days=3))
+        assert totals["calories"] == pytest.approx(700)
+        assert totals["meal_count"] == 3
+
+    asyncio.run(scenario())
+
+
+def test_backfill_counts_meals_logged_before_rollups():
+    async def scenario():
+        db, rollups = new_rollups()
+        now = datetime.utcnow()
+        older = [make_meal("u", now - timedelta(hours=hours), 100) for hours in (1, 2, 30)]
+        await db.meals.insert_many(older)
+        # A meal logged after rollups shipped, already counted incrementally
+        newer = make_meal("u", now, 50)
+        await db.meals.insert_one(newer)
+        await rollups.apply([newer])
+
+        assert not rollups.ready
+        await rollups.backfill()
+        assert rollups.ready
+
+        totals = await rollups.totals_since("u", now - timedelta(days=3))
+        assert totals["calories"] == pytest.approx(350)
+        assert totals["meal_count"] == 4
+
+        # Deleting an older meal no longer drives its day negative
+        await rollups.apply([older[2]], sign=-1)
+        days = await db.daily_rollups.find({"user_id": "u"}).to_list(None)
+        assert all(day["meal_count"] >= 0 and day["calories"] >= 0 for day in days)
+
+    asyncio.run(scenario())
+
+
+def test_backfill_runs_once_per_deployment():
+    async def scenario():
+        db, rollups = new_rollups()
+        await db.meals.insert_one(make_meal("u", datetime.utcnow(), 100))
+        await rollups.backfill()
+        marker = await db.daily_rollups.find_one({"_id": BACKFILL_ID})
+        assert marker["completed_at"]
+
+        # Another worker starting later sees the marker and doesn't rebuild
+        await db.daily_rollups.update_many({"user_id": "u"}, {"$set": {"calories": 1.0}})
+        second = DailyRollups(db.daily_rollups, db.meals)
+        await second.backfill()
+        assert second.ready
+        assert (await db.daily_rollups.find_one({"user_id": "u"}))["calories"] == 1.0
+
+    asyncio.run(scenario())
+
+
+def test_waiting_worker_retakes_a_stale_claim():
+    async def scenario():
+        db, rollups = new_rollups()
+        await db.meals.insert_one(make_meal("u", datetime.utcnow(), 100))
+        await db.daily_rollups.insert_one({"_id": BACKFILL_ID, "started_at": datetime.utcnow() - timedelta(hours=2)})
+
+        await asyncio.wait_for(rollups.backfill(poll_seconds=0.01), 1)
+        assert rollups.ready
+        assert (await db.daily_rollups.find_one({"user_id": "u"}))["calories"] == 100
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_drops_rollups_without_meals():
+    async def scenario():
+        db, rollups = new_rollups()
+        midnight = datetime(2026, 10, 10)
+        kept = make_meal("u", midnight + timedelta(hours=9), 300)
+        gone = make_meal("u", midnight - timedelta(days=1), 200)
+        departed = make_meal("left", midnight, 100)
+        await rollups.apply([kept, gone, departed])
+        await db.meals.insert_one(kept)
+
+        assert await rollups.rebuild() == 1
+        days = await db.daily_rollups.find({}).to_list(None)
+        assert [(day["user_id"], day["day"], day["calories"]) for day in days] == [("u", "2026-10-10", 300)]
+
+        # Removing a day's last meal deletes its rollup rather than leaving zeros behind
+        await rollups.apply([kept], sign=-1)
+        assert await db.daily_rollups.count_documents({}) == 0
+
+    asyncio.run(scenario())
+
+
+class RacingMeals:
+    """Meals collection where a meal is logged right after the rebuild's aggregate ran"""
+
+    def __init__(self, meals, on_aggregated):
+        self.meals = meals
+        self.on_aggregated = on_aggregated
+
+    def __getattr__(self, name):
+        return getattr(self.meals, name)
+
+    async def aggregate(self, pipeline, **kwargs):
+        groups = await self.meals.aggregate(pipeline, **kwargs).to_list(None)
+        if self.on_aggregated is not None:
+            hook, self.on_aggregated = self.on_aggregated, None
+            await hook()
+        for group in groups:
+            yield group
+
+
+def test_rebuild_keeps_increments_that_land_while_it_runs():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["rollup_tests"]
+        midnight = datetime(2026, 10, 10)
+        existing = [make_meal("u", midnight + timedelta(hours=hours), 100) for hours in (8, 12)]
+        await db.meals.insert_many(existing)
+        late = make_meal("u", midnight + timedelta(hours=19), 250)
+
+        async def log_late_meal():
+            await db.meals.insert_one(late)
+            await rollups.apply([late])
+
+        rollups = DailyRollups(db.daily_rollups, RacingMeals(db.meals, log_late_meal))
+        await rollups.apply(existing)
+        await rollups.rebuild("u")
+
+        day = await db.daily_rollups.find_one({"_id": "u:2026-10-10"})
+        assert day["calories"] == pytest.approx(450)
+        assert day["meal_count"] == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,41 @@
+import asyncio
+
+from variant_cache import VariantCache
+
+
+def test_waiter_recovers_when_creating_request_is_cancelled(tmp_path):
+    async def scenario():
+        cache = VariantCache(str(tmp_path), max_bytes=1024)
+
+        async def create():
+            await asyncio.sleep(0.1)
+            return b"variant"
+
+        leader = asyncio.create_task(cache.get_or_create("meal_thumb", create))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_create("meal_thumb", create))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        assert await asyncio.wait_for(waiter, 1) == b"variant"
+        assert leader.cancelled()
+        assert cache.stats()["entries"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_misses_create_once(tmp_path):
+    async def scenario():
+        cache = VariantCache(str(tmp_path), max_bytes=1024)
+        calls = []
+
+        async def create():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return b"variant"
+
+        results = await asyncio.gather(*(cache.get_or_create("meal_thumb", create) for _ in range(5)))
+        assert results == [b"variant"] * 5
+        assert len(calls) == 1
+
+    asyncio.run(scenario())